@@ -27,12 +27,36 @@ class Config:
         return f"amqp://{self.RABBITMQ_USER}:{self.RABBITMQ_PASS}@{self.RABBITMQ_HOST}:{self.RABBITMQ_PORT}/"
     
     # Worker settings
+    # CPU threads per worker process come from TORCH_THREADS / ORT_THREADS
+    # (read by the inference modules); keep processes x threads <= physical cores
     WORKER_CONCURRENCY = int(os.getenv('WORKER_CONCURRENCY', 2))
+    # Micro-batching: jobs arriving within the timeout share one model call
+    WORKER_BATCH_SIZE = int(os.getenv('WORKER_BATCH_SIZE', 32))
+    WORKER_BATCH_TIMEOUT_MS = float(os.getenv('WORKER_BATCH_TIMEOUT_MS', 5))
     MODEL_PATH = os.getenv('MODEL_PATH', '/app/models/phobert-base-v2')
     MODEL_DEVICE = os.getenv('MODEL_DEVICE', 'cpu')
+    # Run PhoBERT through ONNX Runtime (INT8) on CPU (baseline and multi-task)
+    USE_ONNX = os.getenv('USE_ONNX', 'false').lower() == 'true'
+    # torch.compile the PyTorch model (baseline and multi-task)
+    TORCH_COMPILE = os.getenv('TORCH_COMPILE', 'false').lower() == 'true'
+    # Baseline model only, GPU: replay single short texts through a CUDA graph
+    CUDA_GRAPHS = os.getenv('CUDA_GRAPHS', 'false').lower() == 'true'
+    # Baseline model only: serve the 6-layer student from training/distill.py
+    USE_DISTILLED = os.getenv('USE_DISTILLED', 'false').lower() == 'true'
+    DISTILLED_MODEL_PATH = os.getenv('DISTILLED_MODEL_PATH', '/app/models/phobert-student')
     
     # Multi-task model settings
     USE_MULTITASK_MODEL = os.getenv('USE_MULTITASK_MODEL', 'true').lower() == 'true'
+    # Multi-task model only: INT8 dynamic quantization on CPU
+    QUANTIZE_MODEL = os.getenv('QUANTIZE_MODEL', 'false').lower() == 'true'
+    # Multi-task model only: FP16 on GPU, BF16 autocast on CPUs with native BF16
+    HALF_PRECISION = os.getenv('HALF_PRECISION', 'false').lower() == 'true'
+    # Multi-task model only: allow short texts without negative words without the model
+    SHORT_TEXT_FAST_PATH = os.getenv('SHORT_TEXT_FAST_PATH', 'false').lower() == 'true'
+    # Multi-task model only: truncation length in tokens (e.g. the p99 of real traffic)
+    MAX_SEQ_LENGTH = int(os.getenv('MAX_SEQ_LENGTH', 256))
+    # Multi-task model only: threads for the rule pass of a batch (0 = sequential)
+    RULE_WORKERS = int(os.getenv('RULE_WORKERS', 0))
     # Increased threshold to reduce false positives - only block clearly toxic content
     CONFIDENCE_THRESHOLD = float(os.getenv('CONFIDENCE_THRESHOLD', 0.7))
 
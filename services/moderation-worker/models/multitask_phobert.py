@@ -8,10 +8,31 @@ Architecture:
 - Task C: Token-level span detection (for highlighting violations)
 """
 
+import json
+import os
 import torch
 import torch.nn as nn
 from transformers import AutoModel, AutoConfig
-from typing import Dict, Optional, Tuple
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    from safetensors import safe_open
+    from safetensors.torch import load_file, save_file
+    HAS_SAFETENSORS = True
+except ImportError:
+    HAS_SAFETENSORS = False
+
+# transformers needs accelerate for low_cpu_mem_usage
+try:
+    import accelerate  # noqa: F401
+    HAS_ACCELERATE = True
+except ImportError:
+    HAS_ACCELERATE = False
+
+# Task head checkpoint files in a model directory (safetensors preferred)
+TASK_HEADS_FILE = 'task_heads.pt'
+TASK_HEADS_SAFETENSORS_FILE = 'task_heads.safetensors'
+TASK_HEAD_NAMES = ('multi_label_classifier', 'severity_regressor', 'span_detector')
 
 
 class MultiTaskPhoBERT(nn.Module):
@@ -31,7 +52,8 @@ class MultiTaskPhoBERT(nn.Module):
         num_severity_levels: int = 3,  # 0, 1, 2
         hidden_dropout_prob: float = 0.1,
         use_span_detection: bool = True,
-        freeze_backbone: bool = False
+        freeze_backbone: bool = False,
+        low_cpu_mem_usage: bool = False  # Load weights straight into the model (no random init copy)
     ):
         super().__init__()
         
@@ -41,7 +63,11 @@ class MultiTaskPhoBERT(nn.Module):
         
         # Load PhoBERT backbone
         self.config = AutoConfig.from_pretrained(model_name)
-        self.phobert = AutoModel.from_pretrained(model_name, config=self.config)
+        self.phobert = AutoModel.from_pretrained(
+            model_name,
+            config=self.config,
+            low_cpu_mem_usage=low_cpu_mem_usage and HAS_ACCELERATE
+        )
         
         # Freeze backbone if specified (for fine-tuning only task heads)
         if freeze_backbone:
@@ -369,6 +395,52 @@ class MultiTaskLoss(nn.Module):
         return total_loss, losses
 
 
+def save_task_heads_safetensors(checkpoint: Dict[str, Any], path: str) -> None:
+    """
+    Write a task heads checkpoint (the dict saved as task_heads.pt) as safetensors
+    
+    Tensors are stored flat as '<head>.<param>', the config as JSON metadata.
+    """
+    tensors = {}
+    for head in TASK_HEAD_NAMES:
+        state_dict = checkpoint.get(head)
+        if state_dict:
+            for name, tensor in state_dict.items():
+                tensors[f"{head}.{name}"] = tensor.detach().contiguous().cpu()
+    save_file(tensors, path, metadata={'config': json.dumps(checkpoint['config'])})
+
+
+def load_task_heads(model_dir: str, device: str = 'cpu') -> Optional[Dict[str, Any]]:
+    """
+    Load the task heads checkpoint of a model directory
+    
+    task_heads.safetensors is memory-mapped straight onto the device; the
+    pickled task_heads.pt is the fallback, loaded with weights_only=True.
+    
+    Returns:
+        Dict {head: state_dict or None, 'config': dict}, None if there is no checkpoint
+    """
+    safetensors_path = os.path.join(model_dir, TASK_HEADS_SAFETENSORS_FILE)
+    if HAS_SAFETENSORS and os.path.exists(safetensors_path):
+        with safe_open(safetensors_path, framework='pt') as f:
+            config = json.loads(f.metadata()['config'])
+        tensors = load_file(safetensors_path, device=str(device))
+        
+        checkpoint: Dict[str, Any] = {head: None for head in TASK_HEAD_NAMES}
+        for key, tensor in tensors.items():
+            head, name = key.split('.', 1)
+            if checkpoint.get(head) is None:
+                checkpoint[head] = {}
+            checkpoint[head][name] = tensor
+        checkpoint['config'] = config
+        return checkpoint
+    
+    pt_path = os.path.join(model_dir, TASK_HEADS_FILE)
+    if os.path.exists(pt_path):
+        return torch.load(pt_path, map_location=device, weights_only=True)
+    return None
+
+
 if __name__ == "__main__":
     # Test model
     print("Testing MultiTaskPhoBERT...")
@@ -11,10 +11,12 @@ Last Updated: 2025-12-19
 
 import re
 from typing import Dict, List, Tuple, Optional, Any
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Enum
 import logging
 
+from nlp.keyword_scanner import KeywordScanner
+
 logger = logging.getLogger(__name__)
 
 
@@ -41,6 +43,8 @@ class ContextAnalysisResult:
     has_valid_reason: bool
     severity_modifier: float  # 0.0 - 2.0 (< 1.0 = giảm, > 1.0 = tăng)
     reasoning: str
+    safe_words: List[str] = field(default_factory=list)      # Flagged words in safe context
+    actual_flagged: List[str] = field(default_factory=list)  # Flagged words still toxic
 
 
 # ==================== CONTEXT INDICATORS ====================
@@ -218,6 +222,22 @@ SAFE_WORD_PATTERNS = {
     ],
 }
 
+# Safe pattern that is just a whole-word check, e.g. r'\bedit\b'
+_SINGLE_WORD_PATTERN = re.compile(r'\\b(\w+)\\b')
+
+# Word tokens, matching the same boundaries as \b...\b in the safe patterns
+_TOKEN_PATTERN = re.compile(r'\w+')
+
+# Keyword groups scanned together for intent/target detection
+INTENT_KEYWORD_CATEGORIES = {
+    'spam': SPAM_KEYWORDS,
+    'hate_group': HATE_SPEECH_GROUP_INDICATORS,
+    'hatred': HATRED_MODIFIERS,
+    'personal': PERSONAL_ATTACK_INDICATORS,
+    'product': PRODUCT_REVIEW_INDICATORS,
+    'negative': LEGITIMATE_NEGATIVE_FEEDBACK,
+}
+
 
 class ContextAnalyzer:
     """
@@ -228,12 +248,30 @@ class ContextAnalyzer:
         self.safe_patterns = self._compile_safe_patterns()
         self.reducing_patterns = [(re.compile(p, re.IGNORECASE), m) for p, m in SEVERITY_REDUCING_CONTEXTS]
         self.increasing_patterns = [(re.compile(p, re.IGNORECASE), m) for p, m in SEVERITY_INCREASING_CONTEXTS]
+        self.keyword_scanner = KeywordScanner(categories=INTENT_KEYWORD_CATEGORIES)
     
-    def _compile_safe_patterns(self) -> Dict[str, List[re.Pattern]]:
-        """Compile các pattern an toàn"""
+    def _compile_safe_patterns(self) -> Dict[str, Tuple[frozenset, Optional[re.Pattern]]]:
+        """
+        Compile các pattern an toàn
+        
+        Pattern chỉ là một từ đơn (vd: edit, credit) được tách ra thành tập từ
+        để so khớp với token; các pattern nhiều từ được gộp thành một alternation.
+        """
         compiled = {}
         for word, patterns in SAFE_WORD_PATTERNS.items():
-            compiled[word] = [re.compile(p, re.IGNORECASE) for p in patterns]
+            word_set = set()
+            phrase_patterns = []
+            for p in patterns:
+                match = _SINGLE_WORD_PATTERN.fullmatch(p)
+                if match:
+                    word_set.add(match.group(1).lower())
+                else:
+                    phrase_patterns.append(p)
+            phrase_rx = (
+                re.compile("(?:" + "|".join(phrase_patterns) + ")", re.IGNORECASE)
+                if phrase_patterns else None
+            )
+            compiled[word] = (frozenset(word_set), phrase_rx)
         return compiled
     
     def is_safe_context(self, text: str, flagged_word: str) -> bool:
@@ -248,14 +286,22 @@ class ContextAnalyzer:
             True nếu từ nằm trong ngữ cảnh an toàn
         """
         text_lower = text.lower()
-        
-        # Check safe patterns cho từ cụ thể
-        for word_key, patterns in self.safe_patterns.items():
-            if word_key in flagged_word.lower():
-                for pattern in patterns:
-                    if pattern.search(text_lower):
-                        logger.debug(f"Safe context detected for '{flagged_word}' in: {text[:50]}...")
-                        return True
+        flagged_lower = flagged_word.lower()
+        tokens = None
+        
+        # Check safe patterns cho từ cụ thể (chỉ chạy regex khi từ khóa khớp)
+        for word_key, (word_set, phrase_rx) in self.safe_patterns.items():
+            if word_key not in flagged_lower:
+                continue
+            if word_set:
+                if tokens is None:
+                    tokens = set(_TOKEN_PATTERN.findall(text_lower))
+                if not tokens.isdisjoint(word_set):
+                    logger.debug(f"Safe context detected for '{flagged_word}' in: {text[:50]}...")
+                    return True
+            if phrase_rx is not None and phrase_rx.search(text_lower):
+                logger.debug(f"Safe context detected for '{flagged_word}' in: {text[:50]}...")
+                return True
         
         return False
     
@@ -270,30 +316,29 @@ class ContextAnalyzer:
             ContentIntent enum
         """
         text_lower = text.lower()
-        
+        return self._detect_intent(text_lower, self.keyword_scanner.count_categories(text_lower))
+    
+    def _detect_intent(self, text_lower: str, keyword_counts: Dict[str, int]) -> ContentIntent:
+        """Determine intent from lowercased text and its keyword counts"""
         # Check câu hỏi
         if any(q in text_lower for q in ['?', 'làm sao', 'như thế nào', 'ở đâu', 'bao nhiêu', 'khi nào', 'ai', 'cái gì']):
             return ContentIntent.QUESTION
         
         # Check spam
-        spam_count = sum(1 for kw in SPAM_KEYWORDS if kw in text_lower)
-        if spam_count >= 3:
+        if keyword_counts['spam'] >= 3:
             return ContentIntent.SPAM
         
         # Check hate speech
-        has_group = any(grp in text_lower for grp in HATE_SPEECH_GROUP_INDICATORS)
-        has_hatred = any(mod in text_lower for mod in HATRED_MODIFIERS)
-        if has_group and has_hatred:
+        if keyword_counts['hate_group'] and keyword_counts['hatred']:
             return ContentIntent.HATE_SPEECH
         
         # Check personal attack
-        personal_count = sum(1 for ind in PERSONAL_ATTACK_INDICATORS if ind in text_lower)
-        if personal_count >= 2:
+        if keyword_counts['personal'] >= 2:
             return ContentIntent.PERSONAL_ATTACK
         
         # Check product review (negative or positive)
-        product_count = sum(1 for ind in PRODUCT_REVIEW_INDICATORS if ind in text_lower)
-        negative_count = sum(1 for fb in LEGITIMATE_NEGATIVE_FEEDBACK if fb in text_lower)
+        product_count = keyword_counts['product']
+        negative_count = keyword_counts['negative']
         
         if product_count >= 1:
             if negative_count >= 1:
@@ -314,14 +359,10 @@ class ContextAnalyzer:
             (targets_product, targets_person)
         """
         text_lower = text.lower()
+        keyword_counts = self.keyword_scanner.count_categories(text_lower)
         
-        # Check targets product
-        targets_product = any(ind in text_lower for ind in PRODUCT_REVIEW_INDICATORS)
-        
-        # Check targets person
-        targets_person = any(ind in text_lower for ind in PERSONAL_ATTACK_INDICATORS)
-        
-        return targets_product, targets_person
+        # Check targets product / person
+        return keyword_counts['product'] > 0, keyword_counts['personal'] > 0
     
     def calculate_severity_modifier(self, text: str) -> float:
         """
@@ -359,23 +400,34 @@ class ContextAnalyzer:
         Returns:
             ContextAnalysisResult
         """
+        # Scan all keyword groups once
+        text_lower = text.lower()
+        keyword_counts = self.keyword_scanner.count_categories(text_lower)
+        
         # Detect intent
-        intent = self.detect_intent(text)
+        intent = self._detect_intent(text_lower, keyword_counts)
         
         # Analyze targets
-        targets_product, targets_person = self.analyze_target(text)
+        targets_product = keyword_counts['product'] > 0
+        targets_person = keyword_counts['personal'] > 0
         
         # Calculate severity modifier
         severity_modifier = self.calculate_severity_modifier(text)
         
         # Check safe context for flagged words
-        safe_word_count = 0
+        safe_words = []
+        actual_flagged = []
         if flagged_words:
+            # Check each distinct word once; duplicates reuse the result
+            is_safe = {word: self.is_safe_context(text, word) for word in dict.fromkeys(flagged_words)}
             for word in flagged_words:
-                if self.is_safe_context(text, word):
-                    safe_word_count += 1
+                if is_safe[word]:
+                    safe_words.append(word)
+                else:
+                    actual_flagged.append(word)
             
             # Adjust modifier if many flagged words are in safe context
+            safe_word_count = len(safe_words)
             if safe_word_count > 0:
                 safe_ratio = safe_word_count / len(flagged_words)
                 severity_modifier *= (1 - safe_ratio * 0.5)
@@ -388,8 +440,7 @@ class ContextAnalyzer:
         )
         
         # Has valid reason?
-        text_lower = text.lower()
-        has_valid_reason = any(fb in text_lower for fb in LEGITIMATE_NEGATIVE_FEEDBACK)
+        has_valid_reason = keyword_counts['negative'] > 0
         
         # Calculate confidence
         if intent == ContentIntent.HATE_SPEECH:
@@ -412,8 +463,8 @@ class ContextAnalyzer:
             reasoning_parts.append("Valid feedback/criticism")
         if has_valid_reason:
             reasoning_parts.append("Specific reason provided")
-        if safe_word_count > 0:
-            reasoning_parts.append(f"{safe_word_count} words in safe context")
+        if safe_words:
+            reasoning_parts.append(f"{len(safe_words)} words in safe context")
         
         return ContextAnalysisResult(
             intent=intent,
@@ -423,7 +474,9 @@ class ContextAnalyzer:
             targets_person=targets_person,
             has_valid_reason=has_valid_reason,
             severity_modifier=severity_modifier,
-            reasoning=" | ".join(reasoning_parts)
+            reasoning=" | ".join(reasoning_parts),
+            safe_words=safe_words,
+            actual_flagged=actual_flagged
         )
 
 
@@ -469,6 +522,16 @@ class SemanticChecker:
         for base_word, spellings in self.TOXIC_SPELLINGS.items():
             for sp in spellings:
                 self.reverse_spellings[sp.lower()] = base_word
+        
+        # Character sets of each key: a word can only match a key if the
+        # text contains every character of that key (cheap pre-check)
+        self._spelling_charsets = frozenset(frozenset(k) for k in self.reverse_spellings)
+        self._synonym_charsets = frozenset(frozenset(k) for k in self.reverse_synonyms)
+    
+    @staticmethod
+    def _may_contain_key(text_chars: set, key_charsets: frozenset) -> bool:
+        """Check if any key could occur in a text with the given characters"""
+        return any(chars <= text_chars for chars in key_charsets)
     
     def normalize_spelling(self, text: str) -> Tuple[str, List[str]]:
         """
@@ -482,6 +545,9 @@ class SemanticChecker:
         
         # Check spellings
         words = text_lower.split()
+        if not self._may_contain_key(set(text_lower), self._spelling_charsets):
+            return ' '.join(words), detected
+        
         normalized_words = []
         
         for word in words:
@@ -506,6 +572,8 @@ class SemanticChecker:
         """
         text_lower = text.lower()
         detected = []
+        if not self._may_contain_key(set(text_lower), self._synonym_charsets):
+            return detected
         
         for word in text_lower.split():
             clean_word = re.sub(r'[^a-zàáảãạăắằẳẵặâấầẩẫậèéẻẽẹêếềểễệìíỉĩịòóỏõọôốồổỗộơớờởỡợùúủũụưứừửữựỳýỷỹỵđ]', '', word)
@@ -651,14 +719,9 @@ class EnhancedModerationAnalyzer:
         # 2. Semantic check
         semantic_result = self.semantic_checker.check(text)
         
-        # 3. Filter out safe context words
-        safe_words = []
-        actual_flagged = []
-        for word in flagged_words:
-            if self.context_analyzer.is_safe_context(text, word):
-                safe_words.append(word)
-            else:
-                actual_flagged.append(word)
+        # 3. Filter out safe context words (already partitioned in step 1)
+        safe_words = context_result.safe_words
+        actual_flagged = context_result.actual_flagged
         
         # 4. Calibrate confidence
         calibrated_confidence = self.confidence_calibrator.calibrate(
@@ -10,14 +10,42 @@ Version: 1.0.0
 Last Updated: 2025-12-19
 """
 
+import asyncio
+import copy
 import logging
-from typing import Dict, List, Any, Optional, Tuple
-from dataclasses import dataclass
+import threading
+import unicodedata
+from collections import OrderedDict
+from time import perf_counter_ns
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, FrozenSet, List, Any, Optional, Tuple
+from dataclasses import InitVar, dataclass, field
 from enum import Enum
 import numpy as np
 
+# Optional components, imported once at module load
+try:
+    from nlp.context_analyzer import get_enhanced_analyzer
+    HAS_CONTEXT_ANALYZER = True
+except ImportError:
+    HAS_CONTEXT_ANALYZER = False
+
+try:
+    from nlp.variant_detector import get_variant_detector
+    HAS_VARIANT_DETECTOR = True
+except ImportError:
+    HAS_VARIANT_DETECTOR = False
+
 logger = logging.getLogger(__name__)
 
+# Shared pool for overlapping the ML model (releases the GIL) with the
+# Python-only stages of a single moderate() call
+_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix='ensemble')
+
+# Separate pool for whole moderate() calls made from async code; kept apart
+# from _EXECUTOR so a request waiting on its ML future can never starve it
+_REQUEST_EXECUTOR = ThreadPoolExecutor(thread_name_prefix='ensemble-request')
+
 
 class ModerationMethod(Enum):
     """Methods used for moderation decision"""
@@ -28,6 +56,34 @@ class ModerationMethod(Enum):
     ENSEMBLE = "ensemble"
 
 
+# Bit flag per method for ModerationResult.methods_used_mask, in pipeline order
+_RULE_BASED_BIT = 1
+_VARIANT_DETECTION_BIT = 2
+_CONTEXT_ANALYSIS_BIT = 4
+_ML_MODEL_BIT = 8
+_ENSEMBLE_BIT = 16
+
+_METHOD_BITS = (
+    (_RULE_BASED_BIT, ModerationMethod.RULE_BASED),
+    (_VARIANT_DETECTION_BIT, ModerationMethod.VARIANT_DETECTION),
+    (_CONTEXT_ANALYSIS_BIT, ModerationMethod.CONTEXT_ANALYSIS),
+    (_ML_MODEL_BIT, ModerationMethod.ML_MODEL),
+    (_ENSEMBLE_BIT, ModerationMethod.ENSEMBLE),
+)
+
+_METHOD_TO_BIT = {method: bit for bit, method in _METHOD_BITS}
+
+# Every possible mask -> methods / method values, built once
+_MASK_TO_METHODS = {
+    mask: tuple(method for bit, method in _METHOD_BITS if mask & bit)
+    for mask in range(1 << len(_METHOD_BITS))
+}
+_MASK_TO_VALUES = {
+    mask: tuple(method.value for method in methods)
+    for mask, methods in _MASK_TO_METHODS.items()
+}
+
+
 class ModerationAction(Enum):
     """Possible moderation actions"""
     ALLOWED = "allowed"
@@ -42,35 +98,64 @@ class ModerationResult:
     confidence: float
     reasoning: str
     
-    # Contributing factors
-    methods_used: List[ModerationMethod]
+    # Contributing factors. methods_used is only a constructor argument that
+    # seeds methods_used_mask (bit flags, see _METHOD_BITS); read the methods
+    # back with get_methods_used()
+    methods_used: InitVar[Optional[List[ModerationMethod]]] = None
     rule_based_result: Optional[Dict] = None
     ml_result: Optional[Dict] = None
     context_result: Optional[Dict] = None
     variant_result: Optional[Dict] = None
     
     # Labels and flags
-    labels: List[str] = None
+    labels: Optional[FrozenSet[str]] = None
     flagged_words: List[str] = None
     severity_score: float = 0.0
     
     # Metadata
     processing_time_ms: float = 0.0
     
+    methods_used_mask: int = 0
+    
+    def __post_init__(self, methods_used: Optional[List[ModerationMethod]]):
+        if methods_used is not None:
+            mask = 0
+            for method in methods_used:
+                mask |= _METHOD_TO_BIT[method]
+            self.methods_used_mask = mask
+    
+    def get_methods_used(self) -> List[ModerationMethod]:
+        """Methods that contributed to the decision, in pipeline order"""
+        return list(_MASK_TO_METHODS[self.methods_used_mask])
+    
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary for API response"""
         return {
             'action': self.action.value,
             'confidence': self.confidence,
             'reasoning': self.reasoning,
-            'methods_used': [m.value for m in self.methods_used],
-            'labels': self.labels or [],
+            'methods_used': list(_MASK_TO_VALUES[self.methods_used_mask]),
+            'labels': list(self.labels) if self.labels else [],
             'flagged_words': self.flagged_words or [],
             'severity_score': self.severity_score,
             'processing_time_ms': self.processing_time_ms,
         }
 
 
+@dataclass
+class _PreparedModeration:
+    """Intermediate state of one text between the cheap stages and the ML stage"""
+    start_ns: int  # perf_counter_ns() when moderation of the text started
+    methods_mask: int = 0
+    flagged_words: List[str] = field(default_factory=list)
+    rule_result: Optional[Dict] = None
+    variant_result: Optional[Dict] = None
+    context_result: Optional[Dict] = None
+    needs_ml: bool = False
+    ml_future: Optional[Future] = None  # ML started early, overlapping context analysis
+    result: Optional[ModerationResult] = None  # Set when the cascade exits early
+
+
 class EnsembleWeights:
     """Configurable weights for ensemble decision"""
     
@@ -96,6 +181,21 @@ class EnsembleWeights:
     QUESTION_REDUCTION = 0.7
 
 
+# Longest text (in characters) handed to the ML model; the tokenizer keeps at
+# most 256 tokens anyway, so anything beyond this is wasted preprocessing
+MAX_ML_TEXT_LENGTH = 2048
+
+# Score contributed by a rule-based action (anything else scores 0.0)
+_RULE_ACTION_SCORES = {'reject': 1.0, 'review': 0.6}
+
+# (score, boost) for the overall severity of detected variants
+_VARIANT_SEVERITY_SCORES = {'high': (0.9, 1.5), 'medium': (0.7, 1.3)}
+_VARIANT_DEFAULT_SCORE = (0.5, 1.1)
+
+# Action by number of thresholds reached: none, review, review + reject
+_ACTIONS_BY_LEVEL = (ModerationAction.ALLOWED, ModerationAction.REVIEW, ModerationAction.REJECT)
+
+
 class EnsembleModerator:
     """
     Main ensemble moderator that combines all approaches
@@ -106,26 +206,43 @@ class EnsembleModerator:
         ml_inference=None,  # MultiTaskModerationInference instance
         use_context_analyzer: bool = True,
         use_variant_detector: bool = True,
-        weights: EnsembleWeights = None
+        weights: EnsembleWeights = None,
+        cache_size: int = 4096  # Max cached moderate() results (0 = disabled)
     ):
         self.ml_inference = ml_inference
         self.weights = weights or EnsembleWeights()
         
+        # Weights/thresholds read on every scoring call
+        self._w_rule = self.weights.RULE_BASED_WEIGHT
+        self._w_ml = self.weights.ML_MODEL_WEIGHT
+        self._w_variant = self.weights.VARIANT_WEIGHT
+        self._reject_threshold = self.weights.REJECT_THRESHOLD
+        self._review_threshold = self.weights.REVIEW_THRESHOLD
+        self._obfuscation_penalty = self.weights.OBFUSCATION_PENALTY
+        self._criticism_reduction = self.weights.LEGITIMATE_CRITICISM_REDUCTION
+        self._safe_context_reduction = self.weights.SAFE_CONTEXT_REDUCTION
+        self._question_reduction = self.weights.QUESTION_REDUCTION
+        self._hate_speech_boost = self.weights.HATE_SPEECH_BOOST
+        self._personal_attack_boost = self.weights.PERSONAL_ATTACK_BOOST
+        
+        # LRU cache of frozen results, keyed by normalized text
+        self.cache_size = cache_size
+        self._result_cache: "OrderedDict[str, Tuple]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        
         # Initialize components
         self.context_analyzer = None
         self.variant_detector = None
         
-        if use_context_analyzer:
+        if use_context_analyzer and HAS_CONTEXT_ANALYZER:
             try:
-                from nlp.context_analyzer import get_enhanced_analyzer
                 self.context_analyzer = get_enhanced_analyzer()
                 logger.info("Context analyzer loaded for ensemble")
             except Exception as e:
                 logger.warning(f"Could not load context analyzer: {e}")
         
-        if use_variant_detector:
+        if use_variant_detector and HAS_VARIANT_DETECTOR:
             try:
-                from nlp.variant_detector import get_variant_detector
                 self.variant_detector = get_variant_detector()
                 logger.info("Variant detector loaded for ensemble")
             except Exception as e:
@@ -142,15 +259,29 @@ class EnsembleModerator:
         if self.ml_inference:
             try:
                 # Get raw ML prediction without rule-based
-                original_flag = getattr(self.ml_inference, 'use_rule_based_fallback', True)
-                self.ml_inference.use_rule_based_fallback = False
-                result = self.ml_inference.predict(text)
-                self.ml_inference.use_rule_based_fallback = original_flag
-                return result
+                return self.ml_inference.predict(
+                    text[:MAX_ML_TEXT_LENGTH], use_rule_based_fallback=False
+                )
             except Exception as e:
                 logger.error(f"ML model error: {e}")
         return None
     
+    def _run_ml_model_batch(self, texts: List[str], batch_size: int = 32) -> List[Optional[Dict[str, Any]]]:
+        """Run ML model prediction for many texts in batched forward passes"""
+        if not texts:
+            return []
+        if self.ml_inference and hasattr(self.ml_inference, 'batch_predict'):
+            try:
+                return self.ml_inference.batch_predict(
+                    [text[:MAX_ML_TEXT_LENGTH] for text in texts],
+                    batch_size=batch_size,
+                    use_rule_based_fallback=False
+                )
+            except Exception as e:
+                logger.error(f"ML batch model error: {e}")
+                return [None] * len(texts)
+        return [self._run_ml_model(text) for text in texts]
+    
     def _run_context_analysis(self, text: str, flagged_words: List[str] = None) -> Optional[Dict[str, Any]]:
         """Run context analysis"""
         if self.context_analyzer:
@@ -175,39 +306,44 @@ class EnsembleModerator:
         ml_result: Optional[Dict],
         context_result: Optional[Dict],
         variant_result: Optional[Dict]
-    ) -> Tuple[float, List[str], str]:
+    ) -> Tuple[float, FrozenSet[str], str]:
         """
         Calculate ensemble score from all methods
         
         Returns:
             (score, labels, reasoning)
         """
-        scores = []
+        w_rule = self._w_rule
+        w_ml = self._w_ml
+        w_variant = self._w_variant
+        
+        # Running weighted sum over the scored methods
+        weighted_sum = 0.0
+        total_weight = 0.0
         labels = set()
         reasoning_parts = []
         
         # 1. Rule-based score
         if rule_result:
-            action = rule_result.get('action', 'allowed')
-            if action == 'reject':
-                rule_score = 1.0
-            elif action == 'review':
-                rule_score = 0.6
-            else:
-                rule_score = 0.0
+            get = rule_result.get
+            rule_score = _RULE_ACTION_SCORES.get(get('action', 'allowed'), 0.0)
+            rule_labels = get('labels')
             
-            scores.append(('rule', rule_score, self.weights.RULE_BASED_WEIGHT))
+            weighted_sum += rule_score * w_rule
+            total_weight += w_rule
             
-            if rule_result.get('labels'):
-                labels.update(rule_result['labels'])
+            if rule_labels:
+                labels.update(rule_labels)
             
             if rule_score > 0:
-                reasoning_parts.append(f"Rule: {rule_result.get('reasoning', 'violation detected')[:50]}")
+                reasoning_parts.append(f"Rule: {get('reasoning', 'violation detected')[:50]}")
         
         # 2. ML model score
         if ml_result:
-            action = ml_result.get('action', 'allowed')
-            ml_confidence = ml_result.get('confidence', 0.5)
+            get = ml_result.get
+            action = get('action', 'allowed')
+            ml_confidence = get('confidence', 0.5)
+            ml_labels = get('labels')
             
             if action == 'reject':
                 ml_score = 0.7 + (ml_confidence * 0.3)
@@ -216,75 +352,73 @@ class EnsembleModerator:
             else:
                 ml_score = 1.0 - ml_confidence
             
-            scores.append(('ml', ml_score, self.weights.ML_MODEL_WEIGHT))
+            weighted_sum += ml_score * w_ml
+            total_weight += w_ml
             
-            if ml_result.get('labels'):
-                labels.update(ml_result['labels'])
+            if ml_labels:
+                labels.update(ml_labels)
             
             if ml_score > 0.3:
-                reasoning_parts.append(f"ML: {ml_result.get('reasoning', 'model prediction')[:50]}")
+                reasoning_parts.append(f"ML: {get('reasoning', 'model prediction')[:50]}")
         
         # 3. Variant detection score (NEW: Direct scoring)
         variant_score = 0.0
         variant_boost = 1.0
         if variant_result:
-            if variant_result.get('has_violations'):
-                variants = variant_result.get('detected_variants', [])
-                severity = variant_result.get('overall_severity', 'low')
+            get = variant_result.get
+            has_violations = get('has_violations')
+            if has_violations:
+                variants = get('detected_variants', [])
+                severity = get('overall_severity', 'low')
                 
                 # Direct score based on severity
-                if severity == 'high':
-                    variant_score = 0.9
-                    variant_boost = 1.5
-                elif severity == 'medium':
-                    variant_score = 0.7
-                    variant_boost = 1.3
-                else:
-                    variant_score = 0.5
-                    variant_boost = 1.1
+                variant_score, variant_boost = _VARIANT_SEVERITY_SCORES.get(
+                    severity, _VARIANT_DEFAULT_SCORE
+                )
                 
                 # Add variant detection as a scored method
-                scores.append(('variant', variant_score, self.weights.VARIANT_WEIGHT))
+                weighted_sum += variant_score * w_variant
+                total_weight += w_variant
                 
                 for v in variants:
                     labels.add(v.get('normalized', 'toxicity'))
                 
                 reasoning_parts.append(f"Variant: {len(variants)} toxic words detected (severity: {severity})")
             
-            if variant_result.get('has_obfuscation') and variant_result.get('has_violations'):
-                variant_boost *= self.weights.OBFUSCATION_PENALTY
+            if has_violations and get('has_obfuscation'):
+                variant_boost *= self._obfuscation_penalty
                 reasoning_parts.append("Obfuscation detected - higher severity")
         
         # 4. Context analysis adjustment
         context_modifier = 1.0
         if context_result:
-            intent = context_result.get('intent', 'neutral')
+            get = context_result.get
+            intent = get('intent', 'neutral')
             
-            if context_result.get('is_legitimate_criticism'):
-                context_modifier *= self.weights.LEGITIMATE_CRITICISM_REDUCTION
+            if get('is_legitimate_criticism'):
+                context_modifier *= self._criticism_reduction
                 reasoning_parts.append("Context: legitimate criticism")
             
-            if context_result.get('severity_modifier', 1.0) < 0.7:
-                context_modifier *= self.weights.SAFE_CONTEXT_REDUCTION
+            if get('severity_modifier', 1.0) < 0.7:
+                context_modifier *= self._safe_context_reduction
                 reasoning_parts.append("Context: safe context detected")
             
             if intent == 'question':
-                context_modifier *= self.weights.QUESTION_REDUCTION
+                context_modifier *= self._question_reduction
             elif intent == 'hate_speech':
-                context_modifier *= self.weights.HATE_SPEECH_BOOST
+                context_modifier *= self._hate_speech_boost
                 # Force high score for hate speech
                 if variant_score < 0.9:
                     variant_score = 0.95
-                    scores.append(('hate_speech', 0.95, 0.4))
+                    weighted_sum += 0.95 * 0.4
+                    total_weight += 0.4
                 labels.add('hate')
             elif intent == 'personal_attack':
-                context_modifier *= self.weights.PERSONAL_ATTACK_BOOST
+                context_modifier *= self._personal_attack_boost
                 labels.add('harassment')
         
         # Calculate weighted score
-        if scores:
-            total_weight = sum(w for _, _, w in scores)
-            weighted_sum = sum(s * w for _, s, w in scores)
+        if total_weight > 0:
             base_score = weighted_sum / total_weight
         else:
             base_score = 0.0
@@ -296,7 +430,12 @@ class EnsembleModerator:
         else:
             final_score = base_score * context_modifier
         
-        final_score = max(0.0, min(1.0, final_score))
+        # Clamp to [0, 1]; boosts can push past 1.0, and only an out-of-range
+        # ML confidence could make the score negative
+        if final_score > 1.0:
+            final_score = 1.0
+        elif final_score < 0.0:
+            final_score = 0.0
         
         # Build reasoning
         if not reasoning_parts:
@@ -304,104 +443,303 @@ class EnsembleModerator:
         else:
             reasoning = " | ".join(reasoning_parts)
         
-        return final_score, list(labels), reasoning
+        return final_score, frozenset(labels), reasoning
     
     def _determine_action(self, score: float) -> ModerationAction:
         """Determine action based on score"""
-        if score >= self.weights.REJECT_THRESHOLD:
-            return ModerationAction.REJECT
-        elif score >= self.weights.REVIEW_THRESHOLD:
-            return ModerationAction.REVIEW
-        else:
-            return ModerationAction.ALLOWED
+        return _ACTIONS_BY_LEVEL[(score >= self._reject_threshold) + (score >= self._review_threshold)]
     
-    def moderate(self, text: str) -> ModerationResult:
+    def _is_decisive_reject(self, rule_result: Dict[str, Any]) -> bool:
+        """Check if a rule-based result is confident enough to skip other stages"""
+        return (
+            rule_result.get('action') == 'reject' and
+            rule_result.get('confidence', 1.0) >= self._reject_threshold
+        )
+    
+    def _prepare(
+        self,
+        text: str,
+        ml_executor: Optional[ThreadPoolExecutor] = None
+    ) -> _PreparedModeration:
         """
-        Run full ensemble moderation
+        Run the cheap stages (rule-based, variant, context) for one text
         
-        Args:
-            text: Input text to moderate
-            
-        Returns:
-            ModerationResult with complete analysis
-        """
-        import time
-        start_time = time.time()
+        Stages run as a cascade: a decisive rule-based reject or a
+        high-severity variant match ends moderation early and sets
+        `result`, so the expensive ML model only sees ambiguous inputs.
         
-        methods_used = []
+        If ml_executor is given and the rule-based result already requires
+        the ML model, it is started there before context analysis runs.
+        """
+        prepared = _PreparedModeration(start_ns=perf_counter_ns())
+        
+        # Nothing to moderate in empty/whitespace-only text
+        if not text or text.isspace():
+            prepared.result = ModerationResult(
+                action=ModerationAction.ALLOWED,
+                confidence=0.0,
+                reasoning="Empty text",
+                methods_used_mask=0,
+                labels=frozenset(),
+                flagged_words=[],
+            )
+            return prepared
         
         # 1. Rule-based check (fast, do first)
         rule_result = self._run_rule_based(text)
+        prepared.rule_result = rule_result
         if rule_result:
-            methods_used.append(ModerationMethod.RULE_BASED)
+            prepared.methods_mask |= _RULE_BASED_BIT
+            
+            # Cascade exit: rule-based reject is decisive
+            if self._is_decisive_reject(rule_result):
+                prepared.flagged_words = list(rule_result.get('flagged_words') or [])
+                prepared.result = self._finish(prepared)
+                return prepared
         
         # 2. Variant detection (catch obfuscation)
         variant_result = self._run_variant_detection(text)
+        prepared.variant_result = variant_result
         if variant_result:
-            methods_used.append(ModerationMethod.VARIANT_DETECTION)
+            prepared.methods_mask |= _VARIANT_DETECTION_BIT
         
         # 3. Get flagged words for context analysis
-        flagged_words = []
+        flagged_words = prepared.flagged_words
         if rule_result and rule_result.get('flagged_words'):
             flagged_words.extend(rule_result['flagged_words'])
         if variant_result and variant_result.get('detected_variants'):
             flagged_words.extend([v['normalized'] for v in variant_result['detected_variants']])
         
+        # Cascade exit: high-severity toxic variant found
+        if variant_result and variant_result.get('overall_severity') == 'high':
+            prepared.result = self._finish(prepared)
+            return prepared
+        
+        # ML is needed whatever the context says: start it now
+        if ml_executor is not None and self.ml_inference and (
+            rule_result is None or rule_result.get('action') == 'review'
+        ):
+            prepared.ml_future = ml_executor.submit(self._run_ml_model, text)
+        
         # 4. Context analysis
         context_result = self._run_context_analysis(text, flagged_words)
+        prepared.context_result = context_result
         if context_result:
-            methods_used.append(ModerationMethod.CONTEXT_ANALYSIS)
+            prepared.methods_mask |= _CONTEXT_ANALYSIS_BIT
         
-        # 5. ML model (slower, run last)
-        ml_result = None
-        # Only run ML if we need more info or inconclusive
-        needs_ml = (
+        # 5. Only run ML if we need more info or inconclusive
+        prepared.needs_ml = bool(
             rule_result is None or
             rule_result.get('action') == 'review' or
             (context_result and context_result.get('is_legitimate_criticism'))
         )
-        
-        if needs_ml:
-            ml_result = self._run_ml_model(text)
-            if ml_result:
-                methods_used.append(ModerationMethod.ML_MODEL)
+        return prepared
+    
+    def _finish(
+        self,
+        prepared: _PreparedModeration,
+        ml_result: Optional[Dict] = None
+    ) -> ModerationResult:
+        """Score the collected stage results and build the final ModerationResult"""
+        methods_mask = prepared.methods_mask | _ENSEMBLE_BIT
+        if ml_result:
+            methods_mask |= _ML_MODEL_BIT
         
         # 6. Calculate ensemble score
         score, labels, reasoning = self._calculate_ensemble_score(
-            rule_result, ml_result, context_result, variant_result
+            prepared.rule_result, ml_result, prepared.context_result, prepared.variant_result
         )
         
         # 7. Determine final action
         action = self._determine_action(score)
-        methods_used.append(ModerationMethod.ENSEMBLE)
         
         # Calculate processing time
-        processing_time = (time.time() - start_time) * 1000
+        processing_time = (perf_counter_ns() - prepared.start_ns) / 1e6
         
         # Build result
         return ModerationResult(
             action=action,
             confidence=score,
             reasoning=reasoning,
-            methods_used=methods_used,
+            methods_used_mask=methods_mask,
+            rule_based_result=prepared.rule_result,
+            ml_result=ml_result,
+            context_result=prepared.context_result,
+            variant_result=prepared.variant_result,
+            labels=labels,
+            flagged_words=prepared.flagged_words,
+            severity_score=score,
+            processing_time_ms=processing_time,
+        )
+    
+    @staticmethod
+    def _cache_key(text: str) -> str:
+        """
+        Normalized text used as the result cache key
+        
+        Case is kept: verdicts can differ between case variants of a text
+        (e.g. homoglyph checks), so they must not share a cache entry.
+        """
+        return unicodedata.normalize('NFC', text.strip())
+    
+    def _cache_get(self, key: str) -> Optional[ModerationResult]:
+        """Rebuild a fresh ModerationResult (with its stage results) from the cache, or None on miss"""
+        if not self.cache_size:
+            return None
+        with self._cache_lock:
+            frozen = self._result_cache.get(key)
+            if frozen is None:
+                return None
+            self._result_cache.move_to_end(key)
+        
+        (action, score, labels, reasoning, flagged_words, methods_mask,
+         sub_results) = frozen
+        rule_result, ml_result, context_result, variant_result = copy.deepcopy(sub_results)
+        return ModerationResult(
+            action=action,
+            confidence=score,
+            reasoning=reasoning,
+            methods_used_mask=methods_mask,
             rule_based_result=rule_result,
             ml_result=ml_result,
             context_result=context_result,
             variant_result=variant_result,
             labels=labels,
-            flagged_words=flagged_words,
+            flagged_words=list(flagged_words),
             severity_score=score,
-            processing_time_ms=processing_time,
+            processing_time_ms=0.0,
+        )
+    
+    def _cache_put(self, key: str, result: ModerationResult):
+        """Store a frozen copy of a result in the cache"""
+        if not self.cache_size:
+            return
+        frozen = (
+            result.action,
+            result.confidence,
+            frozenset(result.labels or ()),
+            result.reasoning,
+            tuple(result.flagged_words or ()),
+            result.methods_used_mask,
+            # Stage results are plain dicts: deep-copied in and out
+            copy.deepcopy((
+                result.rule_based_result,
+                result.ml_result,
+                result.context_result,
+                result.variant_result,
+            )),
+        )
+        with self._cache_lock:
+            self._result_cache[key] = frozen
+            self._result_cache.move_to_end(key)
+            while len(self._result_cache) > self.cache_size:
+                self._result_cache.popitem(last=False)
+    
+    def cache_clear(self):
+        """Drop all cached moderation results"""
+        with self._cache_lock:
+            self._result_cache.clear()
+    
+    def moderate(self, text: str) -> ModerationResult:
+        """
+        Run full ensemble moderation
+        
+        Results are cached per NFC(strip(text)), case kept. A cache hit
+        returns a new ModerationResult with copies of the per-method
+        results; only processing_time_ms differs (0).
+        
+        Args:
+            text: Input text to moderate
+            
+        Returns:
+            ModerationResult with complete analysis
+        """
+        key = self._cache_key(text)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+        
+        result = self._moderate_uncached(text)
+        self._cache_put(key, result)
+        return result
+    
+    def _moderate_uncached(self, text: str) -> ModerationResult:
+        """Run all moderation stages for one text"""
+        prepared = self._prepare(text, ml_executor=_EXECUTOR)
+        if prepared.result is not None:
+            return prepared.result
+        
+        if prepared.ml_future is not None:
+            ml_result = prepared.ml_future.result()
+        elif prepared.needs_ml:
+            ml_result = self._run_ml_model(text)
+        else:
+            ml_result = None
+        return self._finish(prepared, ml_result)
+    
+    async def moderate_async(self, text: str) -> ModerationResult:
+        """
+        Async version of moderate() for event-loop callers
+        
+        Runs moderate() on a worker thread so the event loop is not blocked.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_REQUEST_EXECUTOR, self.moderate, text)
+    
+    async def batch_moderate_async(
+        self,
+        texts: List[str],
+        batch_size: int = 32
+    ) -> List[ModerationResult]:
+        """
+        Async version of batch_moderate() for event-loop callers
+        
+        The whole batch runs on one worker thread so the ML model still
+        gets a single batched call.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            _REQUEST_EXECUTOR, self.batch_moderate, texts, batch_size
         )
     
-    def batch_moderate(self, texts: List[str]) -> List[ModerationResult]:
+    def batch_moderate(self, texts: List[str], batch_size: int = 32) -> List[ModerationResult]:
         """
         Moderate multiple texts
         
-        For better performance with ML model, considers batching
+        Cheap stages run per text; every text that still needs the ML
+        model is then sent through one batched ML call.
+        
+        Args:
+            texts: Input texts to moderate
+            batch_size: Batch size for the ML model
+            
+        Returns:
+            List of ModerationResult, aligned with texts
         """
-        # For now, just loop - can optimize later with batch ML inference
-        return [self.moderate(text) for text in texts]
+        keys = [self._cache_key(text) for text in texts]
+        results: List[Optional[ModerationResult]] = [self._cache_get(key) for key in keys]
+        
+        # Phase 1: rule-based + variant + context for every uncached text
+        prepared = {
+            i: self._prepare(text)
+            for i, text in enumerate(texts)
+            if results[i] is None
+        }
+        
+        # Phase 2: batched ML for texts that were not decided by the cascade
+        ml_indices = [
+            i for i, p in prepared.items()
+            if p.result is None and p.needs_ml
+        ]
+        ml_results = self._run_ml_model_batch([texts[i] for i in ml_indices], batch_size)
+        ml_by_index = dict(zip(ml_indices, ml_results))
+        
+        # Phase 3: ensemble scoring
+        for i, p in prepared.items():
+            results[i] = p.result if p.result is not None else self._finish(p, ml_by_index.get(i))
+            self._cache_put(keys[i], results[i])
+        
+        return results
 
 
 # ==================== CONFIDENCE CALIBRATION ====================
@@ -449,6 +787,20 @@ class MLConfidenceCalibrator:
         # Clip to valid range
         return max(0.0, min(1.0, calibrated))
     
+    def calibrate_batch(self, raw_confidences: np.ndarray, labels: List[str] = None) -> np.ndarray:
+        """
+        Calibrate many raw model confidences at once
+        
+        Args:
+            raw_confidences: Array of raw confidences from model
+            labels: Optional labels (aligned with raw_confidences) for label-specific calibration
+            
+        Returns:
+            Array of calibrated confidences, same shape as input
+        """
+        raw_confidences = np.asarray(raw_confidences, dtype=np.float64)
+        return np.clip(raw_confidences * self.scale + self.shift, 0.0, 1.0)
+    
     def get_threshold(self, label: str) -> float:
         """Get decision threshold for a label"""
         return self.label_thresholds.get(label, 0.5)
@@ -464,16 +816,16 @@ class MLConfidenceCalibrator:
         # Simple training: find optimal scale and shift
         # This is a placeholder - implement proper Platt scaling or isotonic regression
         
-        predictions = np.array(predictions)
-        ground_truth = np.array(ground_truth)
+        predictions = np.asarray(predictions)
+        ground_truth = np.asarray(ground_truth)
         
-        # Calculate basic statistics
-        tp_confidences = predictions[ground_truth == 1]
-        tn_confidences = predictions[ground_truth == 0]
+        # Calculate basic statistics (masked means, no filtered copies)
+        tp_mask = ground_truth == 1
+        tn_mask = ground_truth == 0
         
-        if len(tp_confidences) > 0 and len(tn_confidences) > 0:
-            tp_mean = np.mean(tp_confidences)
-            tn_mean = np.mean(tn_confidences)
+        if tp_mask.any() and tn_mask.any():
+            tp_mean = np.mean(predictions, where=tp_mask)
+            tn_mean = np.mean(predictions, where=tn_mask)
             
             # Adjust scale to separate true positives and true negatives
             if tp_mean > tn_mean:
@@ -485,6 +837,7 @@ class MLConfidenceCalibrator:
 # ==================== FACTORY FUNCTION ====================
 
 _ensemble_instance = None
+_ensemble_lock = threading.Lock()
 
 def create_ensemble_moderator(
     model_path: str = 'vinai/phobert-base-v2',
@@ -494,6 +847,8 @@ def create_ensemble_moderator(
     """
     Factory function to create ensemble moderator
     
+    Thread-safe: concurrent callers share one instance (and one ML model).
+    
     Args:
         model_path: Path to PhoBERT model
         device: Device for ML model ('cpu' or 'cuda')
@@ -507,28 +862,40 @@ def create_ensemble_moderator(
     if _ensemble_instance is not None:
         return _ensemble_instance
     
-    ml_inference = None
-    if use_ml:
-        try:
-            from nlp.inference_multitask import MultiTaskModerationInference
-            ml_inference = MultiTaskModerationInference(
-                model_path=model_path,
-                device=device,
-                use_context_analyzer=False  # We use our own
-            )
-            logger.info("ML inference loaded for ensemble")
-        except Exception as e:
-            logger.warning(f"Could not load ML inference: {e}")
-    
-    _ensemble_instance = EnsembleModerator(
-        ml_inference=ml_inference,
-        use_context_analyzer=True,
-        use_variant_detector=True
-    )
+    with _ensemble_lock:
+        # Another thread may have finished building it while we waited
+        if _ensemble_instance is not None:
+            return _ensemble_instance
+        
+        ml_inference = None
+        if use_ml:
+            try:
+                from nlp.inference_multitask import get_multitask_engine
+                ml_inference = get_multitask_engine(
+                    model_path,
+                    device,
+                    use_context_analyzer=False  # We use our own
+                )
+                logger.info("ML inference loaded for ensemble")
+            except Exception as e:
+                logger.warning(f"Could not load ML inference: {e}")
+        
+        _ensemble_instance = EnsembleModerator(
+            ml_inference=ml_inference,
+            use_context_analyzer=True,
+            use_variant_detector=True
+        )
     
     return _ensemble_instance
 
 
+def reset_ensemble():
+    """Drop the shared ensemble moderator (next factory call builds a new one)"""
+    global _ensemble_instance
+    with _ensemble_lock:
+        _ensemble_instance = None
+
+
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO)
     
@@ -571,7 +938,7 @@ if __name__ == "__main__":
         print(f"\n{icon} '{text[:50]}...'")
         print(f"   Action: {result.action.value}")
         print(f"   Confidence: {result.confidence:.2%}")
-        print(f"   Methods: {[m.value for m in result.methods_used]}")
+        print(f"   Methods: {[m.value for m in result.get_methods_used()]}")
         print(f"   Labels: {result.labels}")
         print(f"   Reasoning: {result.reasoning[:80]}...")
         print(f"   Time: {result.processing_time_ms:.2f}ms")
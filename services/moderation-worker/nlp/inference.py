@@ -1,11 +1,22 @@
 import torch
 from transformers import AutoTokenizer, AutoModelForSequenceClassification
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, List, Optional, Tuple
 import logging
 import os
 import re
+import threading
+from functools import lru_cache
+
+try:
+    import onnxruntime as ort
+    from optimum.onnxruntime import ORTModelForSequenceClassification, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    HAS_ONNXRUNTIME = True
+except ImportError:
+    HAS_ONNXRUNTIME = False
 
 from nlp.preprocessing import preprocess_vietnamese_text, is_text_valid
+from nlp.keyword_scanner import LexiconScanner
 from nlp.toxic_words import (
     SEVERE_PROFANITY,
     SEVERE_INSULTS,
@@ -60,31 +71,222 @@ from nlp.sentiment_words import (
 
 logger = logging.getLogger(__name__)
 
+if not HAS_ONNXRUNTIME:
+    logger.info("onnxruntime/optimum not installed - ONNX inference disabled")
+
+# File written by ORTQuantizer for the dynamic INT8 model
+ONNX_QUANTIZED_FILE = 'model_quantized.onnx'
+# Sequence length of the captured CUDA graph; longer texts run eagerly
+CUDA_GRAPH_SEQ_LEN = 64
+
+
+@lru_cache(maxsize=2048)
+def normalize_text(text: str) -> str:
+    """
+    preprocess_vietnamese_text(text.lower()), cached
+
+    The rule-based checks and the ML fallback all work on this form, and
+    the same text often arrives again (reposts, retries).
+    """
+    return preprocess_vietnamese_text(text.lower())
+
+
+@lru_cache(maxsize=None)
+def _load_shared_model(model_path: str, device: str):
+    """
+    Load tokenizer + PyTorch model once per process for (model_path, device)
+
+    Every ModerationInference in the process reuses the same weights; on
+    CPU they are also moved to shared memory, so worker processes forked
+    after loading map the same pages instead of copying them.
+
+    Returns:
+        (tokenizer, model)
+    """
+    # Check if local path exists
+    if os.path.exists(model_path):
+        logger.info("Loading from local path")
+        tokenizer = AutoTokenizer.from_pretrained(model_path)
+        model = AutoModelForSequenceClassification.from_pretrained(
+            model_path,
+            num_labels=3  # positive, neutral, negative
+        )
+    else:
+        # Download from HuggingFace
+        logger.info("Downloading model from HuggingFace")
+        tokenizer = AutoTokenizer.from_pretrained('vinai/phobert-base-v2')
+        model = AutoModelForSequenceClassification.from_pretrained(
+            'vinai/phobert-base-v2',
+            num_labels=3
+        )
+        
+        # Save for future use
+        if model_path != 'vinai/phobert-base-v2':
+            os.makedirs(model_path, exist_ok=True)
+            tokenizer.save_pretrained(model_path)
+            model.save_pretrained(model_path)
+    
+    model.to(device)
+    model.eval()
+    if device == 'cpu':
+        model.share_memory()
+    
+    return tokenizer, model
+
+
+@lru_cache(maxsize=None)
+def _load_shared_onnx_model(onnx_dir: str):
+    """
+    Load the quantized ONNX model once per process
+
+    An ONNX Runtime session is thread-safe, so one session serves every
+    ModerationInference in the process.
+    """
+    session_options = ort.SessionOptions()
+    session_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    session_options.intra_op_num_threads = int(os.getenv('ORT_THREADS', os.cpu_count() or 1))
+    # One request batch at a time per process: no inter-op thread pool
+    session_options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    session_options.inter_op_num_threads = 1
+    
+    return ORTModelForSequenceClassification.from_pretrained(
+        onnx_dir,
+        file_name=ONNX_QUANTIZED_FILE,
+        provider='CPUExecutionProvider',
+        session_options=session_options
+    )
+
+
+# Runs of word characters, i.e. the tokens delimited by \b
+_WORD_TOKEN_PATTERN = re.compile(r'\w+')
+
+# Context words used by detect_toxic_words
+PERSONAL_PRONOUNS = frozenset(['mày', 'mi', 'tao', 'tau', 'm', 't'])
+PRODUCT_REVIEW_KEYWORDS = frozenset(['sản phẩm', 'san pham', 'dịch vụ', 'dich vu', 'shop', 'cửa hàng', 'cua hang'])
+INTELLIGENCE_INSULTS = frozenset({'ngu', 'ngu ngốc', 'ngu người', 'đần', 'đần độn', 'ngớ ngẩn', 'stupid', 'idiot', 'moron', 'dumb'})
+
+# Common Vietnamese words that TOXIC_PATTERNS also match (false positives)
+COMMON_FALSE_POSITIVES = frozenset({
+    'các', 'cách', 'cục', 'cắc', 'cạc',  # Similar to cặc
+    'người', 'nguồn', 'nguyên', 'ngủ',   # Similar to ngu
+    'dùng', 'dũng', 'dũ',                 # Similar to đụ
+    'lòng', 'lồng', 'long',               # Similar to lồn
+    'đột',                                # Random
+    'đề', 'để', 'đe', 'dề', 'dể', 'de',   # Similar to đéo
+    'deo', 'đeo'                          # đeo (wear) is NOT đéo
+})
+
+# TOXIC_PATTERNS compiled once. The union only tells whether any pattern
+# matches at all: each pattern's matches are still counted separately
+# (overlapping patterns each add to the score), so it cannot replace them.
+# The patterns are all lowercase and only ever run on normalize_text()
+# output, so no re.IGNORECASE is needed
+_TOXIC_PATTERN_REGEXES = [re.compile(pattern) for pattern in TOXIC_PATTERNS]
+_ANY_TOXIC_PATTERN = re.compile('|'.join(f'(?:{pattern})' for pattern in TOXIC_PATTERNS))
+
+# Whole-word toxic lists, scanned in one pass by detect_toxic_words
+_TOXIC_WORD_SCANNER = LexiconScanner({
+    'hate_lgbtq': HATE_LGBTQ,
+    'hate_racism': HATE_RACISM,
+    'hate_religion': HATE_RELIGION,
+    'hate_sexism': HATE_SEXISM,
+    'sexual_explicit': SEXUAL_EXPLICIT,
+    'sexual_suggestive': SEXUAL_SUGGESTIVE,
+    'severe_profanity': SEVERE_PROFANITY,
+    'severe_insults': SEVERE_INSULTS,
+    'moderate_negative': MODERATE_NEGATIVE,
+    'personal_attacks': PERSONAL_ATTACKS,
+})
+
+# Lists matched as plain substrings (no word boundary needed for phrases)
+_TOXIC_PHRASE_SCANNER = LexiconScanner({
+    'allowed': ALLOWED_PHRASES,
+    'sexual_solicitation': SEXUAL_SOLICITATION,
+    'spam': SPAM_INDICATORS,
+}, whole_word=False)
+
+# Sentiment lists, scanned in one pass by analyze_sentiment_rule_based
+_SENTIMENT_WORD_SCANNER = LexiconScanner({
+    'highly_positive': HIGHLY_POSITIVE,
+    'moderately_positive': MODERATELY_POSITIVE,
+    'slightly_positive': SLIGHTLY_POSITIVE,
+    'highly_negative': HIGHLY_NEGATIVE,
+    'moderately_negative': MODERATELY_NEGATIVE,
+    'slightly_negative': SLIGHTLY_NEGATIVE,
+    'neutral': NEUTRAL_WORDS,
+})
+
+_SENTIMENT_PHRASE_SCANNER = LexiconScanner({
+    'positive': POSITIVE_PHRASES,
+    'negative': NEGATIVE_PHRASES,
+}, whole_word=False)
+
+# Emoji/emoticons; several are more than one code point (':D', '❤️', 'T_T')
+_EMOJI_SCANNER = LexiconScanner({
+    'positive': POSITIVE_EMOJIS,
+    'negative': NEGATIVE_EMOJIS,
+}, whole_word=False)
+
 
 class ModerationInference:
     """NLP inference for Vietnamese text moderation"""
     
-    def __init__(self, model_path: str = None, device: str = 'cpu'):
+    def __init__(
+        self,
+        model_path: str = None,
+        device: str = 'cpu',
+        use_onnx: bool = False,
+        compile_model: bool = False,
+        use_cuda_graphs: bool = False
+    ):
+        """
+        Args:
+            model_path: Đường dẫn model (hoặc tên model trên HuggingFace)
+            device: 'cpu' hoặc 'cuda'
+            use_onnx: Chạy model bằng ONNX Runtime (INT8) thay cho PyTorch, chỉ trên CPU
+            compile_model: Dùng torch.compile cho model PyTorch
+            use_cuda_graphs: Dùng CUDA Graph cho câu đơn ngắn (chỉ trên GPU)
+        """
         self.model_path = model_path or 'vinai/phobert-base-v2'
         self.device = device
+        self.compile_model = compile_model
         self.tokenizer = None
         self.model = None
         
+        # ONNX Runtime model (same call interface as the PyTorch model)
+        self.use_onnx = use_onnx and HAS_ONNXRUNTIME and device == 'cpu'
+        self.ort_model = None
+        if os.path.isdir(self.model_path):
+            self.onnx_dir = os.path.join(self.model_path, 'onnx')
+        else:
+            self.onnx_dir = os.path.join('models', 'phobert-onnx')
+        
+        # CUDA graph for one text of up to CUDA_GRAPH_SEQ_LEN tokens
+        self.use_cuda_graphs = use_cuda_graphs and device.startswith('cuda')
+        self.cuda_graph = None
+        self._cuda_graph_lock = threading.Lock()
+        
         self.sentiment_labels = ['positive', 'neutral', 'negative']
         self.moderation_labels = ['allowed', 'review', 'reject']
         
         self.load_model()
     
-    def analyze_sentiment_rule_based(self, text: str) -> Dict[str, Any]:
+    def analyze_sentiment_rule_based(self, text: str, normalized_text: str = None) -> Dict[str, Any]:
         """
         Analyze sentiment using rule-based approach
         Excellent for short texts where ML models struggle
         
+        Args:
+            text: Input text
+            normalized_text: normalize_text(text), nếu đã tính sẵn
+        
         Returns:
             Dict with sentiment, score, confidence, matched_words
         """
-        text_lower = text.lower()
-        normalized_text = preprocess_vietnamese_text(text_lower)
+        if normalized_text is None:
+            normalized_text = normalize_text(text)
+        word_hits = _SENTIMENT_WORD_SCANNER.scan(normalized_text)
+        phrase_hits = _SENTIMENT_PHRASE_SCANNER.scan(normalized_text)
         
         sentiment_score = 0
         matched_positive = []
@@ -104,76 +306,59 @@ class ModerationInference:
             if intensifier in normalized_text:
                 intensifier_multiplier = max(intensifier_multiplier, multiplier)
         
-        # Check emojis first (strong signals)
-        for emoji in POSITIVE_EMOJIS:
-            if emoji in text:
-                sentiment_score += EMOJI_SCORE['POSITIVE']
-                matched_positive.append(emoji)
+        # Check emojis first (strong signals), on the raw text
+        emoji_hits = _EMOJI_SCANNER.scan(text)
+        for emoji in emoji_hits['positive']:
+            sentiment_score += EMOJI_SCORE['POSITIVE']
+            matched_positive.append(emoji)
         
-        for emoji in NEGATIVE_EMOJIS:
-            if emoji in text:
-                sentiment_score += EMOJI_SCORE['NEGATIVE']
-                matched_negative.append(emoji)
+        for emoji in emoji_hits['negative']:
+            sentiment_score += EMOJI_SCORE['NEGATIVE']
+            matched_negative.append(emoji)
         
         # Check positive phrases (multi-word expressions)
-        for phrase in POSITIVE_PHRASES:
-            if phrase in normalized_text:
-                sentiment_score += PHRASE_SCORE['POSITIVE']
-                matched_positive.append(phrase)
+        for phrase in phrase_hits['positive']:
+            sentiment_score += PHRASE_SCORE['POSITIVE']
+            matched_positive.append(phrase)
         
         # Check negative phrases
-        for phrase in NEGATIVE_PHRASES:
-            if phrase in normalized_text:
-                sentiment_score += PHRASE_SCORE['NEGATIVE']
-                matched_negative.append(phrase)
+        for phrase in phrase_hits['negative']:
+            sentiment_score += PHRASE_SCORE['NEGATIVE']
+            matched_negative.append(phrase)
         
         # Check highly positive words
-        for word in HIGHLY_POSITIVE:
-            pattern = r'\b' + re.escape(word) + r'\b'
-            if re.search(pattern, normalized_text, re.IGNORECASE):
-                sentiment_score += SENTIMENT_SCORES['HIGHLY_POSITIVE']
-                matched_positive.append(word)
+        for word in word_hits['highly_positive']:
+            sentiment_score += SENTIMENT_SCORES['HIGHLY_POSITIVE']
+            matched_positive.append(word)
         
         # Check moderately positive words
-        for word in MODERATELY_POSITIVE:
-            pattern = r'\b' + re.escape(word) + r'\b'
-            if re.search(pattern, normalized_text, re.IGNORECASE):
-                sentiment_score += SENTIMENT_SCORES['MODERATELY_POSITIVE']
-                matched_positive.append(word)
+        for word in word_hits['moderately_positive']:
+            sentiment_score += SENTIMENT_SCORES['MODERATELY_POSITIVE']
+            matched_positive.append(word)
         
         # Check slightly positive words
-        for word in SLIGHTLY_POSITIVE:
-            pattern = r'\b' + re.escape(word) + r'\b'
-            if re.search(pattern, normalized_text, re.IGNORECASE):
-                sentiment_score += SENTIMENT_SCORES['SLIGHTLY_POSITIVE']
-                matched_positive.append(word)
+        for word in word_hits['slightly_positive']:
+            sentiment_score += SENTIMENT_SCORES['SLIGHTLY_POSITIVE']
+            matched_positive.append(word)
         
         # Check highly negative words (non-toxic)
-        for word in HIGHLY_NEGATIVE:
-            pattern = r'\b' + re.escape(word) + r'\b'
-            if re.search(pattern, normalized_text, re.IGNORECASE):
-                sentiment_score += SENTIMENT_SCORES['HIGHLY_NEGATIVE']
-                matched_negative.append(word)
+        for word in word_hits['highly_negative']:
+            sentiment_score += SENTIMENT_SCORES['HIGHLY_NEGATIVE']
+            matched_negative.append(word)
         
         # Check moderately negative words
-        for word in MODERATELY_NEGATIVE:
-            pattern = r'\b' + re.escape(word) + r'\b'
-            if re.search(pattern, normalized_text, re.IGNORECASE):
-                sentiment_score += SENTIMENT_SCORES['MODERATELY_NEGATIVE']
-                matched_negative.append(word)
+        for word in word_hits['moderately_negative']:
+            sentiment_score += SENTIMENT_SCORES['MODERATELY_NEGATIVE']
+            matched_negative.append(word)
         
         # Check slightly negative words
-        for word in SLIGHTLY_NEGATIVE:
-            pattern = r'\b' + re.escape(word) + r'\b'
-            if re.search(pattern, normalized_text, re.IGNORECASE):
-                sentiment_score += SENTIMENT_SCORES['SLIGHTLY_NEGATIVE']
-                matched_negative.append(word)
+        for word in word_hits['slightly_negative']:
+            sentiment_score += SENTIMENT_SCORES['SLIGHTLY_NEGATIVE']
+            matched_negative.append(word)
         
         # Check neutral words
-        for word in NEUTRAL_WORDS:
-            pattern = r'\b' + re.escape(word) + r'\b'
-            if re.search(pattern, normalized_text, re.IGNORECASE):
-                matched_neutral.append(word)
+        for word in word_hits['neutral']:
+            matched_neutral.append(word)
         
         # Apply intensifier
         if intensifier_multiplier > 1.0 and sentiment_score != 0:
@@ -205,7 +390,7 @@ class ModerationInference:
             'intensifier': intensifier_multiplier
         }
     
-    def detect_toxic_words(self, text: str) -> Tuple[int, List[str], Dict[str, Any]]:
+    def detect_toxic_words(self, text: str, normalized_text: str = None) -> Tuple[int, List[str], Dict[str, Any]]:
         """
         Detect toxic/profanity words with ENTERPRISE-LEVEL detection
         
@@ -216,21 +401,28 @@ class ModerationInference:
         - Auto-reject categories
         - Enhanced pattern matching
         
+        Args:
+            text: Input text
+            normalized_text: normalize_text(text), nếu đã tính sẵn
+        
         Returns:
             (severity_score, flagged_words, details)
         """
-        text_lower = text.lower()
-        normalized_text = preprocess_vietnamese_text(text_lower)
+        if normalized_text is None:
+            normalized_text = normalize_text(text)
+        
+        # One pass per scanner finds every listed word/phrase in the text
+        word_hits = _TOXIC_WORD_SCANNER.scan(normalized_text)
+        phrase_hits = _TOXIC_PHRASE_SCANNER.scan(normalized_text)
         
         # Collect allowed words found in text (for skipping in pattern matching)
         # Don't return early - just track which words should be excluded
         allowed_words_in_text = set()
-        for phrase in ALLOWED_PHRASES:
-            if phrase in normalized_text:
-                allowed_words_in_text.add(phrase)
-                # Also add individual words from phrase
-                for word in phrase.split():
-                    allowed_words_in_text.add(word)
+        for phrase in phrase_hits['allowed']:
+            allowed_words_in_text.add(phrase)
+            # Also add individual words from phrase
+            for word in phrase.split():
+                allowed_words_in_text.add(word)
         
         # ===== CONTEXT DETECTION =====
         context_flags = {
@@ -249,18 +441,16 @@ class ModerationInference:
                 break
         
         # Check for product review context
-        product_review_keywords = ['sản phẩm', 'san pham', 'dịch vụ', 'dich vu', 'shop', 'cửa hàng', 'cua hang']
-        for keyword in product_review_keywords:
+        for keyword in PRODUCT_REVIEW_KEYWORDS:
             if keyword in normalized_text:
                 context_flags['is_product_review'] = True
                 break
         
         # Check for personal pronouns (attack on person)
-        personal_pronouns = ['mày', 'mi', 'tao', 'tau', 'm', 't']
-        for pronoun in personal_pronouns:
-            if re.search(r'\b' + re.escape(pronoun) + r'\b', normalized_text):
-                context_flags['has_personal_pronoun'] = True
-                break
+        # \bpronoun\b on a single word == pronoun is one of the \w+ tokens
+        tokens = _WORD_TOKEN_PATTERN.findall(normalized_text)
+        if not PERSONAL_PRONOUNS.isdisjoint(tokens):
+            context_flags['has_personal_pronoun'] = True
         
         # Check for severity boosters
         for booster in SEVERITY_BOOSTERS:
@@ -275,7 +465,7 @@ class ModerationInference:
                 break
         
         # ===== WORD DETECTION =====
-        flagged_words = []
+        flagged_words = set()
         severity_score = 0
         auto_reject_reason = None
         category_hits = {
@@ -296,111 +486,88 @@ class ModerationInference:
         
         # ===== 1. HATE SPEECH DETECTION (HIGHEST PRIORITY) =====
         # LGBTQ+ hate
-        for word in HATE_LGBTQ:
-            pattern = r'\b' + re.escape(word) + r'\b'
-            if re.search(pattern, normalized_text, re.IGNORECASE):
-                flagged_words.append(word)
-                category_hits['hate_lgbtq'].append(word)
-                severity_score += SEVERITY_SCORES['HATE_LGBTQ']
-                context_flags['targeting_group'] = True
-                auto_reject_reason = f"Hate speech: LGBTQ+ discrimination - {word}"
+        for word in word_hits['hate_lgbtq']:
+            flagged_words.add(word)
+            category_hits['hate_lgbtq'].append(word)
+            severity_score += SEVERITY_SCORES['HATE_LGBTQ']
+            context_flags['targeting_group'] = True
+            auto_reject_reason = f"Hate speech: LGBTQ+ discrimination - {word}"
         
         # Racism
-        for word in HATE_RACISM:
-            pattern = r'\b' + re.escape(word) + r'\b'
-            if re.search(pattern, normalized_text, re.IGNORECASE):
-                flagged_words.append(word)
-                category_hits['hate_racism'].append(word)
-                severity_score += SEVERITY_SCORES['HATE_RACISM']
-                context_flags['targeting_group'] = True
-                auto_reject_reason = f"Hate speech: Racial discrimination - {word}"
+        for word in word_hits['hate_racism']:
+            flagged_words.add(word)
+            category_hits['hate_racism'].append(word)
+            severity_score += SEVERITY_SCORES['HATE_RACISM']
+            context_flags['targeting_group'] = True
+            auto_reject_reason = f"Hate speech: Racial discrimination - {word}"
         
         # Religious hate
-        for word in HATE_RELIGION:
-            pattern = r'\b' + re.escape(word) + r'\b'
-            if re.search(pattern, normalized_text, re.IGNORECASE):
-                flagged_words.append(word)
-                category_hits['hate_religion'].append(word)
-                severity_score += SEVERITY_SCORES['HATE_RELIGION']
-                context_flags['targeting_group'] = True
-                auto_reject_reason = f"Hate speech: Religious discrimination - {word}"
+        for word in word_hits['hate_religion']:
+            flagged_words.add(word)
+            category_hits['hate_religion'].append(word)
+            severity_score += SEVERITY_SCORES['HATE_RELIGION']
+            context_flags['targeting_group'] = True
+            auto_reject_reason = f"Hate speech: Religious discrimination - {word}"
         
         # Sexism
-        for word in HATE_SEXISM:
-            pattern = r'\b' + re.escape(word) + r'\b'
-            if re.search(pattern, normalized_text, re.IGNORECASE):
-                flagged_words.append(word)
-                category_hits['hate_sexism'].append(word)
-                severity_score += SEVERITY_SCORES['HATE_SEXISM']
-                context_flags['targeting_group'] = True
-                auto_reject_reason = f"Hate speech: Gender discrimination - {word}"
+        for word in word_hits['hate_sexism']:
+            flagged_words.add(word)
+            category_hits['hate_sexism'].append(word)
+            severity_score += SEVERITY_SCORES['HATE_SEXISM']
+            context_flags['targeting_group'] = True
+            auto_reject_reason = f"Hate speech: Gender discrimination - {word}"
         
         # ===== 2. SEXUAL CONTENT DETECTION =====
         # Explicit sexual content
-        for word in SEXUAL_EXPLICIT:
-            pattern = r'\b' + re.escape(word) + r'\b'
-            if re.search(pattern, normalized_text, re.IGNORECASE):
-                flagged_words.append(word)
-                category_hits['sexual_explicit'].append(word)
-                severity_score += SEVERITY_SCORES['SEXUAL_EXPLICIT']
-                auto_reject_reason = f"Explicit pornographic content - {word}"
+        for word in word_hits['sexual_explicit']:
+            flagged_words.add(word)
+            category_hits['sexual_explicit'].append(word)
+            severity_score += SEVERITY_SCORES['SEXUAL_EXPLICIT']
+            auto_reject_reason = f"Explicit pornographic content - {word}"
         
         # Suggestive sexual content
-        for word in SEXUAL_SUGGESTIVE:
-            pattern = r'\b' + re.escape(word) + r'\b'
-            if re.search(pattern, normalized_text, re.IGNORECASE):
-                flagged_words.append(word)
-                category_hits['sexual_suggestive'].append(word)
-                severity_score += SEVERITY_SCORES['SEXUAL_SUGGESTIVE']
+        for word in word_hits['sexual_suggestive']:
+            flagged_words.add(word)
+            category_hits['sexual_suggestive'].append(word)
+            severity_score += SEVERITY_SCORES['SEXUAL_SUGGESTIVE']
         
         # Sexual solicitation
-        for word in SEXUAL_SOLICITATION:
-            if word in normalized_text:  # Không cần word boundary cho phrases
-                flagged_words.append(word)
-                category_hits['sexual_solicitation'].append(word)
-                severity_score += SEVERITY_SCORES['SEXUAL_SOLICITATION']
-                auto_reject_reason = f"Sexual solicitation - {word}"
+        for word in phrase_hits['sexual_solicitation']:
+            flagged_words.add(word)
+            category_hits['sexual_solicitation'].append(word)
+            severity_score += SEVERITY_SCORES['SEXUAL_SOLICITATION']
+            auto_reject_reason = f"Sexual solicitation - {word}"
         
         # ===== 3. PROFANITY & INSULTS =====
         # Severe profanity
-        for word in SEVERE_PROFANITY:
-            pattern = r'\b' + re.escape(word) + r'\b'
-            if re.search(pattern, normalized_text, re.IGNORECASE):
-                flagged_words.append(word)
-                category_hits['severe_profanity'].append(word)
-                severity_score += SEVERITY_SCORES['SEVERE_PROFANITY']
+        for word in word_hits['severe_profanity']:
+            flagged_words.add(word)
+            category_hits['severe_profanity'].append(word)
+            severity_score += SEVERITY_SCORES['SEVERE_PROFANITY']
         
         # Severe insults (với context awareness)
-        intelligence_insults = {'ngu', 'ngu ngốc', 'ngu người', 'đần', 'đần độn', 'ngớ ngẩn', 'stupid', 'idiot', 'moron', 'dumb'}
-        
-        for word in SEVERE_INSULTS:
-            pattern = r'\b' + re.escape(word) + r'\b'
-            if re.search(pattern, normalized_text, re.IGNORECASE):
-                # Allow opinion criticism (e.g., "quan điểm ngu si")
-                if context_flags['is_opinion_criticism'] and word in intelligence_insults:
-                    continue  # Skip - allowed
-                
-                flagged_words.append(word)
-                category_hits['severe_insults'].append(word)
-                severity_score += SEVERITY_SCORES['SEVERE_INSULTS']
+        for word in word_hits['severe_insults']:
+            # Allow opinion criticism (e.g., "quan điểm ngu si")
+            if context_flags['is_opinion_criticism'] and word in INTELLIGENCE_INSULTS:
+                continue  # Skip - allowed
+            
+            flagged_words.add(word)
+            category_hits['severe_insults'].append(word)
+            severity_score += SEVERITY_SCORES['SEVERE_INSULTS']
         
         # ===== 4. MODERATE VIOLATIONS =====
         # Moderate negative
-        for word in MODERATE_NEGATIVE:
-            pattern = r'\b' + re.escape(word) + r'\b'
-            if re.search(pattern, normalized_text, re.IGNORECASE):
-                flagged_words.append(word)
-                category_hits['moderate_negative'].append(word)
-                severity_score += SEVERITY_SCORES['MODERATE_NEGATIVE']
+        for word in word_hits['moderate_negative']:
+            flagged_words.add(word)
+            category_hits['moderate_negative'].append(word)
+            severity_score += SEVERITY_SCORES['MODERATE_NEGATIVE']
         
         # Personal attacks - ONLY add to score if there are other violations
         # "mày, tao" alone is NOT a violation - it's casual Vietnamese speech
         personal_attack_words_found = []
-        for word in PERSONAL_ATTACKS:
-            pattern = r'\b' + re.escape(word) + r'\b'
-            if re.search(pattern, normalized_text, re.IGNORECASE):
-                personal_attack_words_found.append(word)
-                category_hits['personal_attacks'].append(word)
+        for word in word_hits['personal_attacks']:
+            personal_attack_words_found.append(word)
+            category_hits['personal_attacks'].append(word)
         
         # Only count PERSONAL_ATTACKS if there are OTHER violations (profanity, insults, etc)
         has_other_violations = (
@@ -418,42 +585,32 @@ class ModerationInference:
         
         if personal_attack_words_found and has_other_violations:
             # Add to flagged words and score ONLY if combined with real violations
-            flagged_words.extend(personal_attack_words_found)
+            flagged_words.update(personal_attack_words_found)
             severity_score += SEVERITY_SCORES['PERSONAL_ATTACKS'] * len(personal_attack_words_found)
         
         # Spam indicators
-        for word in SPAM_INDICATORS:
-            if word in normalized_text:
-                flagged_words.append(word)
-                category_hits['spam'].append(word)
-                severity_score += SEVERITY_SCORES['SPAM_INDICATORS']
+        for word in phrase_hits['spam']:
+            flagged_words.add(word)
+            category_hits['spam'].append(word)
+            severity_score += SEVERITY_SCORES['SPAM_INDICATORS']
         
         # ===== 5. PATTERN MATCHING =====
-        for pattern in TOXIC_PATTERNS:
-            matches = re.findall(pattern, normalized_text, re.IGNORECASE)
-            if matches:
-                for match in matches:
-                    # CRITICAL: Skip if match is an allowed word (e.g., "các" matched by "cặc" pattern)
+        if _ANY_TOXIC_PATTERN.search(normalized_text):
+            # CRITICAL: Skip allowed words (e.g., "các" matched by "cặc" pattern)
+            # and common Vietnamese words that are false positives
+            skip_set = allowed_words_in_text | COMMON_FALSE_POSITIVES
+            for pattern in _TOXIC_PATTERN_REGEXES:
+                kept = []
+                for match in pattern.findall(normalized_text):
                     match_lower = match.lower() if isinstance(match, str) else str(match).lower()
-                    if match_lower in allowed_words_in_text:
-                        logger.debug(f"Skipping allowed word in pattern match: {match}")
-                        continue
-                    # Also skip common Vietnamese words that are false positives
-                    common_words = {
-                        'các', 'cách', 'cục', 'cắc', 'cạc',  # Similar to cặc
-                        'người', 'nguồn', 'nguyên', 'ngủ',   # Similar to ngu
-                        'dùng', 'dũng', 'dũ',                 # Similar to đụ
-                        'lòng', 'lồng', 'long',               # Similar to lồn
-                        'đột',                                # Random
-                        'đề', 'để', 'đe', 'dề', 'dể', 'de',   # Similar to đéo
-                        'deo', 'đeo'                          # đeo (wear) is NOT đéo
-                    }
-                    if match_lower in common_words:
-                        logger.debug(f"Skipping common Vietnamese word: {match}")
+                    if match_lower in skip_set:
+                        logger.debug(f"Skipping allowed/common word in pattern match: {match}")
                         continue
-                    flagged_words.append(match)
-                    category_hits['patterns'].append(match)
-                severity_score += SEVERITY_SCORES['TOXIC_PATTERNS'] * len([m for m in matches if m.lower() not in allowed_words_in_text and m.lower() not in common_words])
+                    kept.append(match)
+                if kept:
+                    flagged_words.update(kept)
+                    category_hits['patterns'].extend(kept)
+                    severity_score += SEVERITY_SCORES['TOXIC_PATTERNS'] * len(kept)
         
         # ===== APPLY CONTEXT MULTIPLIERS =====
         original_score = severity_score
@@ -482,8 +639,8 @@ class ModerationInference:
         if context_flags['has_negation']:
             severity_score = int(severity_score * CONTEXT_MULTIPLIERS['has_negation'])
         
-        # Remove duplicates
-        flagged_words = list(set(flagged_words))
+        # Duplicates were already dropped by the set
+        flagged_words = list(flagged_words)
         
         details = {
             'category_hits': category_hits,
@@ -502,31 +659,38 @@ class ModerationInference:
         try:
             logger.info(f"Loading model from {self.model_path}")
             
-            # Check if local path exists
-            if os.path.exists(self.model_path):
-                logger.info("Loading from local path")
-                self.tokenizer = AutoTokenizer.from_pretrained(self.model_path)
-                self.model = AutoModelForSequenceClassification.from_pretrained(
-                    self.model_path,
-                    num_labels=3  # positive, neutral, negative
-                )
-            else:
-                # Download from HuggingFace
-                logger.info("Downloading model from HuggingFace")
-                self.tokenizer = AutoTokenizer.from_pretrained('vinai/phobert-base-v2')
-                self.model = AutoModelForSequenceClassification.from_pretrained(
-                    'vinai/phobert-base-v2',
-                    num_labels=3
-                )
-                
-                # Save for future use
-                if self.model_path != 'vinai/phobert-base-v2':
-                    os.makedirs(self.model_path, exist_ok=True)
-                    self.tokenizer.save_pretrained(self.model_path)
-                    self.model.save_pretrained(self.model_path)
+            # Reuse a previous ONNX export without loading PyTorch weights
+            if self.use_onnx and os.path.exists(os.path.join(self.onnx_dir, ONNX_QUANTIZED_FILE)):
+                self.tokenizer = AutoTokenizer.from_pretrained(self.onnx_dir)
+                self._load_onnx_model()
+                logger.info("ONNX model loaded successfully")
+                return
+            
+            self.tokenizer, self.model = _load_shared_model(self.model_path, self.device)
+            
+            if self.use_onnx:
+                try:
+                    self.export_onnx()
+                    self._load_onnx_model()
+                except Exception as e:
+                    logger.warning(f"ONNX export failed, using PyTorch: {e}")
+                    self.ort_model = None
             
-            self.model.to(self.device)
-            self.model.eval()
+            if self.ort_model is None:
+                # FP16 on GPU (Tensor Cores); CPU stays FP32
+                if self.device.startswith('cuda'):
+                    self.model.half()
+                else:
+                    torch.set_num_threads(int(os.getenv('TORCH_THREADS', torch.get_num_threads())))
+                # Input length varies per batch, so compile for dynamic shapes
+                if self.compile_model and hasattr(torch, 'compile'):
+                    self.model = torch.compile(self.model, dynamic=True)
+                elif self.use_cuda_graphs:
+                    try:
+                        self._capture_cuda_graph()
+                    except Exception as e:
+                        logger.warning(f"CUDA graph capture failed, running eagerly: {e}")
+                        self.cuda_graph = None
             
             logger.info("Model loaded successfully")
         
@@ -534,6 +698,87 @@ class ModerationInference:
             logger.error(f"Failed to load model: {e}")
             raise
     
+    def _capture_cuda_graph(self):
+        """
+        Capture one forward pass of shape [1, CUDA_GRAPH_SEQ_LEN] into a CUDA graph
+        
+        Replaying it skips the per-kernel launch cost, which dominates at
+        batch size 1. Inputs are copied into the static buffers below and
+        padded positions are masked out, so results match the eager model.
+        """
+        shape = (1, CUDA_GRAPH_SEQ_LEN)
+        self.static_input_ids = torch.full(
+            shape, self.tokenizer.pad_token_id, dtype=torch.long, device=self.device
+        )
+        self.static_attention_mask = torch.ones(shape, dtype=torch.long, device=self.device)
+        
+        with torch.inference_mode():
+            # Warm up on a side stream (cuBLAS handles, autotuning) before capture
+            stream = torch.cuda.Stream()
+            stream.wait_stream(torch.cuda.current_stream())
+            with torch.cuda.stream(stream):
+                for _ in range(3):
+                    self.model(input_ids=self.static_input_ids, attention_mask=self.static_attention_mask)
+            torch.cuda.current_stream().wait_stream(stream)
+            
+            graph = torch.cuda.CUDAGraph()
+            with torch.cuda.graph(graph):
+                self.static_logits = self.model(
+                    input_ids=self.static_input_ids,
+                    attention_mask=self.static_attention_mask
+                ).logits
+        
+        self.cuda_graph = graph
+        logger.info(f"CUDA graph captured for sequence length {CUDA_GRAPH_SEQ_LEN}")
+    
+    def _replay_cuda_graph(self, inputs: Dict[str, torch.Tensor]) -> torch.Tensor:
+        """Run one tokenized text (CPU tensors) through the captured graph"""
+        length = inputs['input_ids'].shape[1]
+        with self._cuda_graph_lock:
+            self.static_input_ids.fill_(self.tokenizer.pad_token_id)
+            self.static_attention_mask.zero_()
+            self.static_input_ids[:, :length].copy_(inputs['input_ids'], non_blocking=True)
+            self.static_attention_mask[:, :length].copy_(inputs['attention_mask'], non_blocking=True)
+            self.cuda_graph.replay()
+            return self.static_logits.clone()
+    
+    def export_onnx(self, output_dir: str = None) -> str:
+        """
+        Export the loaded PyTorch model to ONNX and quantize it to INT8
+        
+        Args:
+            output_dir: Thư mục lưu model ONNX (mặc định self.onnx_dir)
+        
+        Returns:
+            Path of the quantized ONNX model
+        """
+        output_dir = output_dir or self.onnx_dir
+        os.makedirs(output_dir, exist_ok=True)
+        
+        # Export from the weights actually in use, not a fresh download
+        if os.path.isdir(self.model_path):
+            source_dir = self.model_path
+        else:
+            source_dir = os.path.join(output_dir, 'pytorch')
+            self.tokenizer.save_pretrained(source_dir)
+            self.model.save_pretrained(source_dir)
+        
+        logger.info(f"Exporting ONNX model to {output_dir}")
+        ort_model = ORTModelForSequenceClassification.from_pretrained(source_dir, export=True)
+        ort_model.save_pretrained(output_dir)
+        self.tokenizer.save_pretrained(output_dir)
+        
+        # Dynamic INT8 quantization of the weights (no calibration data needed)
+        quantizer = ORTQuantizer.from_pretrained(ort_model)
+        qconfig = AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False)
+        quantizer.quantize(save_dir=output_dir, quantization_config=qconfig)
+        
+        return os.path.join(output_dir, ONNX_QUANTIZED_FILE)
+    
+    def _load_onnx_model(self):
+        """Load the quantized ONNX model into an ONNX Runtime session"""
+        self.ort_model = _load_shared_onnx_model(self.onnx_dir)
+    
     def predict(self, text: str) -> Dict[str, Any]:
         """
         Predict sentiment and moderation result
@@ -544,10 +789,31 @@ class ModerationInference:
         Returns:
             Dict with sentiment, moderation_result, confidence, reasoning
         """
+        # Normalize once, for the rule-based checks and the ML model alike
+        normalized_text = normalize_text(text)
+        result = self._predict_rule_based(text, normalized_text)
+        if result is not None:
+            return result
+        return self._predict_ml([normalized_text])[0]
+    
+    def _predict_rule_based(self, text: str, normalized_text: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Rule-based part of predict()
+        
+        Args:
+            text: Input Vietnamese text
+            normalized_text: normalize_text(text), if already computed
+        
+        Returns:
+            Prediction dict, or None when the ML model has to decide
+        """
+        if normalized_text is None:
+            normalized_text = normalize_text(text)
+        
         # CRITICAL: First check for toxic words (rule-based - HIGHEST PRIORITY)
         # This MUST happen before sentiment analysis to catch sexual/hate content
         # that might contain positive words like "xinh", "đẹp"
-        severity_score, flagged_words, toxicity_details = self.detect_toxic_words(text)
+        severity_score, flagged_words, toxicity_details = self.detect_toxic_words(text, normalized_text)
         
         # Determine action based on severity score
         if severity_score >= REJECT_THRESHOLD:
@@ -591,7 +857,7 @@ class ModerationInference:
         # For short texts (1-3 words), use rule-based sentiment analysis
         # ML models struggle with very short texts
         if word_count <= 3:
-            sentiment_result = self.analyze_sentiment_rule_based(text)
+            sentiment_result = self.analyze_sentiment_rule_based(text, normalized_text)
             
             # If no sentiment detected, default to neutral
             if sentiment_result['score'] == 0 and not sentiment_result['matched_positive'] and not sentiment_result['matched_negative']:
@@ -633,7 +899,7 @@ class ModerationInference:
         # 1. Try rule-based first for better accuracy
         # 2. Fall back to ML model if rule-based is inconclusive
         
-        sentiment_result = self.analyze_sentiment_rule_based(text)
+        sentiment_result = self.analyze_sentiment_rule_based(text, normalized_text)
         
         # If rule-based found clear sentiment (score != 0), use it
         if abs(sentiment_result['score']) >= 5:
@@ -661,44 +927,75 @@ class ModerationInference:
                 'sentiment_score': sentiment_result['score']
             }
         
-        # Fall back to ML model for ambiguous cases
-        # Preprocess
-        preprocessed_text = preprocess_vietnamese_text(text)
-        
-        # Tokenize
-        inputs = self.tokenizer(
-            preprocessed_text,
-            max_length=256,
-            padding='max_length',
-            truncation=True,
-            return_tensors='pt'
-        )
-        
-        # Move to device
-        inputs = {k: v.to(self.device) for k, v in inputs.items()}
+        # Ambiguous - the ML model decides
+        return None
+    
+    def _predict_ml(self, normalized_texts: List[str], batch_size: int = 32) -> List[Dict[str, Any]]:
+        """
+        Run the PhoBERT fallback, one forward pass per batch of texts
         
-        # Inference
-        with torch.no_grad():
-            outputs = self.model(**inputs)
-            logits = outputs.logits
-            probs = torch.softmax(logits, dim=-1)
-            confidence, predicted = torch.max(probs, dim=-1)
+        Args:
+            normalized_texts: normalize_text() of the texts that the
+                rule-based checks left undecided
+            batch_size: Texts per forward pass
         
-        # Get results
-        sentiment = self.sentiment_labels[predicted.item()]
-        confidence_score = confidence.item()
+        Returns:
+            List of predictions, aligned with texts
+        """
+        results = []
+        model = self.ort_model if self.ort_model is not None else self.model
         
-        # Determine moderation result
-        moderation = self._determine_moderation(sentiment, confidence_score)
-        reasoning = self._generate_reasoning(sentiment, moderation, confidence_score)
+        # One inference_mode block for all batches: no autograd tracking,
+        # no version counters
+        with torch.inference_mode():
+            for start in range(0, len(normalized_texts), batch_size):
+                preprocessed_texts = normalized_texts[start:start + batch_size]
+                
+                # Tokenize, padding only to the longest text in the batch; padded
+                # positions are masked out, so results match padding to 256
+                inputs = self.tokenizer(
+                    preprocessed_texts,
+                    max_length=256,
+                    padding=True,
+                    truncation=True,
+                    return_tensors='pt'
+                )
+                
+                if (
+                    self.cuda_graph is not None
+                    and inputs['input_ids'].shape[0] == 1
+                    and inputs['input_ids'].shape[1] <= CUDA_GRAPH_SEQ_LEN
+                ):
+                    logits = self._replay_cuda_graph(inputs).float()
+                else:
+                    # Move to device (tokenizer output is already on the CPU)
+                    if self.device != 'cpu':
+                        inputs = {k: v.to(self.device, non_blocking=True) for k, v in inputs.items()}
+                    
+                    # Inference (ONNX Runtime model takes the same inputs)
+                    outputs = model(**inputs)
+                    logits = outputs.logits.float()
+                # Softmax is monotonic: the top class is the top logit, and
+                # its probability is 1 / sum(exp(logits - max_logit))
+                max_logits, predicted = torch.max(logits, dim=-1)
+                confidences = torch.exp(logits - max_logits.unsqueeze(-1)).sum(dim=-1).reciprocal()
+                
+                for confidence_score, label_index in zip(confidences.tolist(), predicted.tolist()):
+                    sentiment = self.sentiment_labels[label_index]
+                
+                    # Determine moderation result
+                    moderation = self._determine_moderation(sentiment, confidence_score)
+                    reasoning = self._generate_reasoning(sentiment, moderation, confidence_score)
+                
+                    results.append({
+                        'sentiment': sentiment,
+                        'moderation_result': moderation,
+                        'confidence': round(confidence_score, 4),
+                        'reasoning': reasoning,
+                        'flagged_words': []
+                    })
         
-        return {
-            'sentiment': sentiment,
-            'moderation_result': moderation,
-            'confidence': round(confidence_score, 4),
-            'reasoning': reasoning,
-            'flagged_words': []
-        }
+        return results
     
     def _determine_moderation(self, sentiment: str, confidence: float) -> str:
         """
@@ -743,9 +1040,21 @@ class ModerationInference:
 
     def batch_predict(self, texts: List[str], batch_size: int = 32) -> List[Dict[str, Any]]:
         """
-        Batch prediction (compatibility wrapper)
+        Batch prediction
+        
+        Rule-based checks run per text; the texts they leave undecided go
+        through the ML model together, batch_size texts per forward pass.
         """
-        results = []
-        for text in texts:
-            results.append(self.predict(text))
+        normalized_texts = [normalize_text(text) for text in texts]
+        results: List[Optional[Dict[str, Any]]] = [
+            self._predict_rule_based(text, normalized_text)
+            for text, normalized_text in zip(texts, normalized_texts)
+        ]
+        
+        ml_indices = [i for i, result in enumerate(results) if result is None]
+        if ml_indices:
+            ml_results = self._predict_ml([normalized_texts[i] for i in ml_indices], batch_size)
+            for i, result in zip(ml_indices, ml_results):
+                results[i] = result
+        
         return results
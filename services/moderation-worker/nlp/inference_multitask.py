@@ -16,17 +16,22 @@ Last Updated: 2025-12-19
 import torch
 import numpy as np
 from transformers import AutoTokenizer
-from typing import Dict, Any, List, Optional, Tuple
+from typing import Dict, Any, List, Optional, Set, Tuple
+import copy
+import hashlib
 import logging
 import os
 import sys
+import threading
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from models.multitask_phobert import MultiTaskPhoBERT
-from nlp.preprocessing_advanced import preprocess_for_phobert, extract_pii, mask_pii
+from models.multitask_phobert import MultiTaskPhoBERT, load_task_heads
+from nlp.preprocessing_advanced import preprocess_for_phobert, extract_pii, mask_pii, EMOJI_MAP
 from nlp.taxonomy import (
-    ModerationLabel, 
     SeverityLevel, 
     DEFAULT_LABELS, 
     combine_predictions,
@@ -42,8 +47,13 @@ from nlp.toxic_words import (
     REVIEW_THRESHOLD,
     AUTO_REJECT_CATEGORIES,
     ALLOWED_PHRASES,
+    SEVERE_PROFANITY,
+    SEVERE_INSULTS,
+    MODERATE_NEGATIVE,
+    PERSONAL_ATTACKS,
 )
 from nlp.sentiment_words import HIGHLY_NEGATIVE, MODERATELY_NEGATIVE
+from nlp.keyword_scanner import KeywordScanner, LexiconScanner
 
 # NEW: Import context analyzer for enhanced accuracy
 try:
@@ -72,6 +82,21 @@ try:
 except ImportError:
     HAS_THREE_LAYER_PIPELINE = False
 
+# ONNX Runtime for the INT8 CPU path
+try:
+    import onnxruntime as ort
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    HAS_ONNXRUNTIME = True
+except ImportError:
+    HAS_ONNXRUNTIME = False
+
+# BERT graph fusions (Attention, SkipLayerNorm, Gelu) applied before quantization
+try:
+    from onnxruntime.transformers import optimizer as ort_optimizer
+    HAS_ORT_TRANSFORMERS = True
+except ImportError:
+    HAS_ORT_TRANSFORMERS = False
+
 logger = logging.getLogger(__name__)
 
 if not HAS_CONTEXT_ANALYZER:
@@ -83,6 +108,184 @@ if HAS_THREE_LAYER_PIPELINE:
 else:
     logger.warning("3-Layer Pipeline not available, using legacy detection")
 
+# Files written by export_onnx() into <model_path>/onnx
+ONNX_FILE = 'multitask.onnx'
+ONNX_FUSED_FILE = 'multitask.fused.onnx'
+ONNX_QUANTIZED_FILE = 'multitask.int8.onnx'
+ONNX_SOURCE_FILE = 'source_checkpoint.sha256'  # Fingerprint of the checkpoint it was exported from
+
+
+def _checkpoint_fingerprint(model_path: str) -> str:
+    """
+    Fingerprint of a model directory's files (name, size, mtime)
+    
+    Covers the weights, task heads, config and tokenizer files at the top
+    level of model_path (not the onnx/ export itself), so retraining into
+    the same directory changes it.
+    """
+    digest = hashlib.sha256()
+    if not os.path.isdir(model_path):  # Hub model id: nothing local to track
+        return digest.hexdigest()
+    for name in sorted(os.listdir(model_path)):
+        path = os.path.join(model_path, name)
+        if os.path.isfile(path):
+            stat = os.stat(path)
+            digest.update(f"{name}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()
+
+
+def _onnx_export_is_current(onnx_dir: str, model_path: str) -> bool:
+    """True if onnx_dir has a quantized export made from model_path's current files"""
+    try:
+        with open(os.path.join(onnx_dir, ONNX_SOURCE_FILE)) as f:
+            exported_from = f.read().strip()
+    except OSError:
+        return False
+    return (
+        os.path.exists(os.path.join(onnx_dir, ONNX_QUANTIZED_FILE))
+        and exported_from == _checkpoint_fingerprint(model_path)
+    )
+
+
+class _OnnxExportWrapper(torch.nn.Module):
+    """Tensor-only forward (logits) of MultiTaskPhoBERT for torch.onnx.export"""
+    
+    def __init__(self, model: MultiTaskPhoBERT):
+        super().__init__()
+        self.model = model
+    
+    def forward(self, input_ids, attention_mask):
+        outputs = self.model(input_ids=input_ids, attention_mask=attention_mask, return_dict=True)
+        if outputs['span_logits'] is None:
+            return outputs['multi_label_logits'], outputs['severity_logits']
+        return outputs['multi_label_logits'], outputs['severity_logits'], outputs['span_logits']
+
+
+@lru_cache(maxsize=None)
+def _load_onnx_session(onnx_path: str):
+    """
+    Load the quantized ONNX model once per process
+    
+    An ONNX Runtime session is thread-safe, so one session serves every
+    engine in the process.
+    """
+    session_options = ort.SessionOptions()
+    session_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    session_options.intra_op_num_threads = int(os.getenv('ORT_THREADS', os.cpu_count() or 1))
+    # One request batch at a time per process: no inter-op thread pool
+    session_options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    session_options.inter_op_num_threads = 1
+    
+    return ort.InferenceSession(
+        onnx_path, sess_options=session_options, providers=['CPUExecutionProvider']
+    )
+
+
+# Characters of a text the model can use: 256 tokens rarely cover more than
+# this, and the tokenizer drops the rest anyway. Cutting before preprocessing
+# keeps word segmentation of a huge paste from stalling the worker
+MAX_MODEL_CHARS = 2560
+
+
+@lru_cache(maxsize=8192)
+def preprocess_cached(text: str) -> Tuple[str, Dict[str, Any]]:
+    """
+    preprocess_for_phobert(text), cached: word segmentation is the slow part
+    
+    Only the first MAX_MODEL_CHARS characters are preprocessed.
+    The metadata dict is shared between calls, don't modify it.
+    """
+    return preprocess_for_phobert(text[:MAX_MODEL_CHARS])
+
+
+# Model labels that can block content; the others (e.g. spam) only matter
+# together with one of these
+HARMFUL_LABELS = frozenset({'toxicity', 'hate', 'harassment', 'threat', 'pii', 'sexual'})
+
+# Word lists of the legacy rule check, matched as substrings in one pass
+_RULE_WORD_SCANNER = LexiconScanner(
+    {
+        'hate': get_hate_speech_words(),
+        'sexual': get_sexual_content_words(),
+        'critical': get_critical_words(),
+    },
+    whole_word=False
+)
+
+# Allowed phrases (false-positive guards), found in one pass per text
+_ALLOWED_PHRASE_SCANNER = KeywordScanner(ALLOWED_PHRASES)
+_ALLOWED_PHRASES_LOWER = {phrase: phrase.lower() for phrase in ALLOWED_PHRASES}
+
+# Short-text fast path: a short text made only of letters and basic
+# punctuation, with none of these (even mildly) negative words, is allowed
+# without running the model
+SHORT_TEXT_MAX_LENGTH = 40
+_SHORT_TEXT_CHARS = frozenset(' .,!?')
+_SUSPICIOUS_WORD_SCANNER = KeywordScanner(
+    SEVERE_PROFANITY + SEVERE_INSULTS + MODERATE_NEGATIVE + PERSONAL_ATTACKS
+    + HIGHLY_NEGATIVE + MODERATELY_NEGATIVE
+)
+
+
+def _short_text_result() -> Dict[str, Any]:
+    """Result for short texts allowed by the fast path"""
+    return {
+        'labels': [],
+        'severities': [],
+        'action': 'allowed',
+        'confidence': 0.85,
+        'reasoning': 'Short text, no suspicious words',
+        'method': 'short_text_fast_path'
+    }
+
+
+def _empty_text_result() -> Dict[str, Any]:
+    """Result for texts with nothing to judge (empty, punctuation/symbols only)"""
+    return {
+        'labels': [],
+        'severities': [],
+        'action': 'allowed',
+        'confidence': 0.95,
+        'reasoning': 'No text content',
+        'method': 'empty_text'
+    }
+
+
+def _has_no_content(text: str) -> bool:
+    """
+    True for text without letters, digits or mapped emojis
+    
+    Neither the rules nor the model can flag such text: the rules look for
+    words, and the model only sees the emojis preprocessing maps to words.
+    """
+    if any(char.isalnum() for char in text):
+        return False
+    return not any(emoji in text for emoji in EMOJI_MAP)
+
+
+def _configure_torch_threads():
+    """
+    CPU thread pools for PyTorch: TORCH_THREADS intra-op threads, one inter-op
+    
+    Keep worker processes x TORCH_THREADS (or ORT_THREADS) at or below the
+    number of physical cores, or the processes' thread pools compete.
+    """
+    torch.set_num_threads(int(os.getenv('TORCH_THREADS', torch.get_num_threads())))
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Can only be set before the first parallel op (e.g. a second engine)
+        pass
+
+
+def _cpu_supports_bf16() -> bool:
+    """Whether the CPU has native BF16 matmul (AVX512-BF16 or AMX)"""
+    cpu = getattr(torch, 'cpu', None)
+    for check in ('_is_avx512_bf16_supported', '_is_amx_tile_supported'):
+        if cpu is not None and getattr(cpu, check, lambda: False)():
+            return True
+    return False
+
 
 class MultiTaskModerationInference:
     """
@@ -96,17 +299,54 @@ class MultiTaskModerationInference:
         confidence_threshold: float = 0.5,
         use_rule_based_fallback: bool = True,
         use_context_analyzer: bool = True,  # NEW: Enable context-aware analysis
-        use_variant_detector: bool = True   # NEW: Enable obfuscation detection
+        use_variant_detector: bool = True,  # NEW: Enable obfuscation detection
+        quantize_model: bool = False,       # INT8 dynamic quantization (CPU only)
+        compile_model: bool = False,        # torch.compile the model forward
+        cache_size: int = 10000,            # Max cached results (0 = disabled)
+        short_text_fast_path: bool = False, # Allow clearly clean short texts without the model
+        half_precision: bool = False,       # FP16 on GPU, BF16 autocast on CPUs that support it
+        use_onnx: bool = False,             # ONNX Runtime INT8 instead of PyTorch (CPU only)
+        rule_workers: int = 0,              # Threads for the rule pass of batch_predict (0 = sequential)
+        max_length: int = 256               # Truncation length in tokens (PhoBERT allows up to 256)
     ):
         self.model_path = model_path
         self.device = device
+        self.quantize_model = quantize_model and device == 'cpu'
+        self.compile_model = compile_model
         self.confidence_threshold = confidence_threshold
         self.use_rule_based_fallback = use_rule_based_fallback
         self.use_context_analyzer = use_context_analyzer and HAS_CONTEXT_ANALYZER
         self.use_variant_detector = use_variant_detector and HAS_VARIANT_DETECTOR
-        
-        self.label_names = [label.value for label in DEFAULT_LABELS]
+        self.short_text_fast_path = short_text_fast_path
+        self.max_length = max_length
+        # Rule checks are mostly pure Python (GIL-bound); threads only pay
+        # off where the scans release the GIL, so this is opt-in
+        self._rule_pool = ThreadPoolExecutor(max_workers=rule_workers) if rule_workers > 1 else None
+        self.half_precision = half_precision
+        self._autocast_dtype = None  # Set by load_model when half precision is usable
+        self.use_onnx = use_onnx and HAS_ONNXRUNTIME and device == 'cpu'
+        self.onnx_dir = os.path.join(model_path, 'onnx')
+        self.model = None
+        self.ort_session = None
+        
+        # Label lookups used on every ML call, built once
+        self.label_names = tuple(label.value for label in DEFAULT_LABELS)
         self.num_labels = len(self.label_names)
+        self._label_idx = {name: i for i, name in enumerate(self.label_names)}
+        self._harmful_mask = np.array([label in HARMFUL_LABELS for label in self.label_names])
+        self._label_array = np.array(self.label_names, dtype=object)
+        self._profanity_idx = self._label_idx.get('profanity', -1)
+        self._label_descriptions = {
+            label.value: LABEL_DESCRIPTIONS.get(label, {}).get('en', label.value)
+            for label in DEFAULT_LABELS
+        }
+        
+        # LRU cache of rule-check results (keyed by raw text) and model results
+        # (keyed by preprocessed text): repeated submissions (spam campaigns,
+        # stock phrases) skip the rule scans, tokenization and the forward pass
+        self.cache_size = cache_size
+        self._result_cache: "OrderedDict[Tuple, Dict[str, Any]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
         
         # Load model and tokenizer
         self.load_model()
@@ -133,6 +373,7 @@ class MultiTaskModerationInference:
             logger.info("3-Layer Pipeline initialized: text_normalizer + enhanced_rule_checker")
             
             # Initialize metrics counter
+            self._metrics_lock = threading.Lock()
             self.metrics = {
                 'total_processed': 0,
                 'rule_based_catches': 0,
@@ -151,17 +392,30 @@ class MultiTaskModerationInference:
     
     def load_model(self):
         """Load trained multi-task model"""
+        # Cached results came from the previous model
+        self.cache_clear()
+        
         try:
             logger.info(f"Loading multi-task model from {self.model_path}")
             
-            # Load tokenizer
-            self.tokenizer = AutoTokenizer.from_pretrained(self.model_path)
+            # Reuse a previous ONNX export without loading PyTorch weights,
+            # unless the checkpoint changed since (then it is re-exported below)
+            onnx_path = os.path.join(self.onnx_dir, ONNX_QUANTIZED_FILE)
+            if self.use_onnx and _onnx_export_is_current(self.onnx_dir, self.model_path):
+                self.tokenizer = AutoTokenizer.from_pretrained(self.onnx_dir)
+                self.ort_session = _load_onnx_session(onnx_path)
+                logger.info(f"ONNX model loaded from {onnx_path}")
+                return
+            
+            # Load tokenizer (Rust "fast" tokenizer when the model directory has
+            # a tokenizer.json; PhoBERT's stock files only give the slow one)
+            self.tokenizer = AutoTokenizer.from_pretrained(self.model_path, use_fast=True)
+            logger.info(f"Tokenizer: {type(self.tokenizer).__name__} (fast={self.tokenizer.is_fast})")
             
-            # Load task heads config
-            task_heads_path = os.path.join(self.model_path, 'task_heads.pt')
+            # Load task heads (safetensors if converted, else task_heads.pt)
+            checkpoint = load_task_heads(self.model_path, self.device)
             
-            if os.path.exists(task_heads_path):
-                checkpoint = torch.load(task_heads_path, map_location=self.device)
+            if checkpoint is not None:
                 config = checkpoint['config']
                 
                 # Initialize model
@@ -169,7 +423,8 @@ class MultiTaskModerationInference:
                     model_name=self.model_path,
                     num_labels=config['num_labels'],
                     num_severity_levels=config['num_severity_levels'],
-                    use_span_detection=config.get('use_span_detection', False)
+                    use_span_detection=config.get('use_span_detection', False),
+                    low_cpu_mem_usage=True
                 )
                 
                 # Load task head weights
@@ -191,28 +446,100 @@ class MultiTaskModerationInference:
                 self.model = MultiTaskPhoBERT(
                     model_name=self.model_path,
                     num_labels=self.num_labels,
-                    use_span_detection=False
+                    use_span_detection=False,
+                    low_cpu_mem_usage=True
                 )
             
             self.model.to(self.device)
             self.model.eval()
             
+            if self.device == 'cpu':
+                _configure_torch_threads()
+            
+            if self.use_onnx:
+                try:
+                    self.ort_session = _load_onnx_session(self.export_onnx())
+                    logger.info("Serving the model through ONNX Runtime (INT8)")
+                    return
+                except Exception as e:
+                    logger.warning(f"ONNX export failed, using PyTorch: {e}")
+            
+            # INT8 weights for every nn.Linear (FBGEMM kernels on CPU)
+            if self.quantize_model:
+                self.model = torch.quantization.quantize_dynamic(
+                    self.model, {torch.nn.Linear}, dtype=torch.qint8
+                )
+                logger.info("Model quantized to INT8 (dynamic)")
+            
+            # Half precision: FP16 weights on GPU; BF16 autocast on CPUs with
+            # native BF16 (AVX512-BF16 / AMX), skipped for INT8 models
+            if self.half_precision:
+                if self.device.startswith('cuda'):
+                    self.model.half()
+                    self._autocast_dtype = torch.float16
+                    logger.info("Model converted to FP16")
+                elif not self.quantize_model and _cpu_supports_bf16():
+                    self._autocast_dtype = torch.bfloat16
+                    logger.info("BF16 autocast enabled on CPU")
+                else:
+                    logger.info("CPU has no native BF16 support, keeping FP32")
+            
+            # Compile forward() itself: predict() calls self.forward, which
+            # a torch.compile wrapper around the module would not intercept.
+            # Input length varies per call, so compile for dynamic shapes
+            if self.compile_model and hasattr(torch, 'compile'):
+                eager_forward = self.model.forward
+                self.model.forward = torch.compile(eager_forward, dynamic=True)
+                try:
+                    self._warmup_model()
+                    logger.info("Model forward compiled with torch.compile")
+                except Exception as e:
+                    logger.warning(f"torch.compile failed, running eagerly: {e}")
+                    self.model.forward = eager_forward
+            
             logger.info("Model loaded successfully")
         
         except Exception as e:
             logger.error(f"Failed to load model: {e}")
             raise
     
-    def _is_in_allowed_phrase(self, text_lower: str, word: str) -> bool:
+    def _warmup_model(self):
+        """
+        Run dummy batches of two shapes through the model
+        
+        Compilation is lazy: without this the first requests would wait for
+        Inductor. Two shapes make sure the dynamic-shape graph is built.
+        """
+        for batch_size, length in ((1, 16), (2, 32)):
+            inputs = self.tokenizer(
+                ["xin chào"] * batch_size,
+                max_length=length,
+                padding='max_length',
+                truncation=True,
+                return_tensors='pt'
+            )
+            if self.device != 'cpu':
+                inputs = {k: v.to(self.device) for k, v in inputs.items()}
+            self._run_model(inputs)
+    
+    def _is_in_allowed_phrase(
+        self,
+        text_lower: str,
+        word: str,
+        phrases_in_text: Optional[Set[str]] = None
+    ) -> bool:
         """
         NEW: Check if a word appears in an allowed phrase context
+        
+        Args:
+            text_lower: Văn bản đã lowercase
+            word: Từ cần kiểm tra
+            phrases_in_text: Allowed phrases found in text_lower, if the caller already has them
         """
-        for phrase in ALLOWED_PHRASES:
-            if phrase in text_lower:
-                # Check if the word is part of this allowed phrase
-                if word in phrase.lower():
-                    return True
-        return False
+        if phrases_in_text is None:
+            phrases_in_text = _ALLOWED_PHRASE_SCANNER.find(text_lower)
+        # Check if the word is part of an allowed phrase present in the text
+        return any(word in _ALLOWED_PHRASES_LOWER[phrase] for phrase in phrases_in_text)
     
     def _detect_variants(self, text: str) -> Tuple[List[str], bool, str]:
         """
@@ -243,16 +570,30 @@ class MultiTaskModerationInference:
             logger.error(f"Variant detection error: {e}")
             return [], False, text.lower()
 
-    def _filter_safe_context_words(self, text: str, detected_words: List[str]) -> List[str]:
+    def _filter_safe_context_words(
+        self,
+        text: str,
+        detected_words: List[str],
+        text_lower: Optional[str] = None
+    ) -> List[str]:
         """
         NEW: Filter out words that appear in safe/allowed contexts
+        
+        Args:
+            text: Original text
+            detected_words: Words found by the rule check
+            text_lower: text.lower(), if the caller already has it
         """
-        text_lower = text.lower()
+        if not detected_words:
+            return []
+        if text_lower is None:
+            text_lower = text.lower()
+        phrases_in_text = _ALLOWED_PHRASE_SCANNER.find(text_lower)
         filtered = []
         
         for word in detected_words:
             # Check allowed phrases
-            if self._is_in_allowed_phrase(text_lower, word):
+            if self._is_in_allowed_phrase(text_lower, word, phrases_in_text):
                 logger.debug(f"Word '{word}' in allowed phrase context, skipping")
                 continue
             
@@ -274,98 +615,147 @@ class MultiTaskModerationInference:
         1. Normalizes text (Layer A)
         2. Runs enhanced rule check (Layer B)
         3. Returns result in standard format
+        
+        Errors propagate, so _cached_rule_check never caches a failed check
+        as a clean result; _rule_check logs them and falls back to the
+        legacy rules.
         """
         if not self.text_normalizer or not self.enhanced_rule_checker:
             return None
         
-        try:
-            # Layer A: Normalize text
-            versions = self.text_normalizer.create_all_versions(text)
-            original = versions['original']
-            normalized = versions['fully_normalized']
-            no_diacritics = versions['no_diacritics']
-            metadata = versions['metadata']
-            
-            # Log obfuscation if detected
-            if metadata.get('has_obfuscation'):
-                obf_types = metadata.get('obfuscation_types', [])
-                logger.info(f"3-Layer: Obfuscation detected: {obf_types}")
-            
-            # Layer B: Enhanced rule check
-            result = self.enhanced_rule_checker.check(
-                text=original,
-                normalized_text=normalized,
-                no_diacritics_text=no_diacritics,
-                metadata=metadata
-            )
-            
-            if not result:
-                return None
-            
-            # Map to standard format with SeverityLevel
-            action = result.get('action', 'allowed')
-            labels = result.get('labels', [])
-            findings = result.get('findings', [])
-            
-            # Determine severity level
-            if action == 'reject':
-                severity = SeverityLevel.SEVERE
-            elif action == 'review':
-                severity = SeverityLevel.MODERATE
-            else:
-                severity = SeverityLevel.SAFE
-            
-            # Build standard return format
-            return {
-                'labels': labels,
-                'severities': [severity],
-                'action': action,
-                'confidence': result.get('confidence', 0.9),
-                'reasoning': result.get('reasoning', ''),
-                'flagged_words': [f.get('matched', '') for f in findings[:5]],
-                'method': 'three_layer_pipeline',
-                'has_obfuscation': metadata.get('has_obfuscation', False),
-                'obfuscation_types': metadata.get('obfuscation_types', []),
-                'normalized_text': normalized,
-                'findings': findings,
-            }
-            
-        except Exception as e:
-            logger.error(f"3-Layer Pipeline check error: {e}")
+        # Layer A: Normalize text
+        versions = self.text_normalizer.create_all_versions(text)
+        
+        # Layer B: Enhanced rule check
+        result = self.enhanced_rule_checker.check(
+            text=versions['original'],
+            normalized_text=versions['fully_normalized'],
+            no_diacritics_text=versions['no_diacritics'],
+            metadata=versions['metadata']
+        )
+        return self._format_enhanced_result(result, versions)
+    
+    def _format_enhanced_result(self, result: Optional[Dict[str, Any]],
+                                versions: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Map an EnhancedRuleChecker result to the standard prediction format"""
+        normalized = versions['fully_normalized']
+        metadata = versions['metadata']
+        
+        # Log obfuscation if detected
+        if metadata.get('has_obfuscation'):
+            obf_types = metadata.get('obfuscation_types', [])
+            logger.info(f"3-Layer: Obfuscation detected: {obf_types}")
+        
+        if not result:
             return None
+        
+        # Map to standard format with SeverityLevel
+        action = result.get('action', 'allowed')
+        labels = result.get('labels', [])
+        findings = result.get('findings', [])
+        
+        # Determine severity level
+        if action == 'reject':
+            severity = SeverityLevel.SEVERE
+        elif action == 'review':
+            severity = SeverityLevel.MODERATE
+        else:
+            severity = SeverityLevel.SAFE
+        
+        # Build standard return format
+        return {
+            'labels': labels,
+            'severities': [severity],
+            'action': action,
+            'confidence': result.get('confidence', 0.9),
+            'reasoning': result.get('reasoning', ''),
+            'flagged_words': [f.get('matched', '') for f in findings[:5]],
+            'method': 'three_layer_pipeline',
+            'has_obfuscation': metadata.get('has_obfuscation', False),
+            'obfuscation_types': metadata.get('obfuscation_types', []),
+            'normalized_text': normalized,
+            'findings': findings,
+        }
     
     def rule_based_check(self, text: str) -> Optional[Dict[str, Any]]:
         """
         ENHANCED Rule-based pre-check with multi-category detection
         NOW with 3-layer pipeline integration (preferred) + legacy fallback
         """
-        # Update metrics
+        result = self._rule_check(text)
         if self.metrics:
-            self.metrics['total_processed'] += 1
-        
+            counts = Counter()
+            self._count_rule_result(counts, result)
+            self._flush_metrics(counts)
+        return result
+    
+    def _rule_check(self, text: str) -> Optional[Dict[str, Any]]:
+        """rule_based_check without the metrics update"""
         # ===== NEW: 3-LAYER PIPELINE CHECK (PREFERRED) =====
         if self.use_three_layer_pipeline:
-            result = self._enhanced_rule_check(text)
+            try:
+                result = self._cached_rule_check('enhanced_rules', text, self._enhanced_rule_check)
+            except Exception as e:
+                logger.error(f"3-Layer Pipeline check error: {e}")
+                result = None
             if result:
-                # Update metrics based on result
-                if self.metrics:
-                    self.metrics['rule_based_catches'] += 1
-                    if result.get('has_obfuscation'):
-                        self.metrics['obfuscation_detected'] += 1
-                    if 'hate' in result.get('labels', []) or 'racism' in result.get('labels', []):
-                        self.metrics['hate_speech_detected'] += 1
-                    if 'harassment' in result.get('labels', []):
-                        self.metrics['harassment_detected'] += 1
-                    if result.get('action') == 'reject':
-                        self.metrics['rejected'] += 1
-                    elif result.get('action') == 'review':
-                        self.metrics['reviewed'] += 1
-                    else:
-                        self.metrics['allowed'] += 1
                 return result
         
         # ===== LEGACY: VARIANT DETECTION FALLBACK =====
-        text_lower = text.lower()
+        return self._cached_rule_check('legacy_rules', text, self._legacy_rule_check)
+    
+    @staticmethod
+    def _count_rule_result(counts: Counter, result: Optional[Dict[str, Any]]):
+        """Add one rule-check result to a local metrics Counter"""
+        counts['total_processed'] += 1
+        
+        # Only 3-layer pipeline catches are broken down
+        if not result or result.get('method') != 'three_layer_pipeline':
+            return
+        labels = result.get('labels', [])
+        counts['rule_based_catches'] += 1
+        if result.get('has_obfuscation'):
+            counts['obfuscation_detected'] += 1
+        if 'hate' in labels or 'racism' in labels:
+            counts['hate_speech_detected'] += 1
+        if 'harassment' in labels:
+            counts['harassment_detected'] += 1
+        if result.get('action') == 'reject':
+            counts['rejected'] += 1
+        elif result.get('action') == 'review':
+            counts['reviewed'] += 1
+        else:
+            counts['allowed'] += 1
+    
+    def _flush_metrics(self, counts: Counter):
+        """Add local counts to self.metrics (one lock acquisition)"""
+        with self._metrics_lock:
+            for key, value in counts.items():
+                self.metrics[key] += value
+    
+    def _cached_rule_check(self, kind: str, text: str, check) -> Optional[Dict[str, Any]]:
+        """
+        Rule-check result from the LRU cache, computed with check(text) on a miss
+        
+        Clean results (None) are cached too. Results that flagged PII are not,
+        so texts with phone numbers/emails are not kept in memory. If check
+        raises, nothing is cached and the exception propagates.
+        """
+        key = (kind, text)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached or None
+        
+        result = check(text)
+        if not (result and 'pii' in result.get('labels', ())):
+            self._cache_put(key, result or {})
+        return result
+    
+    def _legacy_rule_check(self, text: str) -> Optional[Dict[str, Any]]:
+        """Legacy rule-based check: variant detection, PII and word lists"""
+        # Lowercased once: original_lower for the safe-context filter,
+        # text_lower (possibly de-obfuscated below) for word matching
+        original_lower = text_lower = text.lower()
         
         # Detect obfuscated variants first
         variant_words, has_obfuscation, normalized_text = self._detect_variants(text)
@@ -411,16 +801,14 @@ class MultiTaskModerationInference:
                 'method': 'rule_based_pii'
             }
         
-        # ===== 2. CHECK HATE SPEECH (HIGHEST PRIORITY) =====
-        hate_speech_words = get_hate_speech_words()
-        detected_hate = []
+        # Hate / sexual / critical words, all found in one pass
+        word_hits = _RULE_WORD_SCANNER.scan(text_lower)
         
-        for word in hate_speech_words:
-            if word in text_lower:
-                detected_hate.append(word)
+        # ===== 2. CHECK HATE SPEECH (HIGHEST PRIORITY) =====
+        detected_hate = word_hits['hate']
         
         # NEW: Filter out safe context words
-        detected_hate = self._filter_safe_context_words(text, detected_hate)
+        detected_hate = self._filter_safe_context_words(text, detected_hate, original_lower)
         
         if detected_hate:
             # Double check with context analyzer for hate speech
@@ -458,15 +846,10 @@ class MultiTaskModerationInference:
                 }
         
         # ===== 3. CHECK SEXUAL CONTENT =====
-        sexual_words = get_sexual_content_words()
-        detected_sexual = []
-        
-        for word in sexual_words:
-            if word in text_lower:
-                detected_sexual.append(word)
+        detected_sexual = word_hits['sexual']
         
         # NEW: Filter out safe context words
-        detected_sexual = self._filter_safe_context_words(text, detected_sexual)
+        detected_sexual = self._filter_safe_context_words(text, detected_sexual, original_lower)
         
         if detected_sexual:
             # Auto-reject explicit sexual content
@@ -481,15 +864,10 @@ class MultiTaskModerationInference:
             }
         
         # ===== 4. CHECK CRITICAL TOXIC WORDS =====
-        critical_words = get_critical_words()
-        detected_critical = []
-        
-        for word in critical_words:
-            if word in text_lower:
-                detected_critical.append(word)
+        detected_critical = word_hits['critical']
         
         # NEW: Filter out safe context words
-        detected_critical = self._filter_safe_context_words(text, detected_critical)
+        detected_critical = self._filter_safe_context_words(text, detected_critical, original_lower)
         
         if detected_critical:
             # NEW: Apply context-aware decision
@@ -534,86 +912,163 @@ class MultiTaskModerationInference:
         # No clear rule-based violation
         return None
     
-    def predict(self, text: str, return_spans: bool = False) -> Dict[str, Any]:
+    def predict(
+        self,
+        text: str,
+        return_spans: bool = False,
+        use_rule_based_fallback: Optional[bool] = None,
+        verbose: bool = True
+    ) -> Dict[str, Any]:
         """
         Predict moderation labels and severity
         
         Args:
             text: Input Vietnamese text
             return_spans: Whether to return span predictions
+            use_rule_based_fallback: Override self.use_rule_based_fallback for this call
+            verbose: Include model scores (all_probabilities, probabilities,
+                severity_score); callers that only need the decision can skip them
             
         Returns:
             Dict with labels, severities, action, confidence, reasoning
         """
+        if use_rule_based_fallback is None:
+            use_rule_based_fallback = self.use_rule_based_fallback
+        
+        # Nothing to check: skip the rules, tokenizer and model
+        if _has_no_content(text):
+            return _empty_text_result()
+        
         # Step 1: Rule-based pre-check
-        if self.use_rule_based_fallback:
+        if use_rule_based_fallback:
             rule_result = self.rule_based_check(text)
             if rule_result is not None:
                 return rule_result
+            if self._is_clearly_clean(text):
+                return _short_text_result()
+        
+        # The model only sees the preprocessed text, so near-duplicates that
+        # preprocessing maps to the same input (case, stretched letters,
+        # emojis, URLs, teencode) share one cached result
+        key = ('predict', preprocess_cached(text)[0], return_spans, verbose)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+        
+        result = self._predict_ml(text, return_spans, verbose)
+        self._cache_put(key, result)
+        return result
+    
+    def _is_clearly_clean(self, text: str) -> bool:
+        """
+        Short-text fast path check, for texts the rule-based checks passed
+        
+        True for short texts of letters and basic punctuation only (no digits,
+        symbols or emojis that could hide obfuscation) without any negative word.
+        """
+        if not self.short_text_fast_path or len(text) >= SHORT_TEXT_MAX_LENGTH:
+            return False
+        if not all(char.isalpha() or char in _SHORT_TEXT_CHARS for char in text):
+            return False
+        return not _SUSPICIOUS_WORD_SCANNER.find(text.lower())
+    
+    def _cache_get(self, key: Tuple) -> Optional[Dict[str, Any]]:
+        """Copy of a cached model result, or None on miss"""
+        if not self.cache_size:
+            return None
+        with self._cache_lock:
+            result = self._result_cache.get(key)
+            if result is None:
+                return None
+            self._result_cache.move_to_end(key)
+        return copy.deepcopy(result)
+    
+    def _cache_put(self, key: Tuple, result: Dict[str, Any]):
+        """Store a copy of a model result, so callers can't mutate the cached one"""
+        if not self.cache_size:
+            return
+        result = copy.deepcopy(result)
+        with self._cache_lock:
+            self._result_cache[key] = result
+            self._result_cache.move_to_end(key)
+            while len(self._result_cache) > self.cache_size:
+                self._result_cache.popitem(last=False)
+    
+    def cache_clear(self):
+        """Drop all cached rule-check and model results"""
+        with self._cache_lock:
+            self._result_cache.clear()
+    
+    def _predict_ml(self, text: str, return_spans: bool = False, verbose: bool = True) -> Dict[str, Any]:
+        """
+        Model part of predict(), for texts the rule-based checks left undecided
         
+        Args:
+            text: Input Vietnamese text
+            return_spans: Whether to return span predictions
+            verbose: Include model scores
+            
+        Returns:
+            Dict with labels, severities, action, confidence, reasoning
+        """
         # Step 2: Preprocess
-        processed_text, metadata = preprocess_for_phobert(text)
+        processed_text, metadata = preprocess_cached(text)
         
         # Check if preprocessing detected obfuscations
         if metadata.get('obfuscations'):
             logger.info(f"Detected obfuscations: {metadata['obfuscations']}")
         
-        # Step 3: Tokenize
+        # Step 3: Tokenize (a single text needs no padding: attention cost
+        # grows with the square of the sequence length)
         inputs = self.tokenizer(
             processed_text,
-            max_length=256,
-            padding='max_length',
+            max_length=self.max_length,
+            padding=False,
             truncation=True,
-            return_tensors='pt'
+            return_tensors=self._tensor_type
         )
         
-        # Move to device
-        inputs = {k: v.to(self.device) for k, v in inputs.items()}
+        # Move to device (tokenizer output is already on the CPU)
+        if self.device != 'cpu':
+            inputs = {k: v.to(self.device, non_blocking=True) for k, v in inputs.items()}
         
-        # Step 4: Model inference
-        self.model.eval()
-        with torch.no_grad():
-            predictions = self.model.predict(
-                input_ids=inputs['input_ids'],
-                attention_mask=inputs['attention_mask'],
-                threshold=self.confidence_threshold
-            )
+        # Step 4: Model inference (model is in eval mode since load_model)
+        predictions = self._run_model(inputs)
         
         # Step 5: Parse predictions
-        multi_label_preds = predictions['multi_label_preds'][0].cpu().numpy()  # [num_labels]
-        multi_label_probs = predictions['multi_label_probs'][0].cpu().numpy()  # [num_labels]
-        severity_pred = predictions['severity_preds'][0].item()
-        severity_score = predictions['severity_scores'][0].item()
-        
-        # Get triggered labels
-        triggered_indices = np.where(multi_label_preds == 1)[0]
+        multi_label_preds, multi_label_probs, severity_preds, severity_scores = self._to_host(predictions)
+        multi_label_preds = multi_label_preds[0]  # [num_labels]
+        multi_label_probs = multi_label_probs[0]  # [num_labels]
+        severity_pred = int(severity_preds[0])
+        severity_score = float(severity_scores[0])
+        
+        # Get triggered labels (probabilities converted to floats in one call)
+        triggered_mask = multi_label_preds == 1
+        all_probs = multi_label_probs.tolist()
+        triggered_indices = np.flatnonzero(triggered_mask)
         triggered_labels = [self.label_names[i] for i in triggered_indices]
-        triggered_probs = [float(multi_label_probs[i]) for i in triggered_indices]
+        triggered_probs = [all_probs[i] for i in triggered_indices]
         
         # If no labels triggered, it's clean
         if not triggered_labels:
-            return {
+            result = {
                 'labels': [],
                 'severities': [],
                 'action': 'allowed',
                 'confidence': float(1 - multi_label_probs.max()),
                 'reasoning': 'Clean content, no violation',
-                'all_probabilities': {
-                    label: float(prob) 
-                    for label, prob in zip(self.label_names, multi_label_probs)
-                },
                 'method': 'ml_model'
             }
+            if verbose:
+                result['all_probabilities'] = dict(zip(self.label_names, all_probs))
+            return result
         
         # Filter: Only block truly harmful content (toxic, hate, harassment)
         # Allow negative feedback/complaints - those are valid customer opinions
-        harmful_labels = {'toxicity', 'hate', 'harassment', 'threat', 'pii', 'sexual'}
-        triggered_harmful = [l for l in triggered_labels if l in harmful_labels]
-        
         # If only mild labels (like 'spam' or 'profanity' with low confidence), allow
-        if not triggered_harmful:
+        if not (triggered_mask & self._harmful_mask).any():
             # Check if any profanity with high confidence
-            profanity_idx = self.label_names.index('profanity') if 'profanity' in self.label_names else -1
+            profanity_idx = self._profanity_idx
             if profanity_idx >= 0 and multi_label_preds[profanity_idx] == 1:
                 if multi_label_probs[profanity_idx] < 0.8:  # Not very confident
                     return {
@@ -640,9 +1095,7 @@ class MultiTaskModerationInference:
         # Generate reasoning
         reasoning_parts = []
         for label, prob in zip(triggered_labels, triggered_probs):
-            label_desc = LABEL_DESCRIPTIONS.get(
-                ModerationLabel(label), {}
-            ).get('en', label)
+            label_desc = self._label_descriptions[label]
             reasoning_parts.append(f"{label_desc} ({prob:.2%})")
         
         reasoning = f"Violation detected: {', '.join(reasoning_parts)} | Severity: {severity_pred}"
@@ -651,27 +1104,215 @@ class MultiTaskModerationInference:
         result = {
             'labels': triggered_labels,
             'severities': [severity_pred] * len(triggered_labels),
-            'probabilities': {label: prob for label, prob in zip(triggered_labels, triggered_probs)},
             'action': action,
             'confidence': float(np.mean(triggered_probs)) if triggered_probs else 0.5,
             'reasoning': reasoning,
-            'severity_score': float(severity_score),
-            'all_probabilities': {
-                label: float(prob) 
-                for label, prob in zip(self.label_names, multi_label_probs)
-            },
             'method': 'ml_model'
         }
+        if verbose:
+            result['probabilities'] = dict(zip(triggered_labels, triggered_probs))
+            result['severity_score'] = float(severity_score)
+            result['all_probabilities'] = dict(zip(self.label_names, all_probs))
         
         # Add span predictions if requested
         if return_spans and predictions['span_preds'] is not None:
-            span_preds = predictions['span_preds'][0].cpu().numpy()
+            span_preds = predictions['span_preds'][0]
+            if isinstance(span_preds, torch.Tensor):
+                span_preds = span_preds.cpu().numpy()
             result['span_predictions'] = self._extract_spans(
                 processed_text, span_preds, inputs['attention_mask'][0]
             )
         
         return result
     
+    def export_onnx(self, output_dir: str = None) -> str:
+        """
+        Export the loaded PyTorch model to ONNX and quantize it to INT8
+        
+        Args:
+            output_dir: Thư mục lưu model ONNX (mặc định self.onnx_dir)
+        
+        Returns:
+            Path of the quantized ONNX model
+        """
+        output_dir = output_dir or self.onnx_dir
+        os.makedirs(output_dir, exist_ok=True)
+        onnx_path = os.path.join(output_dir, ONNX_FILE)
+        quantized_path = os.path.join(output_dir, ONNX_QUANTIZED_FILE)
+        
+        output_names = ['multi_label_logits', 'severity_logits']
+        dynamic_axes = {
+            'input_ids': {0: 'batch', 1: 'sequence'},
+            'attention_mask': {0: 'batch', 1: 'sequence'},
+            'multi_label_logits': {0: 'batch'},
+            'severity_logits': {0: 'batch'},
+        }
+        if self.model.use_span_detection:
+            output_names.append('span_logits')
+            dynamic_axes['span_logits'] = {0: 'batch', 1: 'sequence'}
+        
+        dummy = self.tokenizer("xin chào", return_tensors='pt')
+        with torch.no_grad():
+            torch.onnx.export(
+                _OnnxExportWrapper(self.model).cpu().eval(),
+                (dummy['input_ids'], dummy['attention_mask']),
+                onnx_path,
+                input_names=['input_ids', 'attention_mask'],
+                output_names=output_names,
+                dynamic_axes=dynamic_axes,
+                opset_version=17
+            )
+        
+        # Fuse attention/LayerNorm/GELU subgraphs, then quantize only the
+        # matmul-heavy ops so LayerNorm and softmax stay in FP32
+        source_path = onnx_path
+        op_types_to_quantize = None
+        if HAS_ORT_TRANSFORMERS:
+            try:
+                encoder_config = self.model.phobert.config
+                fused_model = ort_optimizer.optimize_model(
+                    onnx_path,
+                    model_type='bert',
+                    num_heads=encoder_config.num_attention_heads,
+                    hidden_size=encoder_config.hidden_size,
+                    opt_level=0  # Python fusions only; ORT optimizes the graph at load time
+                )
+                fused_path = os.path.join(output_dir, ONNX_FUSED_FILE)
+                fused_model.save_model_to_file(fused_path)
+                source_path = fused_path
+                op_types_to_quantize = ['MatMul', 'Attention']
+                logger.info(f"ONNX fusions: {fused_model.get_fused_operator_statistics()}")
+            except Exception as e:
+                logger.warning(f"ONNX transformer fusion failed, quantizing the unfused graph: {e}")
+        
+        # INT8 weights, activations quantized on the fly
+        quantize_dynamic(
+            source_path, quantized_path,
+            weight_type=QuantType.QInt8,
+            op_types_to_quantize=op_types_to_quantize
+        )
+        self.tokenizer.save_pretrained(output_dir)
+        
+        # Written last: only a complete export is marked as current
+        with open(os.path.join(output_dir, ONNX_SOURCE_FILE), 'w') as f:
+            f.write(_checkpoint_fingerprint(self.model_path))
+        
+        logger.info(f"Quantized ONNX model saved to {quantized_path}")
+        return quantized_path
+    
+    @property
+    def _tensor_type(self) -> str:
+        """Tokenizer return_tensors: numpy for the ONNX session, torch otherwise"""
+        return 'np' if self.ort_session is not None else 'pt'
+    
+    def _run_onnx(self, inputs: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """
+        Same outputs as MultiTaskPhoBERT.predict, as numpy arrays
+        
+        The graph returns raw logits; sigmoid, threshold and rounding are
+        vectorized numpy ops over the whole batch, so torch stays off the
+        ONNX hot path.
+        """
+        outputs = self.ort_session.run(None, {
+            'input_ids': inputs['input_ids'],
+            'attention_mask': inputs['attention_mask']
+        })
+        multi_label_logits, severity_logits = outputs[0], outputs[1]
+        
+        multi_label_probs = (1.0 / (1.0 + np.exp(-multi_label_logits))).astype(np.float32)
+        severity_preds = np.clip(np.rint(severity_logits), 0, 2).astype(np.int64)
+        
+        return {
+            'multi_label_preds': (multi_label_probs > self.confidence_threshold).astype(np.int64),
+            'multi_label_probs': multi_label_probs,
+            'severity_preds': severity_preds,
+            'severity_scores': severity_logits.astype(np.float32),
+            'span_preds': outputs[2].argmax(axis=-1) if len(outputs) > 2 else None
+        }
+    
+    def _run_model(self, inputs: Dict[str, torch.Tensor]) -> Dict[str, torch.Tensor]:
+        """
+        Forward pass under inference_mode (and autocast when half precision is on)
+        
+        Same outputs as MultiTaskPhoBERT.predict; probabilities and severity
+        scores are float32 on every path. With an ONNX session, inputs and
+        outputs are numpy arrays (see _tensor_type).
+        """
+        if self.ort_session is not None:
+            return self._run_onnx(inputs)
+        
+        with torch.inference_mode():
+            if self._autocast_dtype is None:
+                return self.model.predict(
+                    input_ids=inputs['input_ids'],
+                    attention_mask=inputs['attention_mask'],
+                    threshold=self.confidence_threshold
+                )
+            
+            # Encoder in half precision; heads' logits back to float32 before
+            # sigmoid/round/argmax so thresholds compare at full precision
+            device_type = 'cuda' if self.device.startswith('cuda') else 'cpu'
+            with torch.autocast(device_type, dtype=self._autocast_dtype):
+                outputs = self.model(
+                    input_ids=inputs['input_ids'],
+                    attention_mask=inputs['attention_mask'],
+                    return_dict=True
+                )
+            
+            multi_label_probs = torch.sigmoid(outputs['multi_label_logits'].float())
+            severity_scores = outputs['severity_logits'].float()
+            span_logits = outputs['span_logits']
+            return {
+                'multi_label_preds': (multi_label_probs > self.confidence_threshold).long(),
+                'multi_label_probs': multi_label_probs,
+                'severity_preds': torch.clamp(torch.round(severity_scores).long(), 0, 2),
+                'severity_scores': severity_scores,
+                'span_preds': span_logits.float().argmax(dim=-1) if span_logits is not None else None
+            }
+    
+    def _to_host(
+        self, predictions: Dict[str, torch.Tensor]
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Model outputs as numpy arrays (batch first)
+        
+        On a GPU the four outputs are packed into one tensor, so there is a
+        single device->host copy (and sync) instead of four.
+        
+        Returns:
+            (multi_label_preds, multi_label_probs, severity_preds, severity_scores)
+        """
+        if self.ort_session is not None:
+            return (
+                predictions['multi_label_preds'],
+                predictions['multi_label_probs'],
+                predictions['severity_preds'],
+                predictions['severity_scores']
+            )
+        
+        if self.device == 'cpu':
+            return (
+                predictions['multi_label_preds'].numpy(),
+                predictions['multi_label_probs'].numpy(),
+                predictions['severity_preds'].numpy(),
+                predictions['severity_scores'].numpy()
+            )
+        
+        num_labels = predictions['multi_label_probs'].shape[-1]
+        packed = torch.cat([
+            predictions['multi_label_probs'].float(),
+            predictions['multi_label_preds'].float(),
+            predictions['severity_preds'].float().unsqueeze(-1),
+            predictions['severity_scores'].float().unsqueeze(-1)
+        ], dim=-1).cpu().numpy()
+        
+        return (
+            packed[:, num_labels:2 * num_labels].astype(np.int64),
+            packed[:, :num_labels],
+            packed[:, 2 * num_labels].astype(np.int64),
+            packed[:, 2 * num_labels + 1]
+        )
+    
     def _extract_spans(
         self, 
         text: str, 
@@ -693,41 +1334,40 @@ class MultiTaskModerationInference:
         valid_length = attention_mask.sum().item()
         valid_preds = span_preds[:valid_length]
         
+        # No violation token, no span: skip re-tokenizing the text
+        if not (np.asarray(valid_preds) == 1).any():
+            return []
+        
         # Tokenize to get token-to-char mapping
         tokens = self.tokenizer.tokenize(text)
         
+        # Runs of violation tokens from the edges of the 0/1 mask
+        # (zip semantics: stop at the shorter of tokens and predictions)
+        num_tokens = len(tokens)
+        length = min(num_tokens, valid_length)
+        flags = (np.asarray(valid_preds[:length]) == 1).astype(np.int8)
+        changes = np.diff(np.concatenate(([0], flags, [0])))
+        starts = np.flatnonzero(changes == 1).tolist()
+        ends = np.flatnonzero(changes == -1).tolist()
+        
         spans = []
-        current_span = None
-        
-        for i, (token, pred) in enumerate(zip(tokens, valid_preds)):
-            if pred == 1:  # Violation token
-                if current_span is None:
-                    current_span = {
-                        'start': i,
-                        'tokens': [token]
-                    }
-                else:
-                    current_span['tokens'].append(token)
-            else:
-                if current_span is not None:
-                    # End current span
-                    current_span['end'] = i
-                    current_span['text'] = ' '.join(current_span['tokens'])
-                    spans.append(current_span)
-                    current_span = None
-        
-        # Close last span if exists
-        if current_span is not None:
-            current_span['end'] = len(tokens)
-            current_span['text'] = ' '.join(current_span['tokens'])
-            spans.append(current_span)
+        for start, end in zip(starts, ends):
+            span_tokens = tokens[start:end]
+            spans.append({
+                'start': start,
+                'tokens': span_tokens,
+                # A span still open when the predictions run out ends at the last token
+                'end': end if end < length else num_tokens,
+                'text': ' '.join(span_tokens)
+            })
         
         return spans
     
     def batch_predict(
         self, 
         texts: List[str], 
-        batch_size: int = 32
+        batch_size: int = 32,
+        use_rule_based_fallback: Optional[bool] = None
     ) -> List[Dict[str, Any]]:
         """
         True Batch prediction for multiple texts
@@ -736,157 +1376,220 @@ class MultiTaskModerationInference:
         Args:
             texts: List of input texts
             batch_size: Batch size for processing (internal chunking)
+            use_rule_based_fallback: Override self.use_rule_based_fallback for this call
             
         Returns:
             List of prediction dicts
         """
-        results = []
-        
-        # Process in chunks to avoid OOM on very large lists
-        for i in range(0, len(texts), batch_size):
-            batch_texts = texts[i:i+batch_size]
-            
-            # 1. Rule-based checks (must be done individually)
-            batch_results = [None] * len(batch_texts)
-            indices_to_predict = []
-            texts_to_predict = []
-            
-            if self.use_rule_based_fallback:
-                for idx, text in enumerate(batch_texts):
-                    rule_result = self.rule_based_check(text)
-                    if rule_result:
-                        batch_results[idx] = rule_result
-                    else:
-                        indices_to_predict.append(idx)
-                        texts_to_predict.append(text)
+        if use_rule_based_fallback is None:
+            use_rule_based_fallback = self.use_rule_based_fallback
+        
+        # 1. Texts with nothing to check, then rule-based checks (must be
+        # done individually)
+        results: List[Optional[Dict[str, Any]]] = [
+            _empty_text_result() if _has_no_content(text) else None
+            for text in texts
+        ]
+        if use_rule_based_fallback:
+            rule_indices = [idx for idx, result in enumerate(results) if result is None]
+            rule_texts = [texts[idx] for idx in rule_indices]
+            if self._rule_pool is not None and len(rule_texts) > 1:
+                rule_results = list(self._rule_pool.map(self._rule_check, rule_texts))
             else:
-                indices_to_predict = list(range(len(batch_texts)))
-                texts_to_predict = batch_texts
-            
-            # If everything was handled by rules, continue
-            if not texts_to_predict:
-                results.extend(batch_results)
-                continue
-                
-            # 2. Preprocess
-            processed_texts = [preprocess_for_phobert(t)[0] for t in texts_to_predict]
-            
-            # 3. Tokenize batch
-            inputs = self.tokenizer(
-                processed_texts,
-                max_length=256,
-                padding=True,  # Pad to longest in batch
-                truncation=True,
-                return_tensors='pt'
-            )
-            
-            # Move to device
-            inputs = {k: v.to(self.device) for k, v in inputs.items()}
-            
-            # 4. Model inference (Single call!)
-            self.model.eval()
-            with torch.no_grad():
-                predictions = self.model.predict(
-                    input_ids=inputs['input_ids'],
-                    attention_mask=inputs['attention_mask'],
-                    threshold=self.confidence_threshold
-                )
+                rule_results = [self._rule_check(text) for text in rule_texts]
+            # Metrics for the whole batch in one update
+            if self.metrics:
+                counts = Counter()
+                for rule_result in rule_results:
+                    self._count_rule_result(counts, rule_result)
+                self._flush_metrics(counts)
+            for idx, text, rule_result in zip(rule_indices, rule_texts, rule_results):
+                if rule_result:
+                    results[idx] = rule_result
+                elif self._is_clearly_clean(text):
+                    results[idx] = _short_text_result()
+        
+        # 2. Cached model results, keyed by preprocessed text (see predict);
+        # texts that preprocess the same way are predicted once
+        pending: Dict[str, List[int]] = {}
+        for idx, result in enumerate(results):
+            if result is None:
+                processed_text = preprocess_cached(texts[idx])[0]
+                results[idx] = self._cache_get(('batch', processed_text))
+                if results[idx] is None:
+                    pending.setdefault(processed_text, []).append(idx)
+        
+        # 3. Everything else goes through the model in full batches, however
+        # the rule hits were spread over the input. Texts of similar length
+        # share a batch, so little compute goes to padding (results are
+        # stored by index, so the order of the input is kept)
+        texts_to_predict = list(pending)
+        if len(texts_to_predict) > batch_size:
+            texts_to_predict.sort(key=len)
+        for i in range(0, len(texts_to_predict), batch_size):
+            batch_texts = texts_to_predict[i:i+batch_size]
+            batch_results = self._predict_ml_batch(batch_texts)
+            for processed_text, result in zip(batch_texts, batch_results):
+                self._cache_put(('batch', processed_text), result)
+                first_idx, *duplicate_indices = pending[processed_text]
+                results[first_idx] = result
+                for duplicate_idx in duplicate_indices:
+                    results[duplicate_idx] = copy.deepcopy(result)
+        
+        return results
+    
+    def _predict_ml_batch(self, processed_texts: List[str]) -> List[Dict[str, Any]]:
+        """
+        Run one batch of texts through the model (single forward pass)
+        
+        Args:
+            processed_texts: Preprocessed texts (preprocess_cached) not decided
+                by the rule-based checks
             
-            # 5. Parse predictions
-            # Move all to CPU/numpy at once
-            multi_label_preds = predictions['multi_label_preds'].cpu().numpy()
-            multi_label_probs = predictions['multi_label_probs'].cpu().numpy()
-            severity_preds = predictions['severity_preds'].cpu().numpy()
-            severity_scores = predictions['severity_scores'].cpu().numpy()
+        Returns:
+            List of prediction dicts, aligned with processed_texts
+        """
+        # Tokenize batch
+        inputs = self.tokenizer(
+            processed_texts,
+            max_length=self.max_length,
+            padding=True,  # Pad to longest in batch
+            pad_to_multiple_of=8,  # Tile-friendly shapes for the GEMM kernels
+            truncation=True,
+            return_tensors=self._tensor_type
+        )
+        
+        # Move to device (tokenizer output is already on the CPU)
+        if self.device != 'cpu':
+            inputs = {k: v.to(self.device, non_blocking=True) for k, v in inputs.items()}
+        
+        # Model inference (Single call!)
+        predictions = self._run_model(inputs)
+        
+        # Parse predictions
+        # Move all to CPU/numpy at once
+        multi_label_preds, multi_label_probs, severity_preds, severity_scores = self._to_host(predictions)
+        
+        # Per-row reductions for the whole batch at once; Python-level work
+        # below is only needed for rows that trigger a label
+        triggered_masks = multi_label_preds == 1
+        triggered_counts = triggered_masks.sum(axis=1)
+        harmful_rows = (triggered_masks & self._harmful_mask).any(axis=1)
+        clean_confidences = (1 - multi_label_probs.max(axis=1)).tolist()
+        all_probs_rows = multi_label_probs.tolist()
+        
+        # Map back to results
+        batch_results = []
+        for j in range(len(processed_texts)):
+            all_probs = all_probs_rows[j]
             
-            # Map back to results
-            for j, original_idx in enumerate(indices_to_predict):
-                # Extract single item results
-                item_preds = multi_label_preds[j]
-                item_probs = multi_label_probs[j]
-                item_severity = severity_preds[j]
-                item_severity_score = severity_scores[j]
-                
-                # Logic from predict()
-                triggered_indices = np.where(item_preds == 1)[0]
-                triggered_labels = [self.label_names[k] for k in triggered_indices]
-                triggered_probs = [float(item_probs[k]) for k in triggered_indices]
-                
-                # Build result dict
-                result = {}
-                
-                if not triggered_labels:
+            if triggered_counts[j] == 0:
+                result = {
+                    'labels': [],
+                    'severities': [],
+                    'action': 'allowed',
+                    'confidence': clean_confidences[j],
+                    'reasoning': 'Clean content, no violation',
+                    'method': 'ml_model_batch'
+                }
+            elif not harmful_rows[j]:
+                # Filter logic: check profanity confidence
+                profanity_idx = self._profanity_idx
+                if (profanity_idx >= 0 and triggered_masks[j, profanity_idx]
+                        and multi_label_probs[j, profanity_idx] < 0.8):
                     result = {
                         'labels': [],
                         'severities': [],
                         'action': 'allowed',
-                        'confidence': float(1 - item_probs.max()),
-                        'reasoning': 'Clean content, no violation',
-                        'method': 'ml_model_batch'
+                        'confidence': 0.6,
+                        'reasoning': 'Strong language but no severe violation',
+                        'method': 'ml_model_filtered'
                     }
                 else:
-                    # Filter logic
-                    harmful_labels = {'toxicity', 'hate', 'harassment', 'threat', 'pii', 'sexual'}
-                    triggered_harmful = [l for l in triggered_labels if l in harmful_labels]
-                    
-                    if not triggered_harmful:
-                        # Check profanity confidence
-                        profanity_idx = self.label_names.index('profanity') if 'profanity' in self.label_names else -1
-                        if profanity_idx >= 0 and item_preds[profanity_idx] == 1 and item_probs[profanity_idx] < 0.8:
-                            result = {
-                                'labels': [],
-                                'severities': [],
-                                'action': 'allowed',
-                                'confidence': 0.6,
-                                'reasoning': 'Strong language but no severe violation',
-                                'method': 'ml_model_filtered'
-                            }
-                        else:
-                            # Check if just negative sentiment/spam
-                            result = {
-                                'labels': [],
-                                'severities': [],
-                                'action': 'allowed',
-                                'confidence': 0.7,
-                                'reasoning': 'Negative but valid feedback',
-                                'method': 'ml_model_filtered'
-                            }
-                    
-                    # If still empty (filtered out), set it
-                    if not result:
-                        action = severity_to_action(item_severity)
-                        reasoning_parts = []
-                        for label, prob in zip(triggered_labels, triggered_probs):
-                            label_desc = LABEL_DESCRIPTIONS.get(ModerationLabel(label), {}).get('en', label)
-                            reasoning_parts.append(f"{label_desc} ({prob:.2%})")
-                        
-                        reasoning = f"Violation detected: {', '.join(reasoning_parts)} | Severity: {item_severity}"
-                        
-                        result = {
-                            'labels': triggered_labels,
-                            'severities': [int(item_severity)] * len(triggered_labels),
-                            'probabilities': {l: p for l, p in zip(triggered_labels, triggered_probs)},
-                            'action': action,
-                            'confidence': float(np.mean(triggered_probs)),
-                            'reasoning': reasoning,
-                            'severity_score': float(item_severity_score),
-                            'method': 'ml_model_batch'
-                        }
+                    # Check if just negative sentiment/spam
+                    result = {
+                        'labels': [],
+                        'severities': [],
+                        'action': 'allowed',
+                        'confidence': 0.7,
+                        'reasoning': 'Negative but valid feedback',
+                        'method': 'ml_model_filtered'
+                    }
+            else:
+                item_severity = severity_preds[j]
+                triggered_indices = np.flatnonzero(triggered_masks[j])
+                triggered_labels = self._label_array[triggered_indices].tolist()
+                triggered_probs = [all_probs[k] for k in triggered_indices]
                 
-                # Add all probs
-                result['all_probabilities'] = {
-                    label: float(prob) 
-                    for label, prob in zip(self.label_names, item_probs)
-                }
+                action = severity_to_action(item_severity)
+                reasoning_parts = []
+                for label, prob in zip(triggered_labels, triggered_probs):
+                    label_desc = self._label_descriptions[label]
+                    reasoning_parts.append(f"{label_desc} ({prob:.2%})")
                 
-                batch_results[original_idx] = result
+                reasoning = f"Violation detected: {', '.join(reasoning_parts)} | Severity: {item_severity}"
+                
+                result = {
+                    'labels': triggered_labels,
+                    'severities': [int(item_severity)] * len(triggered_labels),
+                    'probabilities': {l: p for l, p in zip(triggered_labels, triggered_probs)},
+                    'action': action,
+                    'confidence': float(np.mean(triggered_probs)),
+                    'reasoning': reasoning,
+                    'severity_score': float(severity_scores[j]),
+                    'method': 'ml_model_batch'
+                }
             
-            results.extend(batch_results)
+            # Add all probs
+            result['all_probabilities'] = dict(zip(self.label_names, all_probs))
+            
+            batch_results.append(result)
         
-        return results
+        return batch_results
 
 
 # Backward compatibility wrapper
+# Shared engines, one per (model_path, device, constructor kwargs): PhoBERT
+# weights (~500 MB) are loaded once per process for each configuration,
+# however many wrappers or threads use it
+_engine_instances: Dict[Tuple, MultiTaskModerationInference] = {}
+_engine_locks: Dict[Tuple, threading.Lock] = {}
+_engine_lock = threading.Lock()  # Guards the two dicts above only
+
+def get_multitask_engine(
+    model_path: str,
+    device: str = 'cpu',
+    **kwargs
+) -> MultiTaskModerationInference:
+    """
+    Get or create the shared multi-task engine for a model path, device and configuration
+    
+    Callers passing different kwargs get different engines, so no caller
+    silently runs with another caller's thresholds or flags.
+    
+    Args:
+        model_path: Đường dẫn model
+        device: 'cpu' hoặc 'cuda'
+        **kwargs: Tham số khác của MultiTaskModerationInference (phải hashable)
+    """
+    key = (model_path, device, tuple(sorted(kwargs.items())))
+    with _engine_lock:
+        engine = _engine_instances.get(key)
+        if engine is not None:
+            return engine
+        key_lock = _engine_locks.setdefault(key, threading.Lock())
+    
+    # Load outside the global lock: other configurations aren't blocked
+    # while this model loads, callers of the same key wait for it
+    with key_lock:
+        engine = _engine_instances.get(key)
+        if engine is None:
+            engine = MultiTaskModerationInference(model_path=model_path, device=device, **kwargs)
+            with _engine_lock:
+                _engine_instances[key] = engine
+    return engine
+
+
 class ModerationInference:
     """
     Wrapper for backward compatibility with existing code
@@ -897,12 +1600,11 @@ class ModerationInference:
         self.model_path = model_path or 'vinai/phobert-base-v2'
         self.device = device
         
-        # Try to load multi-task model, fallback to rule-based
+        self._fallback_engine = None
+        
+        # Try to load multi-task model (shared), fallback to rule-based
         try:
-            self.engine = MultiTaskModerationInference(
-                model_path=self.model_path,
-                device=device
-            )
+            self.engine = get_multitask_engine(self.model_path, device)
             self.use_ml = True
         except Exception as e:
             logger.warning(f"Failed to load ML model: {e}, using rule-based only")
@@ -916,7 +1618,7 @@ class ModerationInference:
             Dict with sentiment, moderation_result, confidence, reasoning
         """
         if self.use_ml:
-            result = self.engine.predict(text)
+            result = self.engine.predict(text, verbose=False)
             
             # Map to old format
             action_map = {
@@ -942,10 +1644,11 @@ class ModerationInference:
                 'flagged_words': []
             }
         else:
-            # Fallback to simple rule-based
-            from nlp.inference import ModerationInference as OldInference
-            old_engine = OldInference(model_path=self.model_path, device=self.device)
-            return old_engine.predict(text)
+            # Fallback to simple rule-based (engine created once, not per call)
+            if self._fallback_engine is None:
+                from nlp.inference import ModerationInference as OldInference
+                self._fallback_engine = OldInference(model_path=self.model_path, device=self.device)
+            return self._fallback_engine.predict(text)
     
     # ==================== METRICS METHODS ====================
     
@@ -978,8 +1681,9 @@ class ModerationInference:
     def reset_metrics(self):
         """Reset all metrics counters to zero"""
         if self.metrics:
-            for key in self.metrics:
-                self.metrics[key] = 0
+            with self._metrics_lock:
+                for key in self.metrics:
+                    self.metrics[key] = 0
             logger.info("Metrics reset to zero")
     
     def log_metrics(self):
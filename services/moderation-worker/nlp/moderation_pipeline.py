@@ -29,12 +29,19 @@ Version: 1.0.0
 Last Updated: 2026-01-30
 """
 
+import copy
 import logging
+import threading
+from collections import OrderedDict
 from typing import Dict, List, Any, Optional, Tuple
 import numpy as np
 
 logger = logging.getLogger(__name__)
 
+# Layer C merge: label threshold and labels that make a merged result harmful
+ML_MERGE_THRESHOLD = 0.5
+ML_HARMFUL_LABELS = frozenset({'toxicity', 'hate', 'harassment', 'threat', 'pii', 'sexual'})
+
 
 class ThreeLayerModerationPipeline:
     """
@@ -47,6 +54,7 @@ class ThreeLayerModerationPipeline:
         use_rule_based: bool = True,
         use_ml_model: bool = True,
         ml_runs_on_multiple_versions: bool = True,
+        cache_size: int = 16384,
     ):
         """
         Args:
@@ -54,12 +62,21 @@ class ThreeLayerModerationPipeline:
             use_rule_based: Enable Layer B rule-based checking
             use_ml_model: Enable Layer C ML model
             ml_runs_on_multiple_versions: Run ML on original + normalized (take max)
+            cache_size: Max cached Layer A/B results (0 = disabled)
         """
         self.text_model = text_model
         self.use_rule_based = use_rule_based
         self.use_ml_model = use_ml_model
         self.ml_runs_on_multiple_versions = ml_runs_on_multiple_versions
         
+        # LRU cache for Layer A/B outputs: both are deterministic per text, and
+        # traffic repeats a lot (spam, template reviews)
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[Tuple, Any]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._cache_hits = 0
+        self._cache_misses = 0
+        
         # Initialize Layer A: Normalizer
         try:
             from nlp.text_normalizer import get_normalizer
@@ -92,10 +109,44 @@ class ThreeLayerModerationPipeline:
         else:
             self.rule_checker = None
     
+    def _cached(self, key: Tuple, compute):
+        """
+        Copy of the cached value for key, computed with compute() on a miss
+        
+        Values are deep-copied in and out: later steps add keys to rule
+        results, so callers must never share the cached object.
+        """
+        if not self.cache_size:
+            return compute()
+        
+        with self._cache_lock:
+            value = self._cache.get(key)
+            if value is not None:
+                self._cache.move_to_end(key)
+                self._cache_hits += 1
+            else:
+                self._cache_misses += 1
+        if value is not None:
+            # None results are stored as {} (see below)
+            return copy.deepcopy(value) or None
+        
+        value = compute()
+        stored = copy.deepcopy(value) if value else {}
+        with self._cache_lock:
+            self._cache[key] = stored
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return value
+    
     def _run_layer_a(self, text: str) -> Dict[str, Any]:
         """
-        Layer A: Normalize text and create versions
+        Layer A: Normalize text and create versions (cached per text)
         """
+        return self._cached(('layer_a', text), lambda: self._normalize(text))
+    
+    def _normalize(self, text: str) -> Dict[str, Any]:
+        """Uncached Layer A"""
         if not self.normalizer:
             return {
                 'original': text,
@@ -114,19 +165,42 @@ class ThreeLayerModerationPipeline:
         metadata: Dict
     ) -> Optional[Dict[str, Any]]:
         """
-        Layer B: Rule-based check
+        Layer B: Rule-based check (cached per text versions)
         
         Returns result if violation found, None otherwise
         """
         if not self.use_rule_based or not self.rule_checker:
             return None
         
-        return self.rule_checker.check(
+        key = ('layer_b', text, normalized, no_diacritics, bool(metadata.get('has_obfuscation')))
+        return self._cached(key, lambda: self.rule_checker.check(
             text=text,
             normalized_text=normalized,
             no_diacritics_text=no_diacritics,
             metadata=metadata
-        )
+        ))
+    
+    def cache_clear(self):
+        """Drop cached Layer A/B results"""
+        with self._cache_lock:
+            self._cache.clear()
+    
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Cache statistics for monitoring
+        
+        Returns:
+            Dict with cache hits, misses, hit rate (%) and current size
+        """
+        with self._cache_lock:
+            hits, misses, size = self._cache_hits, self._cache_misses, len(self._cache)
+        total = hits + misses
+        return {
+            'cache_hits': hits,
+            'cache_misses': misses,
+            'cache_hit_rate': hits / total * 100 if total else 0.0,
+            'cache_size': size,
+        }
     
     def _run_layer_c_single(self, text: str) -> Optional[Dict[str, Any]]:
         """
@@ -177,6 +251,60 @@ class ThreeLayerModerationPipeline:
             logger.error(f"ML model prediction failed: {e}")
             return None
     
+    def _run_layer_c_batch(
+        self,
+        items: List[Tuple[str, str]],
+        batch_size: int = 32
+    ) -> List[Optional[Dict[str, Any]]]:
+        """
+        Layer C for many texts: one batched model call for every version
+        
+        Args:
+            items: (original, normalized) pairs
+            batch_size: Model batch size
+        
+        Returns:
+            One ML result per item (merged across versions like _run_layer_c)
+        """
+        if not self.use_ml_model or not self.text_model or not items:
+            return [None] * len(items)
+        
+        # Flat list of model inputs; owners[k] is the item ml_inputs[k] belongs to
+        ml_inputs = []
+        owners = []
+        for i, (original, normalized) in enumerate(items):
+            ml_inputs.append(original)
+            owners.append(i)
+            if self.ml_runs_on_multiple_versions and normalized != original.lower():
+                ml_inputs.append(normalized)
+                owners.append(i)
+        
+        ml_outputs = None
+        if hasattr(self.text_model, 'batch_predict'):
+            try:
+                ml_outputs = self.text_model.batch_predict(ml_inputs, batch_size=batch_size)
+            except Exception as e:
+                # One bad input must not drop Layer C for the whole batch
+                logger.error(f"ML model batch prediction failed, retrying per text: {e}")
+        if ml_outputs is None:
+            ml_outputs = [self._run_layer_c_single(text) for text in ml_inputs]
+        
+        # Group outputs per item: [original] or [original, normalized]
+        grouped = [[] for _ in items]
+        for owner, output in zip(owners, ml_outputs):
+            grouped[owner].append(output)
+        
+        results = []
+        for outputs in grouped:
+            # Same as _run_layer_c: a failed version means no ML result
+            if any(output is None for output in outputs):
+                results.append(None)
+            elif len(outputs) > 1:
+                results.append(self._merge_ml_results(outputs[0], outputs[1]))
+            else:
+                results.append(outputs[0])
+        return results
+    
     def _merge_ml_results(
         self, 
         result1: Dict[str, Any], 
@@ -191,30 +319,23 @@ class ThreeLayerModerationPipeline:
         if result2.get('action') == 'reject':
             return result2
         
-        # Merge probabilities
+        # Merge probabilities: max per label, in the models' label order
         probs1 = result1.get('all_probabilities', {})
         probs2 = result2.get('all_probabilities', {})
         
-        merged_probs = {}
-        all_labels = set(probs1.keys()) | set(probs2.keys())
-        
-        for label in all_labels:
-            p1 = probs1.get(label, 0)
-            p2 = probs2.get(label, 0)
-            merged_probs[label] = max(p1, p2)
+        merged_probs = dict(probs1)
+        for label, p2 in probs2.items():
+            merged_probs[label] = max(merged_probs.get(label, 0), p2)
         
         # Re-determine triggered labels based on merged probs
-        threshold = 0.5
-        triggered_labels = [l for l, p in merged_probs.items() if p >= threshold]
+        triggered_labels = [l for l, p in merged_probs.items() if p >= ML_MERGE_THRESHOLD]
         
         # Determine action based on merged labels
-        harmful_labels = {'toxicity', 'hate', 'harassment', 'threat', 'pii', 'sexual'}
-        triggered_harmful = [l for l in triggered_labels if l in harmful_labels]
+        harmful_probs = [merged_probs[l] for l in triggered_labels if l in ML_HARMFUL_LABELS]
         
-        if triggered_harmful:
+        if harmful_probs:
             # Has harmful labels
-            max_prob = max(merged_probs.get(l, 0) for l in triggered_harmful)
-            action = 'reject' if max_prob >= 0.7 else 'review'
+            action = 'reject' if max(harmful_probs) >= 0.7 else 'review'
         else:
             action = 'allowed'
         
@@ -310,6 +431,24 @@ class ThreeLayerModerationPipeline:
         # Layer A: Normalize
         versions = self._run_layer_a(text)
         
+        # Layer B: Rule-based check (may short-circuit)
+        rule_result, final_result = self._run_rules(versions)
+        if final_result is not None:
+            return final_result
+        
+        # Layer C: ML model
+        ml_result = self._run_layer_c(versions['original'], versions['fully_normalized'], versions)
+        
+        return self._finalize(rule_result, ml_result, versions)
+    
+    def _run_rules(self, versions: Dict[str, Any]) -> Tuple[Optional[Dict], Optional[Dict]]:
+        """
+        Layer B for one normalized text
+        
+        Returns:
+            (rule_result, final_result); final_result is set when a severe
+            rule violation short-circuits the ML layer
+        """
         original = versions['original']
         normalized = versions['fully_normalized']
         no_diacritics = versions['no_diacritics']
@@ -328,33 +467,55 @@ class ThreeLayerModerationPipeline:
                 # Add obfuscation info
                 rule_result['normalized_text'] = normalized
                 rule_result['obfuscation'] = metadata
-                return rule_result
-        
-        # Layer C: ML model
-        ml_result = self._run_layer_c(original, normalized, versions)
+                return rule_result, rule_result
         
-        # Combine results
+        return rule_result, None
+    
+    def _finalize(
+        self,
+        rule_result: Optional[Dict],
+        ml_result: Optional[Dict],
+        versions: Dict
+    ) -> Dict[str, Any]:
+        """Combine rule and ML results and attach the text versions"""
         final_result = self._combine_results(rule_result, ml_result, versions)
         
         # Add metadata
         final_result['text_versions'] = {
-            'original': original,
-            'normalized': normalized,
-            'no_diacritics': no_diacritics,
+            'original': versions['original'],
+            'normalized': versions['fully_normalized'],
+            'no_diacritics': versions['no_diacritics'],
         }
-        final_result['obfuscation_detected'] = metadata.get('has_obfuscation', False)
+        final_result['obfuscation_detected'] = versions['metadata'].get('has_obfuscation', False)
         
         return final_result
     
     def batch_predict(self, texts: List[str], batch_size: int = 32) -> List[Dict[str, Any]]:
         """
         Batch prediction for multiple texts
+        
+        Layers A and B run per text; Layer C runs once for the whole batch
+        (original + normalized versions of every text not short-circuited
+        by the rules), so the model sees full batches instead of single texts.
         """
-        results = []
+        results: List[Optional[Dict[str, Any]]] = [None] * len(texts)
+        pending = []  # (index, versions, rule_result) still needing the ML layer
+        
+        for i, text in enumerate(texts):
+            versions = self._run_layer_a(text)
+            rule_result, final_result = self._run_rules(versions)
+            if final_result is not None:
+                results[i] = final_result
+            else:
+                pending.append((i, versions, rule_result))
+        
+        ml_results = self._run_layer_c_batch(
+            [(versions['original'], versions['fully_normalized']) for _, versions, _ in pending],
+            batch_size=batch_size
+        )
         
-        for text in texts:
-            result = self.predict(text)
-            results.append(result)
+        for (i, versions, rule_result), ml_result in zip(pending, ml_results):
+            results[i] = self._finalize(rule_result, ml_result, versions)
         
         return results
 
@@ -368,6 +368,23 @@ def preprocess_for_phobert(
     return text, metadata
 
 
+# PII patterns, compiled once
+# Phone numbers: 10-11 digits, can start with 0, +84, 84
+_PHONE_PATTERNS = [
+    re.compile(r'\b0\d{9,10}\b'),  # 0123456789
+    re.compile(r'\b84\d{9,10}\b'),  # 84123456789
+    re.compile(r'\+84\d{9,10}\b'),  # +84123456789
+    re.compile(r'\b\d{3}[-.\s]?\d{3}[-.\s]?\d{4}\b')  # 123-456-7890
+]
+_EMAIL_PATTERN = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
+_URL_PATTERN = re.compile(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+')
+_SOCIAL_PATTERNS = [
+    re.compile(r'\b(?:zalo|telegram|viber|whatsapp)[:\s]+\d+', re.IGNORECASE),
+    re.compile(r'\b(?:fb|facebook|ig|instagram)[:\s]+[\w\.]+', re.IGNORECASE),
+    re.compile(r'@[\w\.]+', re.IGNORECASE),
+]
+
+
 def extract_pii(text: str) -> Dict[str, List[str]]:
     """
     Extract Personal Identifiable Information (PII)
@@ -386,36 +403,18 @@ def extract_pii(text: str) -> Dict[str, List[str]]:
     }
     
     # Phone numbers (Vietnamese format)
-    # 10-11 digits, can start with 0, +84, 84
-    phone_patterns = [
-        r'\b0\d{9,10}\b',  # 0123456789
-        r'\b84\d{9,10}\b',  # 84123456789
-        r'\+84\d{9,10}\b',  # +84123456789
-        r'\b\d{3}[-.\s]?\d{3}[-.\s]?\d{4}\b'  # 123-456-7890
-    ]
-    
-    for pattern in phone_patterns:
-        matches = re.findall(pattern, text)
-        pii['phones'].extend(matches)
+    for pattern in _PHONE_PATTERNS:
+        pii['phones'].extend(pattern.findall(text))
     
     # Emails
-    email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-    pii['emails'] = re.findall(email_pattern, text)
+    pii['emails'] = _EMAIL_PATTERN.findall(text)
     
     # URLs
-    url_pattern = r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+'
-    pii['urls'] = re.findall(url_pattern, text)
+    pii['urls'] = _URL_PATTERN.findall(text)
     
     # Social media mentions
-    social_patterns = [
-        r'\b(?:zalo|telegram|viber|whatsapp)[:\s]+\d+',
-        r'\b(?:fb|facebook|ig|instagram)[:\s]+[\w\.]+',
-        r'@[\w\.]+',
-    ]
-    
-    for pattern in social_patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
-        pii['addresses'].extend(matches)
+    for pattern in _SOCIAL_PATTERNS:
+        pii['addresses'].extend(pattern.findall(text))
     
     # Remove duplicates
     for key in pii:
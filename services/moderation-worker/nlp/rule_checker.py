@@ -367,30 +367,25 @@ class EnhancedRuleChecker:
                 'patterns': [re.compile(p, re.IGNORECASE | re.UNICODE) for p in info['patterns']],
                 'info': info,
             }
-    
-    def _has_target_pronoun(self, text: str) -> bool:
-        """Check if text contains pronouns indicating target (mày/mi/nó...)"""
-        text_lower = text.lower()
-        
-        for pronoun in PERSONAL_ATTACK_INDICATORS['target_pronouns']:
-            if pronoun in text_lower:
-                return True
         
-        for pronoun in PERSONAL_ATTACK_INDICATORS['third_person']:
-            if pronoun in text_lower:
-                return True
+        # Standalone insults checked when obfuscation was detected
+        standalone_words = PROFANITY_STEMS.get('obfuscated_insults', {}).get('standalone_words', [])
+        self.compiled_standalone = [
+            (word, re.compile(rf'\b{word}\b', re.IGNORECASE)) for word in standalone_words
+        ]
         
-        return False
+        self.target_pronouns = (
+            list(PERSONAL_ATTACK_INDICATORS['target_pronouns'])
+            + list(PERSONAL_ATTACK_INDICATORS['third_person'])
+        )
     
-    def _is_in_safe_context(self, text: str, word: str, safe_contexts: List[str]) -> bool:
-        """Check if word appears in a safe context"""
-        text_lower = text.lower()
-        
-        for context in safe_contexts:
-            if context in text_lower:
-                return True
-        
-        return False
+    def _has_target_pronoun(self, text_lower: str) -> bool:
+        """Check if (lowercased) text contains pronouns indicating target (mày/mi/nó...)"""
+        return any(pronoun in text_lower for pronoun in self.target_pronouns)
+    
+    def _is_in_safe_context(self, text_lower: str, word: str, safe_contexts: List[str]) -> bool:
+        """Check if word appears in a safe context (text already lowercased)"""
+        return any(context in text_lower for context in safe_contexts)
     
     def _check_profanity(self, text: str, text_no_diacritics: str) -> List[Dict]:
         """Check for profanity patterns"""
@@ -402,7 +397,7 @@ class EnhancedRuleChecker:
             
             # Check safe contexts
             safe_contexts = info.get('safe_contexts', [])
-            if safe_contexts and self._is_in_safe_context(text, key, safe_contexts):
+            if safe_contexts and self._is_in_safe_context(text_lower, key, safe_contexts):
                 continue
             
             # Check if context required (like "ngu" needs full pattern)
@@ -416,7 +411,7 @@ class EnhancedRuleChecker:
                             'key': key,
                             'matched': match.group(),
                             'severity': info['severity'],
-                            'labels': info['labels'],
+                            'labels': list(info['labels']),
                         })
                         break
             else:
@@ -429,7 +424,7 @@ class EnhancedRuleChecker:
                             'key': key,
                             'matched': match.group(),
                             'severity': info['severity'],
-                            'labels': info['labels'],
+                            'labels': list(info['labels']),
                         })
                         break
                 
@@ -439,13 +434,13 @@ class EnhancedRuleChecker:
                         match = compiled['stripped'].search(text_no_diacritics)
                         if match:
                             # Double-check not in safe context
-                            if not self._is_in_safe_context(text, key, safe_contexts):
+                            if not self._is_in_safe_context(text_lower, key, safe_contexts):
                                 findings.append({
                                     'type': 'profanity',
                                     'key': key,
                                     'matched': match.group(),
                                     'severity': info['severity'],
-                                    'labels': info['labels'],
+                                    'labels': list(info['labels']),
                                     'from_stripped': True,
                                 })
         
@@ -455,13 +450,17 @@ class EnhancedRuleChecker:
         """Check for harassment/body-shaming patterns"""
         findings = []
         text_lower = text.lower()
+        has_target = None  # Checked once, on the first pattern that needs it
         
         for key, compiled in self.compiled_harassment.items():
             info = compiled['info']
             
             # Check if requires target
-            if info.get('requires_target') and not self._has_target_pronoun(text):
-                continue
+            if info.get('requires_target'):
+                if has_target is None:
+                    has_target = self._has_target_pronoun(text_lower)
+                if not has_target:
+                    continue
             
             for pattern in compiled['patterns']:
                 match = pattern.search(text_lower)
@@ -471,7 +470,7 @@ class EnhancedRuleChecker:
                         'key': key,
                         'matched': match.group(),
                         'severity': info['severity'],
-                        'labels': info['labels'],
+                        'labels': list(info['labels']),
                     })
                     break
         
@@ -500,7 +499,7 @@ class EnhancedRuleChecker:
                         'key': key,
                         'matched': match.group(),
                         'severity': info['severity'],
-                        'labels': info['labels'],
+                        'labels': list(info['labels']),
                     })
                     break
         
@@ -547,14 +546,12 @@ class EnhancedRuleChecker:
         # If obfuscation was detected and normalized text contains insult words,
         # this indicates intentional bypass attempt
         if metadata and metadata.get('has_obfuscation'):
-            obfuscated_insults_info = PROFANITY_STEMS.get('obfuscated_insults', {})
-            standalone_words = obfuscated_insults_info.get('standalone_words', [])
-            
-            for word in standalone_words:
+            original_lower = text.lower()
+            for word, pattern in self.compiled_standalone:
                 # Check if normalized text contains this word as standalone
-                if re.search(rf'\b{word}\b', normalized_text, re.IGNORECASE):
+                if pattern.search(normalized_text):
                     # Check if original text didn't contain it (meaning it was obfuscated)
-                    if not re.search(rf'\b{word}\b', text.lower(), re.IGNORECASE):
+                    if not pattern.search(original_lower):
                         all_findings.append({
                             'type': 'obfuscated_insult',
                             'key': 'obfuscated_insults',
@@ -208,6 +208,13 @@ SEPARATOR_CHARS = set([
     '{', '}', '<', '>', '•', '·', '°', '◦', '○', '●',
 ])
 
+# Precompiled patterns used on every text (avoids re's pattern-cache lookup per call)
+REPEATED_CHARS_PATTERN = re.compile(r'(.)\1{2,}')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+SPACED_SINGLE_LETTERS_PATTERN = re.compile(
+    r'(?<![a-zA-ZđĐ])([a-zA-ZđĐ])(\s+)([a-zA-ZđĐ])(?![a-zA-ZđĐ])'
+)
+
 
 # ==================== MAIN NORMALIZER CLASS ====================
 
@@ -309,7 +316,7 @@ class VietnameseTextNormalizer:
         "đmmmmm" → "đmm"
         "nguuuuu" → "nguu"
         """
-        return re.sub(r'(.)\1{2,}', r'\1\1', text)
+        return REPEATED_CHARS_PATTERN.sub(r'\1\1', text)
     
     def remove_separators_between_letters(self, text: str) -> Tuple[str, int]:
         """
@@ -330,7 +337,6 @@ class VietnameseTextNormalizer:
         # PRE-PROCESSING: Handle excess whitespace between single letters
         # Pattern: single_letter + space(s) + single_letter  (repeated)
         # This catches: "d  m", "n g u", "d   m   m"
-        viet_letter = r'[a-zA-ZđĐ]'
         
         # Find sequences of single letters separated by whitespace
         # Match: (single_letter)(\s+)(single_letter)
@@ -343,11 +349,7 @@ class VietnameseTextNormalizer:
         while prev_text != working_text:
             prev_text = working_text
             # Pattern: single_letter at word boundary + spaces + single_letter at word boundary
-            new_text = re.sub(
-                rf'(?<![a-zA-ZđĐ])({viet_letter})(\s+)({viet_letter})(?![a-zA-ZđĐ])',
-                join_single_letters,
-                working_text
-            )
+            new_text = SPACED_SINGLE_LETTERS_PATTERN.sub(join_single_letters, working_text)
             if new_text != working_text:
                 count += 1
                 working_text = new_text
@@ -381,7 +383,7 @@ class VietnameseTextNormalizer:
         Step 6: Normalize all whitespace to single spaces
         """
         # Replace multiple spaces/tabs/newlines with single space
-        text = re.sub(r'\s+', ' ', text)
+        text = WHITESPACE_PATTERN.sub(' ', text)
         return text.strip()
     
     def remove_vietnamese_diacritics(self, text: str) -> str:
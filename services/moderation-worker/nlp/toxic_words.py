@@ -7,6 +7,8 @@ Coverage: 500+ toxic patterns, 1000+ variants
 Last Updated: 2025-11-04
 """
 
+from functools import lru_cache
+
 # ==================== LEVEL 1: SEVERE (AUTO REJECT) ====================
 
 # Extremely severe profanity - EXPANDED with VARIANTS
@@ -766,10 +768,12 @@ CONTEXT_MULTIPLIERS = {
 }
 
 # ==================== HELPER FUNCTIONS - ENHANCED ====================
+# Combined lists are built once and returned as (shared, immutable) tuples
 
+@lru_cache(maxsize=None)
 def get_all_toxic_words():
     """Get all toxic words"""
-    return (
+    return tuple(
         SEVERE_PROFANITY + 
         SEVERE_INSULTS + 
         HATE_LGBTQ +
@@ -783,9 +787,10 @@ def get_all_toxic_words():
         PERSONAL_ATTACKS
     )
 
+@lru_cache(maxsize=None)
 def get_critical_words():
     """Get most severe words - auto reject"""
-    return (
+    return tuple(
         SEVERE_PROFANITY + 
         SEVERE_INSULTS +
         HATE_LGBTQ +
@@ -794,18 +799,20 @@ def get_critical_words():
         SEXUAL_SOLICITATION
     )
 
+@lru_cache(maxsize=None)
 def get_hate_speech_words():
     """Get hate speech words"""
-    return (
+    return tuple(
         HATE_LGBTQ +
         HATE_RACISM +
         HATE_RELIGION +
         HATE_SEXISM
     )
 
+@lru_cache(maxsize=None)
 def get_sexual_content_words():
     """Lấy từ nội dung tình dục"""
-    return (
+    return tuple(
         SEXUAL_EXPLICIT +
         SEXUAL_SUGGESTIVE +
         SEXUAL_SOLICITATION
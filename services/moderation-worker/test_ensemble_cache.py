@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""
+Test the EnsembleModerator result cache
+
+- Cache hits are independent copies: mutating a returned result (or its
+  per-method results) must not change what the next call returns
+- Texts that only differ in surrounding whitespace / Unicode normalization
+  share an entry; case variants do not
+- batch_moderate() equals moderate(), with cold and warm caches
+- methods_used passed to ModerationResult is kept in methods_used_mask
+"""
+
+import copy
+import sys
+import unicodedata
+
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+from nlp.ensemble_moderator import (
+    EnsembleModerator, ModerationAction, ModerationMethod, ModerationResult
+)
+
+TEXTS = [
+    'Sản phẩm rất tốt, giao hàng nhanh',
+    'đồ ngu',
+    'Đồ NGU',
+    'mày ngu như bò',
+    'đ.m thằng này',
+    'd1t me may',
+    'shop lừa đảo, không nên mua',
+    'Inbox zalo 0909123456 nhận quà http://spam.vn',
+    'các bạn ơi cho hỏi cách dùng',
+    'Dịch vụ tệ quá, thất vọng',
+    '',
+    '   ',
+    'đồ ngu',  # duplicate inside one batch
+]
+
+
+class FakeModel:
+    """Deterministic stand-in for MultiTaskModerationInference (no torch needed)"""
+
+    def predict(self, text, use_rule_based_fallback=None, **kwargs):
+        lowered = text.lower()
+        probs = {
+            'toxicity': 0.9 if 'ngu' in lowered.split() else 0.1,
+            'harassment': 0.6 if 'mày' in lowered else 0.05,
+        }
+        labels = [label for label, p in probs.items() if p >= 0.5]
+        action = 'allowed'
+        if labels:
+            action = 'reject' if max(probs[label] for label in labels) >= 0.7 else 'review'
+        return {
+            'labels': labels,
+            'action': action,
+            'confidence': max(probs.values()),
+            'all_probabilities': probs,
+            'method': 'ml_model',
+        }
+
+    def batch_predict(self, texts, batch_size=32, use_rule_based_fallback=None):
+        return [self.predict(text) for text in texts]
+
+    def rule_based_check(self, text):
+        if 'lừa đảo' in text.lower():
+            return {'action': 'review', 'labels': ['spam'], 'confidence': 0.6,
+                    'flagged_words': ['lừa đảo'], 'reasoning': 'fake rule'}
+        return None
+
+
+def view(result):
+    """Comparable form of a ModerationResult (timing ignored)"""
+    return (
+        result.action,
+        round(result.confidence, 6),
+        sorted(result.labels or ()),
+        result.reasoning,
+        sorted(result.flagged_words or ()),
+        result.methods_used_mask,
+        copy.deepcopy(result.rule_based_result),
+        copy.deepcopy(result.ml_result),
+        copy.deepcopy(result.context_result),
+        copy.deepcopy(result.variant_result),
+    )
+
+
+def mutate(value):
+    """Scribble over a result dict in place, like a careless caller would"""
+    if isinstance(value, dict):
+        for key in list(value):
+            if isinstance(value[key], (dict, list)):
+                mutate(value[key])
+        value['__mutated__'] = True
+    elif isinstance(value, list):
+        for item in value:
+            mutate(item)
+        value.append('__mutated__')
+
+
+print("=" * 60)
+print("TEST: EnsembleModerator result cache")
+print("=" * 60)
+
+passed = 0
+failed = 0
+
+
+def check(name, ok):
+    global passed, failed
+    if ok:
+        print(f"  ✓ PASS {name}")
+        passed += 1
+    else:
+        print(f"  ✗ FAIL {name}")
+        failed += 1
+
+
+for label, model in (('no ML', None), ('fake ML', FakeModel())):
+    moderator = EnsembleModerator(ml_inference=model)
+
+    ok = True
+    for text in TEXTS:
+        first = moderator.moderate(text)
+        expected = view(first)
+        first.flagged_words.append('__mutated__')
+        for sub in (first.rule_based_result, first.ml_result, first.context_result, first.variant_result):
+            if sub is not None:
+                mutate(sub)
+        if view(moderator.moderate(text)) != expected or view(moderator.moderate(text)) != expected:
+            ok = False
+            print(f"    mismatch after mutation: {text!r}")
+    check(f"[{label}] cache hits unaffected by mutation", ok)
+
+    moderator.cache_clear()
+    text = 'mày ngu như bò'
+    first = moderator.moderate(text)
+    hits = [
+        moderator.moderate(f'  {text}\n'),
+        moderator.moderate(unicodedata.normalize('NFD', text)),
+    ]
+    check(f"[{label}] whitespace/NFD variants hit the cache",
+          all(hit.processing_time_ms == 0.0 and view(hit) == view(first) for hit in hits))
+    check(f"[{label}] case variants do not share an entry",
+          moderator.moderate(text.upper()).processing_time_ms > 0.0)
+
+    moderator.cache_clear()
+    single = [view(moderator.moderate(text)) for text in TEXTS]
+    moderator.cache_clear()
+    check(f"[{label}] batch_moderate() == moderate()",
+          [view(result) for result in moderator.batch_moderate(TEXTS)] == single)
+    check(f"[{label}] batch_moderate() == moderate() (cached)",
+          [view(result) for result in moderator.batch_moderate(TEXTS)] == single)
+
+# methods_used constructor argument -> mask -> methods in pipeline order
+result = ModerationResult(
+    action=ModerationAction.REVIEW,
+    confidence=0.5,
+    reasoning='test',
+    methods_used=[ModerationMethod.ML_MODEL, ModerationMethod.RULE_BASED],
+)
+check("methods_used seeds methods_used_mask",
+      result.get_methods_used() == [ModerationMethod.RULE_BASED, ModerationMethod.ML_MODEL]
+      and result.to_dict()['methods_used'] == ['rule_based', 'ml_model'])
+check("no methods_used means no methods",
+      ModerationResult(ModerationAction.ALLOWED, 0.0, 'test').get_methods_used() == [])
+
+print("\n" + "=" * 60)
+print(f"Results: {passed} passed, {failed} failed")
+print("=" * 60)
+sys.exit(0 if failed == 0 else 1)
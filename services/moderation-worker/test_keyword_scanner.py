@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+Test KeywordScanner / LexiconScanner against plain Python matching
+
+Every scanner result must equal the loop it replaces over the toxic lexicon:
+- KeywordScanner.find: `kw in text`
+- LexiconScanner (whole_word): re.search(r'\\b' + re.escape(word) + r'\\b', text)
+- LexiconScanner (substring): `word in text`
+
+Run with and without ahocorasick_rs (the fallback path is forced below).
+"""
+
+import random
+import re
+import sys
+
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+import nlp.keyword_scanner as keyword_scanner
+from nlp.keyword_scanner import KeywordScanner, LexiconScanner
+from nlp import toxic_words
+
+LEXICONS = {
+    'severe_profanity': toxic_words.SEVERE_PROFANITY,
+    'severe_insults': toxic_words.SEVERE_INSULTS,
+    'hate_lgbtq': toxic_words.HATE_LGBTQ,
+    'hate_racism': toxic_words.HATE_RACISM,
+    'hate_religion': toxic_words.HATE_RELIGION,
+    'hate_sexism': toxic_words.HATE_SEXISM,
+    'sexual_explicit': toxic_words.SEXUAL_EXPLICIT,
+    'personal_attacks': toxic_words.PERSONAL_ATTACKS,
+    'spam': toxic_words.SPAM_INDICATORS,
+    'allowed': toxic_words.ALLOWED_PHRASES,
+}
+
+# Words that trip naive boundary handling (Vietnamese letters next to a match)
+EXTRA_WORDS = ['ngu', 'nguồn', 'người', 'các', 'cách', 'lòng', 'đeo', 'mày', 'tao', 'x', '_', 'a1']
+SEPARATORS = [' ', ' ', ', ', '. ', '!', '', '_', '-', '\n', 'ồ', '1']
+
+
+def build_corpus(size: int = 1000):
+    """Random texts mixing lexicon words, lookalikes and separators (fixed seed)"""
+    rnd = random.Random(19)
+    pools = [list(words) for words in LEXICONS.values()] + [EXTRA_WORDS]
+    texts = ['', 'sản phẩm tốt', 'nguồn hàng', 'đồ ngu', 'các bạn ơi', 'địt mẹ mày']
+    for _ in range(size):
+        parts = []
+        for _ in range(rnd.randint(1, 6)):
+            parts.append(rnd.choice(rnd.choice(pools)))
+            parts.append(rnd.choice(SEPARATORS))
+        texts.append(''.join(parts).lower())
+    return texts
+
+
+def expected_keywords(words, text):
+    return {kw for kw in words if kw and kw in text}
+
+
+def expected_lexicon_hits(lexicons, text, whole_word):
+    hits = {}
+    for name, words in lexicons.items():
+        if whole_word:
+            hits[name] = [w for w in words if w and re.search(r'\b' + re.escape(w.lower()) + r'\b', text)]
+        else:
+            hits[name] = [w for w in words if w and w in text]
+    return hits
+
+
+def run_checks(label: str):
+    """Compare all scanners with the reference loops; returns (passed, failed)"""
+    all_words = [w for words in LEXICONS.values() for w in words]
+    keyword_scanner_ = KeywordScanner(all_words)
+    whole_word_scanner = LexiconScanner(LEXICONS, whole_word=True)
+    substring_scanner = LexiconScanner(LEXICONS, whole_word=False)
+
+    passed = failed = 0
+    for name, check in (
+        ('KeywordScanner.find', lambda t: keyword_scanner_.find(t) == expected_keywords(all_words, t)),
+        ('LexiconScanner whole_word', lambda t: whole_word_scanner.scan(t) == expected_lexicon_hits(LEXICONS, t, True)),
+        ('LexiconScanner substring', lambda t: substring_scanner.scan(t) == expected_lexicon_hits(LEXICONS, t, False)),
+    ):
+        mismatches = [t for t in CORPUS if not check(t)]
+        if mismatches:
+            print(f"  ✗ FAIL [{label}] {name}: {len(mismatches)} mismatches, e.g. {mismatches[0]!r}")
+            failed += 1
+        else:
+            print(f"  ✓ PASS [{label}] {name} ({len(CORPUS)} texts)")
+            passed += 1
+    return passed, failed
+
+
+CORPUS = build_corpus()
+
+print("=" * 60)
+print("TEST: Keyword scanners vs plain substring / \\b search")
+print("=" * 60)
+
+tests_passed = tests_failed = 0
+
+if keyword_scanner.HAS_AHOCORASICK:
+    p, f = run_checks('ahocorasick_rs')
+    tests_passed += p
+    tests_failed += f
+else:
+    print("  - ahocorasick_rs not installed, automaton path skipped")
+
+# Fallback path (no automaton)
+has_ahocorasick = keyword_scanner.HAS_AHOCORASICK
+keyword_scanner.HAS_AHOCORASICK = False
+try:
+    p, f = run_checks('fallback')
+    tests_passed += p
+    tests_failed += f
+finally:
+    keyword_scanner.HAS_AHOCORASICK = has_ahocorasick
+
+print("\n" + "=" * 60)
+print(f"Results: {tests_passed} passed, {tests_failed} failed")
+print("=" * 60)
+sys.exit(0 if tests_failed == 0 else 1)
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+Test ThreeLayerModerationPipeline batch path and Layer A/B cache
+
+- batch_predict() equals [predict(t) for t in texts], with and without the
+  ML layer, for any batch size
+- A model whose batch call fails still gets Layer C per text
+- Cached Layer A/B results are independent copies: mutating a returned
+  result must not change what the next call returns
+"""
+
+import copy
+import sys
+
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+from nlp.moderation_pipeline import ThreeLayerModerationPipeline
+
+TEXTS = [
+    'Sản phẩm rất tốt, giao hàng nhanh',
+    'đồ ngu',
+    'Đồ NGU',
+    'mày ngu như bò',
+    'đ.m thằng này',
+    'đm m',
+    'd1t me may',
+    'shop lừa đảo, không nên mua',
+    'Inbox zalo 0909123456 nhận quà http://spam.vn',
+    'các bạn ơi cho hỏi cách dùng',
+    'nguồn hàng ở đâu vậy shop?',
+    'Dịch vụ tệ quá, thất vọng',
+    '',
+    '   ',
+    'đồ ngu',  # duplicate inside one batch
+]
+
+
+class FakeModel:
+    """Deterministic stand-in for MultiTaskModerationInference (no torch needed)"""
+
+    def predict(self, text, **kwargs):
+        lowered = text.lower()
+        probs = {
+            'toxicity': 0.9 if 'ngu' in lowered.split() else 0.1,
+            'harassment': 0.6 if 'mày' in lowered else 0.05,
+            'spam': 0.8 if 'http' in lowered else 0.02,
+        }
+        labels = [label for label, p in probs.items() if p >= 0.5]
+        harmful = [p for label, p in probs.items() if p >= 0.5 and label != 'spam']
+        if harmful:
+            action = 'reject' if max(harmful) >= 0.7 else 'review'
+        else:
+            action = 'review' if labels else 'allowed'
+        return {
+            'labels': labels,
+            'action': action,
+            'confidence': max(probs.values()),
+            'all_probabilities': probs,
+            'reasoning': f"fake model: {', '.join(labels) or 'clean'}",
+            'method': 'ml_model',
+        }
+
+    def batch_predict(self, texts, batch_size=32, **kwargs):
+        return [self.predict(text) for text in texts]
+
+
+class FailingBatchModel(FakeModel):
+    """Model whose batched call always raises"""
+
+    def batch_predict(self, texts, batch_size=32, **kwargs):
+        raise RuntimeError('batch failed')
+
+
+def mutate(value):
+    """Scribble over a result dict in place, like a careless caller would"""
+    if isinstance(value, dict):
+        for key in list(value):
+            if isinstance(value[key], (dict, list)):
+                mutate(value[key])
+        value['__mutated__'] = True
+    elif isinstance(value, list):
+        for item in value:
+            mutate(item)
+        value.append('__mutated__')
+
+
+def canon(result):
+    """Comparable form of a result dict (label order ignored)"""
+    result = copy.deepcopy(result)
+    if isinstance(result.get('labels'), list):
+        result['labels'] = sorted(result['labels'])
+    return result
+
+
+print("=" * 60)
+print("TEST: ThreeLayerModerationPipeline batch_predict and cache")
+print("=" * 60)
+
+passed = 0
+failed = 0
+
+
+def check(name, ok):
+    global passed, failed
+    if ok:
+        print(f"  ✓ PASS {name}")
+        passed += 1
+    else:
+        print(f"  ✗ FAIL {name}")
+        failed += 1
+
+
+CONFIGS = (
+    ('rules only', dict(use_ml_model=False)),
+    ('fake ML', dict(text_model=FakeModel())),
+    ('fake ML, original only', dict(text_model=FakeModel(), ml_runs_on_multiple_versions=False)),
+)
+
+for label, kwargs in CONFIGS:
+    pipeline = ThreeLayerModerationPipeline(cache_size=0, **kwargs)
+    single = [canon(pipeline.predict(text)) for text in TEXTS]
+    for batch_size in (32, 4, 1):
+        batch = [canon(result) for result in pipeline.batch_predict(TEXTS, batch_size=batch_size)]
+        check(f"[{label}] batch_predict(batch_size={batch_size}) == predict()", batch == single)
+
+# A failing batch call falls back to per-text predictions
+expected = [canon(r) for r in ThreeLayerModerationPipeline(text_model=FakeModel()).batch_predict(TEXTS)]
+results = ThreeLayerModerationPipeline(text_model=FailingBatchModel()).batch_predict(TEXTS)
+check("failing batch call falls back to per-text Layer C",
+      [canon(result) for result in results] == expected)
+
+# Cache hits are copies, and cached results equal uncached ones
+for label, kwargs in CONFIGS:
+    uncached = ThreeLayerModerationPipeline(cache_size=0, **kwargs)
+    pipeline = ThreeLayerModerationPipeline(**kwargs)
+    expected = [canon(uncached.predict(text)) for text in TEXTS]
+
+    ok = True
+    for text, want in zip(TEXTS, expected):
+        mutate(pipeline.predict(text))
+        if canon(pipeline.predict(text)) != want:
+            ok = False
+            print(f"    mismatch after mutation: {text!r}")
+    check(f"[{label}] cache hits unaffected by mutation", ok)
+    check(f"[{label}] cached batch_predict() == uncached predict()",
+          [canon(result) for result in pipeline.batch_predict(TEXTS)] == expected)
+    check(f"[{label}] cache hits are counted", pipeline.get_metrics()['cache_hits'] > 0)
+
+print("\n" + "=" * 60)
+print(f"Results: {passed} passed, {failed} failed")
+print("=" * 60)
+sys.exit(0 if failed == 0 else 1)
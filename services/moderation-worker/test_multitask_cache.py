@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+Test the MultiTaskModerationInference predict and rule-check caches
+
+- Cache hits are independent copies: mutating a returned result must not
+  change what the next call returns
+- batch_predict() makes the same decisions as per-text predict()
+- A failed 3-layer rule check is not cached as a clean result
+
+Needs torch and a trained model at Config.MODEL_PATH; skipped otherwise.
+"""
+
+import copy
+import os
+import sys
+
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+TEXTS = [
+    'Sản phẩm rất tốt, giao hàng nhanh',
+    'đồ ngu',
+    'Đồ NGU',
+    'mày ngu như bò',
+    'đ.m thằng này',
+    'd1t me may',
+    'shop lừa đảo, không nên mua',
+    'Inbox zalo 0909123456 nhận quà',
+    'các bạn ơi cho hỏi cách dùng',
+    'Dịch vụ tệ quá, thất vọng',
+    '',
+    '!!!',
+    'đồ ngu',  # duplicate inside one batch
+]
+
+
+def mutate(value):
+    """Scribble over a result dict in place, like a careless caller would"""
+    if isinstance(value, dict):
+        for key in list(value):
+            if isinstance(value[key], (dict, list)):
+                mutate(value[key])
+        value['__mutated__'] = True
+    elif isinstance(value, list):
+        for item in value:
+            mutate(item)
+        value.append('__mutated__')
+
+
+def canon(result):
+    """Comparable form of a result dict (label order ignored)"""
+    result = copy.deepcopy(result)
+    if isinstance(result.get('labels'), list):
+        result['labels'] = sorted(result['labels'])
+    return result
+
+
+def decision(result):
+    return result['action'], sorted(result.get('labels', []))
+
+
+print("=" * 60)
+print("TEST: MultiTaskModerationInference cache and batch_predict")
+print("=" * 60)
+
+try:
+    from config import Config
+    from nlp.inference_multitask import MultiTaskModerationInference
+except ImportError as e:
+    print(f"  - SKIP (missing dependency: {e})")
+    sys.exit(0)
+
+if not os.path.isdir(Config.MODEL_PATH):
+    print(f"  - SKIP (no model at {Config.MODEL_PATH})")
+    sys.exit(0)
+
+passed = 0
+failed = 0
+
+
+def check(name, ok):
+    global passed, failed
+    if ok:
+        print(f"  ✓ PASS {name}")
+        passed += 1
+    else:
+        print(f"  ✗ FAIL {name}")
+        failed += 1
+
+
+engine = MultiTaskModerationInference(Config.MODEL_PATH, device=Config.MODEL_DEVICE)
+
+for use_rules in (True, False):
+    label = 'rules + model' if use_rules else 'model only'
+    engine.cache_clear()
+    expected = [canon(engine.predict(text, use_rule_based_fallback=use_rules)) for text in TEXTS]
+
+    ok = True
+    for text, want in zip(TEXTS, expected):
+        mutate(engine.predict(text, use_rule_based_fallback=use_rules))
+        if canon(engine.predict(text, use_rule_based_fallback=use_rules)) != want:
+            ok = False
+            print(f"    mismatch after mutation: {text!r}")
+    check(f"[{label}] predict() cache hits unaffected by mutation", ok)
+
+    # Batched forward passes may differ in the last float digits: compare decisions
+    engine.cache_clear()
+    batch = engine.batch_predict(TEXTS, batch_size=4, use_rule_based_fallback=use_rules)
+    check(f"[{label}] batch_predict() == predict()",
+          [decision(result) for result in batch] == [decision(result) for result in expected])
+
+# Rule-check cache
+engine.cache_clear()
+expected = [canon(engine.rule_based_check(text) or {}) for text in TEXTS]
+ok = True
+for text, want in zip(TEXTS, expected):
+    mutate(engine.rule_based_check(text) or {})
+    if canon(engine.rule_based_check(text) or {}) != want:
+        ok = False
+        print(f"    mismatch after mutation: {text!r}")
+check("rule_based_check() cache hits unaffected by mutation", ok)
+
+if engine.use_three_layer_pipeline:
+    def failing_check(text):
+        raise RuntimeError('rule check failed')
+
+    text = 'đ.m thằng này'
+    engine.cache_clear()
+    engine._enhanced_rule_check = failing_check
+    try:
+        engine.rule_based_check(text)  # Falls back to the legacy check
+    finally:
+        del engine._enhanced_rule_check
+    check("failed 3-layer check is not cached",
+          canon(engine.rule_based_check(text) or {}) == expected[TEXTS.index(text)])
+
+print("\n" + "=" * 60)
+print(f"Results: {passed} passed, {failed} failed")
+print("=" * 60)
+sys.exit(0 if failed == 0 else 1)
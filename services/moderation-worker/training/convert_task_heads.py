@@ -0,0 +1,51 @@
+"""
+Convert task_heads.pt to task_heads.safetensors
+
+One-time conversion for models trained before the trainer wrote
+safetensors. load_task_heads() prefers the safetensors file, which is
+memory-mapped instead of unpickled at worker startup.
+
+Usage:
+    python training/convert_task_heads.py /app/models/phobert-multitask
+"""
+
+import argparse
+import logging
+import os
+import sys
+
+import torch
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.multitask_phobert import (
+    TASK_HEADS_FILE, TASK_HEADS_SAFETENSORS_FILE, save_task_heads_safetensors
+)
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    stream=sys.stdout
+)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert task_heads.pt to safetensors")
+    parser.add_argument('model_dir', type=str, help='Model directory containing task_heads.pt')
+    args = parser.parse_args()
+
+    pt_path = os.path.join(args.model_dir, TASK_HEADS_FILE)
+    if not os.path.exists(pt_path):
+        logger.error(f"{pt_path} not found")
+        sys.exit(1)
+
+    checkpoint = torch.load(pt_path, map_location='cpu', weights_only=True)
+    output_path = os.path.join(args.model_dir, TASK_HEADS_SAFETENSORS_FILE)
+    save_task_heads_safetensors(checkpoint, output_path)
+    logger.info(f"Saved {output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+"""
+Knowledge Distillation for the Baseline PhoBERT Sentiment Model
+
+Distills the 12-layer PhoBERT classifier used by nlp.inference into a
+6-layer student initialized from every other teacher layer. Serve the
+student with USE_DISTILLED=true (and USE_ONNX=true for INT8).
+
+Usage:
+    python training/distill.py --data-path ./datasets/combined.csv --output-dir ./models/phobert-student
+"""
+
+import argparse
+import copy
+import logging
+import sys
+import os
+from pathlib import Path
+from typing import List, Sequence
+
+import pandas as pd
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+from torch.utils.data import Dataset, DataLoader
+from sklearn.model_selection import train_test_split
+from transformers import AutoTokenizer, AutoModelForSequenceClassification, get_linear_schedule_with_warmup
+from tqdm import tqdm
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nlp.inference import ModerationInference, normalize_text
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    stream=sys.stdout
+)
+logger = logging.getLogger(__name__)
+
+# Same label order as ModerationInference.sentiment_labels
+SENTIMENT_LABELS = ['positive', 'neutral', 'negative']
+IGNORE_INDEX = -100
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Distill the baseline PhoBERT sentiment model into a smaller student"
+    )
+
+    parser.add_argument('--data-path', type=str, required=True,
+                        help="CSV with a 'text' column and an optional 'sentiment' column "
+                             "(positive/neutral/negative); unlabeled rows use the teacher only")
+    parser.add_argument('--teacher', type=str, default='/app/models/phobert-base-v2',
+                        help='Teacher model path (the MODEL_PATH of the worker)')
+    parser.add_argument('--output-dir', type=str, default='./models/phobert-student',
+                        help='Where to save the student')
+    parser.add_argument('--layers', type=str, default='1,3,5,7,9,11',
+                        help='Teacher layers copied into the student, comma separated')
+    parser.add_argument('--max-length', type=int, default=256, help='Maximum sequence length')
+    parser.add_argument('--batch-size', type=int, default=32, help='Training batch size')
+    parser.add_argument('--learning-rate', type=float, default=5e-5, help='Learning rate')
+    parser.add_argument('--epochs', type=int, default=3, help='Number of training epochs')
+    parser.add_argument('--warmup-ratio', type=float, default=0.1, help='Warmup ratio')
+    parser.add_argument('--temperature', type=float, default=2.0, help='Distillation temperature')
+    parser.add_argument('--alpha', type=float, default=0.5,
+                        help='Weight of the distillation loss (1 - alpha for the label loss)')
+    parser.add_argument('--val-size', type=float, default=0.1, help='Validation set size (proportion)')
+    parser.add_argument('--random-seed', type=int, default=42, help='Random seed')
+    parser.add_argument('--export-onnx', action='store_true',
+                        help='Also export the student to INT8 ONNX (<output-dir>/onnx)')
+    parser.add_argument('--device', type=str,
+                        default='cuda' if torch.cuda.is_available() else 'cpu',
+                        help='Device to use for training')
+
+    return parser.parse_args()
+
+
+class DistillationDataset(Dataset):
+    """Texts (normalized as at inference time) with optional sentiment labels"""
+
+    def __init__(self, texts: List[str], labels: Sequence[int], tokenizer, max_length: int = 256):
+        self.texts = texts
+        self.labels = labels
+        self.tokenizer = tokenizer
+        self.max_length = max_length
+
+    def __len__(self):
+        return len(self.texts)
+
+    def __getitem__(self, idx):
+        encoding = self.tokenizer(
+            normalize_text(self.texts[idx]),
+            max_length=self.max_length,
+            padding='max_length',
+            truncation=True,
+            return_tensors='pt'
+        )
+
+        return {
+            'input_ids': encoding['input_ids'].squeeze(0),
+            'attention_mask': encoding['attention_mask'].squeeze(0),
+            'labels': torch.tensor(self.labels[idx], dtype=torch.long)
+        }
+
+
+def build_student(teacher: nn.Module, layer_ids: Sequence[int]) -> nn.Module:
+    """
+    Copy the teacher, keeping only the given encoder layers
+
+    Embeddings and classifier head come from the teacher as well, so the
+    student starts close to it.
+    """
+    student = copy.deepcopy(teacher)
+    encoder = student.base_model.encoder
+    encoder.layer = nn.ModuleList([encoder.layer[i] for i in layer_ids])
+    student.config.num_hidden_layers = len(layer_ids)
+    return student
+
+
+def distillation_loss(
+    student_logits: torch.Tensor,
+    teacher_logits: torch.Tensor,
+    labels: torch.Tensor,
+    temperature: float,
+    alpha: float
+) -> torch.Tensor:
+    """
+    alpha * KL(teacher || student) on softened logits + (1 - alpha) * cross-entropy
+
+    Rows without a label (IGNORE_INDEX) only contribute the KL term.
+    """
+    kd_loss = F.kl_div(
+        F.log_softmax(student_logits / temperature, dim=-1),
+        F.softmax(teacher_logits / temperature, dim=-1),
+        reduction='batchmean'
+    ) * temperature ** 2
+
+    if (labels == IGNORE_INDEX).all():
+        return kd_loss
+    ce_loss = F.cross_entropy(student_logits, labels, ignore_index=IGNORE_INDEX)
+    return alpha * kd_loss + (1 - alpha) * ce_loss
+
+
+def encode_labels(data: pd.DataFrame) -> List[int]:
+    """Sentiment strings -> label ids, IGNORE_INDEX when missing or unknown"""
+    if 'sentiment' not in data.columns:
+        return [IGNORE_INDEX] * len(data)
+    return [
+        SENTIMENT_LABELS.index(label) if label in SENTIMENT_LABELS else IGNORE_INDEX
+        for label in data['sentiment'].astype(str).str.lower()
+    ]
+
+
+def evaluate(student: nn.Module, teacher: nn.Module, loader: DataLoader, device: str) -> float:
+    """Share of validation texts where student and teacher pick the same class"""
+    student.eval()
+    agree = 0
+    total = 0
+
+    with torch.inference_mode():
+        for batch in loader:
+            inputs = {
+                'input_ids': batch['input_ids'].to(device),
+                'attention_mask': batch['attention_mask'].to(device)
+            }
+            student_preds = student(**inputs).logits.argmax(dim=-1)
+            teacher_preds = teacher(**inputs).logits.argmax(dim=-1)
+            agree += (student_preds == teacher_preds).sum().item()
+            total += student_preds.numel()
+
+    return agree / total if total else 0.0
+
+
+def main():
+    args = parse_args()
+
+    torch.manual_seed(args.random_seed)
+    np.random.seed(args.random_seed)
+
+    # Data
+    data = pd.read_csv(args.data_path).dropna(subset=['text'])
+    texts = data['text'].astype(str).tolist()
+    labels = encode_labels(data)
+    logger.info(f"Loaded {len(texts)} texts, {sum(l != IGNORE_INDEX for l in labels)} labeled")
+
+    train_texts, val_texts, train_labels, val_labels = train_test_split(
+        texts, labels, test_size=args.val_size, random_state=args.random_seed
+    )
+
+    # Teacher (frozen) and student
+    tokenizer = AutoTokenizer.from_pretrained(args.teacher)
+    teacher = AutoModelForSequenceClassification.from_pretrained(args.teacher, num_labels=3)
+    teacher.to(args.device)
+    teacher.eval()
+    for param in teacher.parameters():
+        param.requires_grad = False
+
+    layer_ids = [int(i) for i in args.layers.split(',')]
+    student = build_student(teacher, layer_ids)
+    for param in student.parameters():
+        param.requires_grad = True
+
+    teacher_params = sum(p.numel() for p in teacher.parameters())
+    student_params = sum(p.numel() for p in student.parameters())
+    logger.info(f"Teacher: {teacher.config.num_hidden_layers} layers, {teacher_params:,} parameters")
+    logger.info(f"Student: {len(layer_ids)} layers {layer_ids}, {student_params:,} parameters")
+
+    train_loader = DataLoader(
+        DistillationDataset(train_texts, train_labels, tokenizer, args.max_length),
+        batch_size=args.batch_size,
+        shuffle=True,
+        num_workers=4,
+        pin_memory=True
+    )
+    val_loader = DataLoader(
+        DistillationDataset(val_texts, val_labels, tokenizer, args.max_length),
+        batch_size=args.batch_size,
+        shuffle=False,
+        num_workers=4,
+        pin_memory=True
+    )
+
+    optimizer = torch.optim.AdamW(student.parameters(), lr=args.learning_rate, weight_decay=0.01)
+    total_steps = len(train_loader) * args.epochs
+    scheduler = get_linear_schedule_with_warmup(
+        optimizer,
+        num_warmup_steps=int(total_steps * args.warmup_ratio),
+        num_training_steps=total_steps
+    )
+    use_amp = args.device == 'cuda'
+    scaler = torch.cuda.amp.GradScaler() if use_amp else None
+
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    best_agreement = -1.0
+
+    for epoch in range(args.epochs):
+        student.train()
+        total_loss = 0.0
+
+        for batch in tqdm(train_loader, desc=f"Epoch {epoch + 1}/{args.epochs}"):
+            inputs = {
+                'input_ids': batch['input_ids'].to(args.device),
+                'attention_mask': batch['attention_mask'].to(args.device)
+            }
+            batch_labels = batch['labels'].to(args.device)
+
+            with torch.autocast(device_type='cuda', enabled=use_amp):
+                with torch.no_grad():
+                    teacher_logits = teacher(**inputs).logits
+                student_logits = student(**inputs).logits
+
+            loss = distillation_loss(
+                student_logits.float(), teacher_logits.float(), batch_labels,
+                args.temperature, args.alpha
+            )
+
+            optimizer.zero_grad()
+            if scaler is not None:
+                scaler.scale(loss).backward()
+                scaler.unscale_(optimizer)
+                torch.nn.utils.clip_grad_norm_(student.parameters(), 1.0)
+                scaler.step(optimizer)
+                scaler.update()
+            else:
+                loss.backward()
+                torch.nn.utils.clip_grad_norm_(student.parameters(), 1.0)
+                optimizer.step()
+            scheduler.step()
+
+            total_loss += loss.item()
+
+        agreement = evaluate(student, teacher, val_loader, args.device)
+        logger.info(
+            f"Epoch {epoch + 1}: loss {total_loss / max(len(train_loader), 1):.4f}, "
+            f"agreement with teacher {agreement:.2%}"
+        )
+
+        if agreement > best_agreement:
+            best_agreement = agreement
+            student.save_pretrained(output_dir)
+            tokenizer.save_pretrained(output_dir)
+            logger.info(f"Saved student to {output_dir}")
+
+    logger.info(f"Best agreement with teacher: {best_agreement:.2%}")
+
+    if args.export_onnx:
+        # Same export + INT8 quantization the worker runs with USE_ONNX=true
+        ModerationInference(model_path=str(output_dir), use_onnx=True)
+        logger.info(f"INT8 ONNX student saved to {output_dir / 'onnx'}")
+
+    logger.info("\n✅ Done! Serve it with USE_DISTILLED=true DISTILLED_MODEL_PATH=" + str(output_dir))
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        logger.info("\n\nDistillation interrupted by user")
+        sys.exit(0)
+    except Exception as e:
+        logger.error(f"\n\nDistillation failed with error: {e}", exc_info=True)
+        sys.exit(1)
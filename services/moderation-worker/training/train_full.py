@@ -20,7 +20,7 @@ from transformers import AutoTokenizer
 # Add parent directory to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from models.multitask_phobert import MultiTaskPhoBERT
+from models.multitask_phobert import MultiTaskPhoBERT, load_task_heads
 from training.trainer import ModerationDataset, ModerationTrainer, compute_class_weights
 from data.dataset_loader import DatasetLoader
 from nlp.taxonomy import get_label_list
@@ -460,9 +460,8 @@ def main():
         )
         
         # Load task heads
-        task_heads_path = best_model_path / 'task_heads.pt'
-        if task_heads_path.exists():
-            checkpoint = torch.load(task_heads_path, map_location=args.device)
+        checkpoint = load_task_heads(str(best_model_path), args.device)
+        if checkpoint is not None:
             best_model.multi_label_classifier.load_state_dict(checkpoint['multi_label_classifier'])
             best_model.severity_regressor.load_state_dict(checkpoint['severity_regressor'])
             if args.use_span_detection and checkpoint.get('span_detector'):
@@ -30,7 +30,10 @@ import sys
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from models.multitask_phobert import MultiTaskPhoBERT, MultiTaskLoss, FocalLoss
+from models.multitask_phobert import (
+    MultiTaskPhoBERT, MultiTaskLoss, FocalLoss,
+    HAS_SAFETENSORS, TASK_HEADS_FILE, TASK_HEADS_SAFETENSORS_FILE, save_task_heads_safetensors
+)
 from nlp.preprocessing_advanced import preprocess_for_phobert, augment_drop_diacritics, augment_teencode, augment_insert_chars
 from nlp.taxonomy import get_label_list, DEFAULT_LABELS
 
@@ -385,8 +388,8 @@ class ModerationTrainer:
         self.model.phobert.save_pretrained(checkpoint_dir)
         self.tokenizer.save_pretrained(checkpoint_dir)
         
-        # Save task heads
-        torch.save({
+        # Save task heads (.pt, plus safetensors for fast memory-mapped loading)
+        task_heads = {
             'multi_label_classifier': self.model.multi_label_classifier.state_dict(),
             'severity_regressor': self.model.severity_regressor.state_dict(),
             'span_detector': self.model.span_detector.state_dict() if self.model.use_span_detection else None,
@@ -395,7 +398,10 @@ class ModerationTrainer:
                 'num_severity_levels': self.model.num_severity_levels,
                 'use_span_detection': self.model.use_span_detection
             }
-        }, checkpoint_dir / 'task_heads.pt')
+        }
+        torch.save(task_heads, checkpoint_dir / TASK_HEADS_FILE)
+        if HAS_SAFETENSORS:
+            save_task_heads_safetensors(task_heads, str(checkpoint_dir / TASK_HEADS_SAFETENSORS_FILE))
         
         logger.info(f"Checkpoint saved to {checkpoint_dir}")
     
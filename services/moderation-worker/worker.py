@@ -5,6 +5,7 @@ import logging
 from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
 from datetime import datetime
+import os
 import sys
 import time
 
@@ -12,7 +13,7 @@ from config import config
 
 # Import inference modules
 try:
-    from nlp.inference_multitask import MultiTaskModerationInference
+    from nlp.inference_multitask import get_multitask_engine
     USE_MULTITASK = True
 except ImportError:
     from nlp.inference import ModerationInference
@@ -43,8 +44,8 @@ SessionLocal = sessionmaker(bind=engine)
 publisher_exchange = None
 
 # Batch processing settings
-BATCH_SIZE = 32
-BATCH_TIMEOUT = 0.2  # 200ms
+BATCH_SIZE = config.WORKER_BATCH_SIZE
+BATCH_TIMEOUT = config.WORKER_BATCH_TIMEOUT_MS / 1000  # seconds
 job_queue = asyncio.Queue()
 
 # --- Load Models ---
@@ -52,17 +53,34 @@ job_queue = asyncio.Queue()
 # 1. Text Model
 if USE_MULTITASK and config.USE_MULTITASK_MODEL:
     logger.info("Loading Multi-Task PhoBERT model...")
-    text_inference_model = MultiTaskModerationInference(
-        model_path=config.MODEL_PATH,
-        device=config.MODEL_DEVICE,
-        confidence_threshold=config.CONFIDENCE_THRESHOLD
+    text_inference_model = get_multitask_engine(
+        config.MODEL_PATH,
+        config.MODEL_DEVICE,
+        confidence_threshold=config.CONFIDENCE_THRESHOLD,
+        quantize_model=config.QUANTIZE_MODEL,
+        compile_model=config.TORCH_COMPILE,
+        short_text_fast_path=config.SHORT_TEXT_FAST_PATH,
+        half_precision=config.HALF_PRECISION,
+        use_onnx=config.USE_ONNX,
+        rule_workers=config.RULE_WORKERS,
+        max_length=config.MAX_SEQ_LENGTH
     )
     logger.info(f"Multi-Task model loaded from {config.MODEL_PATH}")
 else:
     logger.info("Loading baseline inference model...")
+    baseline_model_path = config.MODEL_PATH
+    if config.USE_DISTILLED:
+        if os.path.exists(config.DISTILLED_MODEL_PATH):
+            baseline_model_path = config.DISTILLED_MODEL_PATH
+            logger.info(f"Using distilled model from {baseline_model_path}")
+        else:
+            logger.warning(f"Distilled model not found at {config.DISTILLED_MODEL_PATH}, using {config.MODEL_PATH}")
     text_inference_model = ModerationInference(
-        model_path=config.MODEL_PATH,
-        device=config.MODEL_DEVICE
+        model_path=baseline_model_path,
+        device=config.MODEL_DEVICE,
+        use_onnx=config.USE_ONNX,
+        compile_model=config.TORCH_COMPILE,
+        use_cuda_graphs=config.CUDA_GRAPHS
     )
     logger.info("Baseline model loaded")
 
@@ -350,9 +368,14 @@ async def batch_processor_task():
             messages.append(msg)
             
             # Collect more messages up to BATCH_SIZE or timeout
-            start_wait = time.time()
+            start_wait = time.monotonic()
             while len(messages) < BATCH_SIZE:
-                remaining = BATCH_TIMEOUT - (time.time() - start_wait)
+                # Take what is already queued without waiting
+                if not job_queue.empty():
+                    messages.append(job_queue.get_nowait())
+                    continue
+                
+                remaining = BATCH_TIMEOUT - (time.monotonic() - start_wait)
                 if remaining <= 0:
                     break
                 
@@ -389,8 +412,10 @@ async def main():
     )
     channel = await connection.channel()
     
-    # Set prefetch count higher to allow buffering
-    await channel.set_qos(prefetch_count=config.WORKER_CONCURRENCY)
+    # Set prefetch count higher to allow buffering: messages are acked only
+    # after their batch is processed, so a prefetch below BATCH_SIZE would
+    # cap every batch at the prefetch count
+    await channel.set_qos(prefetch_count=max(config.WORKER_CONCURRENCY, BATCH_SIZE))
     
     # Declare exchange
     global publisher_exchange
@@ -405,7 +430,7 @@ async def main():
     queue = await channel.declare_queue("moderation_jobs", durable=True)
     await queue.bind(exchange, routing_key="moderation.job.new")
     
-    logger.info(f"Worker ready. Batch size: {BATCH_SIZE}, Prefetch: {config.WORKER_CONCURRENCY}")
+    logger.info(f"Worker ready. Batch size: {BATCH_SIZE}, Batch timeout: {BATCH_TIMEOUT * 1000:.0f}ms, Prefetch: {max(config.WORKER_CONCURRENCY, BATCH_SIZE)}")
     
     # Start batch processor
     processor = asyncio.create_task(batch_processor_task())